@@ -9,7 +9,9 @@ def create_app(config_class=Config):
     CORS(app)
     
     # Import and register routes - do this inside function to avoid circular imports
-    from .api.endpoints import emails
+    from .api.endpoints import emails, metrics, notifications
     app.register_blueprint(emails.emails)
+    app.register_blueprint(notifications.notifications)
+    app.register_blueprint(metrics.metrics)
     
     return app
\ No newline at end of file
@@ -2,41 +2,112 @@
 from ..services.email_processor_service import EmailProcessorService
 from ..services.llm_service import LLMService
 from ..services.confirmation_service import ConfirmationService
+from ..services.notification_service import NotificationIngestService
+from ..services.graph_batch_service import GraphBatchService
+from ..repositories.match_repository import create_match_repository
+from ..core.logger import logger
 from azure.identity import ClientSecretCredential
 from msgraph import GraphServiceClient
 from ..config import Config
 import logging
+import threading
 
-def get_graph_client():
-    """Get Microsoft Graph client"""
-    try:
-        credentials = ClientSecretCredential(
+# Process-wide service instances, created on first use and shared by the
+# Flask request threads and the email monitor
+_instances = {}
+_instances_lock = threading.RLock()
+
+def _get_or_create(name, factory):
+    """Return the shared instance called name, creating it with factory once"""
+    instance = _instances.get(name)
+    if instance is not None:
+        return instance
+
+    with _instances_lock:
+        instance = _instances.get(name)
+        if instance is None:
+            instance = factory()
+            if instance is not None:
+                _instances[name] = instance
+        return instance
+
+def get_graph_credential():
+    """Get the shared Azure credential (it caches access tokens between requests)"""
+    def create():
+        return ClientSecretCredential(
             tenant_id=Config.GRAPH_TENANT_ID,
             client_id=Config.GRAPH_CLIENT_ID,
             client_secret=Config.GRAPH_CLIENT_SECRET
         )
-        return GraphServiceClient(credentials=credentials)
-    except Exception as e:
-        logging.error(f"Failed to initialize Graph client: {str(e)}")
+    return _get_or_create("graph_credential", create)
+
+def get_graph_client():
+    """Get Microsoft Graph client"""
+    def create():
+        try:
+            return GraphServiceClient(credentials=get_graph_credential())
+        except Exception as e:
+            logging.error(f"Failed to initialize Graph client: {str(e)}")
+            return None
+    return _get_or_create("graph_client", create)
+
+def get_graph_batch_service():
+    """Get the shared Graph $batch client, or None when batching is disabled"""
+    if not Config.GRAPH_BATCH_ENABLED:
         return None
+    return _get_or_create(
+        "graph_batch_service",
+        lambda: GraphBatchService(
+            get_graph_credential(),
+            window_seconds=Config.GRAPH_BATCH_WINDOW_SECONDS,
+            max_batch_size=Config.GRAPH_BATCH_MAX_SIZE
+        )
+    )
+
+def get_match_repository():
+    """Get the storage for identified trades and email matches"""
+    return _get_or_create("match_repository", create_match_repository)
 
 def get_email_processor_service():
     """Get email processor service instance"""
-    graph_client = get_graph_client()
-    return EmailProcessorService(graph_client=graph_client)
+    return _get_or_create(
+        "email_processor_service",
+        lambda: EmailProcessorService(
+            graph_client=get_graph_client(),
+            match_repository=get_match_repository(),
+            graph_batch=get_graph_batch_service()
+        )
+    )
 
 def get_llm_service():
     """Get LLM service instance"""
-    graph_client = get_graph_client()
-    return LLMService(graph_client=graph_client)
+    return _get_or_create(
+        "llm_service",
+        lambda: LLMService(
+            graph_client=get_graph_client(),
+            email_processor_service=get_email_processor_service()
+        )
+    )
 
 def get_confirmation_service():
     """Get confirmation service instance"""
-    graph_client = get_graph_client()
-    llm_service = get_llm_service()
-    email_processor = get_email_processor_service()
-    return ConfirmationService(
-        graph_client=graph_client,
-        llm_service=llm_service,
-        email_processor_service=email_processor
-    )
\ No newline at end of file
+    return _get_or_create(
+        "confirmation_service",
+        lambda: ConfirmationService(
+            graph_client=get_graph_client(),
+            llm_service=get_llm_service(),
+            email_processor_service=get_email_processor_service(),
+            logger=logger,
+            match_repository=get_match_repository()
+        )
+    )
+
+def get_notification_ingest_service():
+    """Get the service that feeds Graph change notifications to the monitor"""
+    return _get_or_create(
+        "notification_ingest_service",
+        lambda: NotificationIngestService(
+            graph_client=get_graph_client(),
+            email_processor_service=get_email_processor_service()
+        )
+    )
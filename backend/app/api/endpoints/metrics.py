@@ -0,0 +1,15 @@
+# backend/app/api/endpoints/metrics.py
+from flask import jsonify, Blueprint
+
+metrics = Blueprint('metrics', __name__)
+
+from ..deps import get_llm_service
+
+@metrics.route('/llm-metrics', methods=['GET'])
+def llm_metrics():
+    # Circuit state, extraction latency and rate-limit queueing per provider, as seen by the monitor's LLM service
+    llm_service = get_llm_service()
+    return jsonify({
+        "routing": llm_service.get_routing_stats(),
+        "rate_limits": llm_service.get_rate_limit_stats()
+    })
@@ -0,0 +1,29 @@
+# backend/app/api/endpoints/notifications.py
+from flask import request, jsonify, Blueprint
+
+notifications = Blueprint('notifications', __name__)
+
+from ..deps import get_notification_ingest_service
+
+@notifications.route('/graph-notifications', methods=['POST'])
+def graph_notifications():
+    # Subscription validation: Graph expects the token echoed back as plain text
+    validation_token = request.args.get('validationToken')
+    if validation_token is not None:
+        return validation_token, 200, {'Content-Type': 'text/plain'}
+
+    data = request.get_json(silent=True) or {}
+    ingest_service = get_notification_ingest_service()
+
+    message_ids = []
+    rejected = 0
+    for notification in data.get('value', []):
+        if ingest_service.validate_notification(notification):
+            message_ids.append(notification['resourceData']['id'])
+        else:
+            rejected += 1
+
+    # Anything not queued (e.g. monitor not running) is picked up by reconciliation polling
+    queued = ingest_service.submit(message_ids)
+
+    return jsonify({"queued": queued, "rejected": rejected}), 202
@@ -1,5 +1,43 @@
 import os
 
+
+def _parse_int_mapping(value):
+    """Parse "Key=1,Other=2" style environment values into a dict of ints"""
+    mapping = {}
+    for item in (value or '').split(','):
+        if '=' not in item:
+            continue
+        key, _, number = item.partition('=')
+        try:
+            mapping[key.strip()] = int(number)
+        except ValueError:
+            continue
+    return mapping
+
+def _parse_float_mapping(value):
+    """Parse "Key=1.5,Other=2" style environment values into a dict of floats"""
+    mapping = {}
+    for item in (value or '').split(','):
+        if '=' not in item:
+            continue
+        key, _, number = item.partition('=')
+        try:
+            mapping[key.strip()] = float(number)
+        except ValueError:
+            continue
+    return mapping
+
+def _parse_str_mapping(value):
+    """Parse "Key=a,Other=b" style environment values into a dict of strings"""
+    mapping = {}
+    for item in (value or '').split(','):
+        if '=' not in item:
+            continue
+        key, _, text = item.partition('=')
+        if key.strip() and text.strip():
+            mapping[key.strip()] = text.strip()
+    return mapping
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-key-for-confirmation-manager'
     GRAPH_CLIENT_ID = os.environ.get('AZURE_CLIENT_ID')
@@ -9,5 +47,114 @@ class Config:
     ANTHROPIC_API_KEY = os.environ.get('ANTHROPIC_API_KEY')
     GOOGLE_API_KEY = os.environ.get('GOOGLE_API_KEY')
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    # Log events are shipped to the log server in batches from a background thread
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', '10000'))
+    LOG_BATCH_SIZE = int(os.environ.get('LOG_BATCH_SIZE', '100'))
+    LOG_FLUSH_INTERVAL_SECONDS = float(os.environ.get('LOG_FLUSH_INTERVAL_SECONDS', '1'))
+    # 1-in-N sampling of hot-path events per tag prefix, and how often their summaries are logged
+    LOG_SAMPLE_RATES = _parse_int_mapping(os.environ.get('LOG_SAMPLE_RATES', 'trade.lookup=100'))
+    LOG_SUMMARY_INTERVAL_SECONDS = float(os.environ.get('LOG_SUMMARY_INTERVAL_SECONDS', '60'))
     USER_EMAIL = os.environ.get('USER_EMAIL', 'ben.clark@palace.cl')
-    ASSETS_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../frontend/public/assets'))
\ No newline at end of file
+    ASSETS_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../frontend/public/assets'))
+    STORAGE_PATH = os.environ.get('STORAGE_PATH') or os.path.abspath(os.path.join(os.path.dirname(__file__), '../storage'))
+    CACHE_PATH = os.environ.get('CACHE_PATH') or os.path.abspath(os.path.join(os.path.dirname(__file__), '../cache'))
+
+    # Email processing concurrency: global cap plus optional per-provider caps
+    EMAIL_PROCESSING_CONCURRENCY = int(os.environ.get('EMAIL_PROCESSING_CONCURRENCY', '5'))
+    LLM_PROVIDER_CONCURRENCY = _parse_int_mapping(
+        os.environ.get('LLM_PROVIDER_CONCURRENCY', 'OpenAI=5,Anthropic=3,Google=3')
+    )
+
+    # On-disk cache of LLM responses
+    LLM_CACHE_ENABLED = os.environ.get('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+    LLM_CACHE_TTL_SECONDS = int(os.environ.get('LLM_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+    LLM_CACHE_MAX_ENTRIES = int(os.environ.get('LLM_CACHE_MAX_ENTRIES', '5000'))
+    LLM_CACHE_DISABLED_PROVIDERS = [
+        p.strip() for p in os.environ.get('LLM_CACHE_DISABLED_PROVIDERS', '').split(',') if p.strip()
+    ]
+
+    # How often unmatched_trades.json is checked for changes
+    TRADES_RELOAD_INTERVAL_SECONDS = float(os.environ.get('TRADES_RELOAD_INTERVAL_SECONDS', '5'))
+
+    # Where identified trades and email matches are stored: "json", "sqlite" or "journal"
+    MATCH_STORAGE_BACKEND = os.environ.get('MATCH_STORAGE_BACKEND', 'json')
+    # Delay before ingest writes are exported to the JSON files the frontend reads
+    STORAGE_EXPORT_DELAY_SECONDS = float(os.environ.get('STORAGE_EXPORT_DELAY_SECONDS', '1'))
+    # Journal backend: how often the journal is compacted into the JSON snapshots
+    JOURNAL_COMPACT_INTERVAL_SECONDS = float(os.environ.get('JOURNAL_COMPACT_INTERVAL_SECONDS', '5'))
+    JOURNAL_FSYNC = os.environ.get('JOURNAL_FSYNC', 'true').lower() == 'true'
+
+    # Outlook monitoring: "poll" re-queries the folder, "delta" uses Graph delta queries
+    MONITOR_MODE = os.environ.get('MONITOR_MODE', 'poll')
+    DELTA_MIN_INTERVAL_SECONDS = float(os.environ.get('DELTA_MIN_INTERVAL_SECONDS', '5'))
+    DELTA_MAX_INTERVAL_SECONDS = float(os.environ.get('DELTA_MAX_INTERVAL_SECONDS', '60'))
+
+    # Graph change notifications: public URL of /graph-notifications (empty disables push)
+    GRAPH_NOTIFICATION_URL = os.environ.get('GRAPH_NOTIFICATION_URL', '')
+    GRAPH_NOTIFICATION_CLIENT_STATE = os.environ.get('GRAPH_NOTIFICATION_CLIENT_STATE', '')
+    GRAPH_SUBSCRIPTION_MINUTES = int(os.environ.get('GRAPH_SUBSCRIPTION_MINUTES', '2880'))
+    # With push enabled, polling only reconciles missed notifications at this interval
+    RECONCILE_INTERVAL_SECONDS = float(os.environ.get('RECONCILE_INTERVAL_SECONDS', '300'))
+
+    # How long resolved mailbox folder IDs are cached
+    FOLDER_CACHE_TTL_SECONDS = float(os.environ.get('FOLDER_CACHE_TTL_SECONDS', '3600'))
+
+    # Mailbox mutations (mark unread, move) are combined into Graph $batch requests
+    GRAPH_BATCH_ENABLED = os.environ.get('GRAPH_BATCH_ENABLED', 'true').lower() == 'true'
+    GRAPH_BATCH_WINDOW_SECONDS = float(os.environ.get('GRAPH_BATCH_WINDOW_SECONDS', '0.05'))
+    GRAPH_BATCH_MAX_SIZE = int(os.environ.get('GRAPH_BATCH_MAX_SIZE', '20'))
+
+    # What a trade number looks like in email text (used before asking the LLM)
+    TRADE_NUMBER_PATTERN = os.environ.get('TRADE_NUMBER_PATTERN', r'(?<!\d)\d{4,10}(?!\d)')
+
+    # PDF attachment text extraction (process pool, per-file timeout, page cap, on-disk cache)
+    ATTACHMENT_EXTRACTION_WORKERS = int(os.environ.get('ATTACHMENT_EXTRACTION_WORKERS', '2'))
+    ATTACHMENT_EXTRACTION_TIMEOUT_SECONDS = float(os.environ.get('ATTACHMENT_EXTRACTION_TIMEOUT_SECONDS', '20'))
+    ATTACHMENT_MAX_PAGES = int(os.environ.get('ATTACHMENT_MAX_PAGES', '20'))
+    ATTACHMENT_CACHE_ENABLED = os.environ.get('ATTACHMENT_CACHE_ENABLED', 'true').lower() == 'true'
+
+    # Deterministic pre-filter in front of the LLM: emails without a trade number that
+    # are auto-replies or score at or below PREFILTER_SKIP_SCORE skip the LLM
+    PREFILTER_ENABLED = os.environ.get('PREFILTER_ENABLED', 'true').lower() == 'true'
+    PREFILTER_SKIP_SCORE = int(os.environ.get('PREFILTER_SKIP_SCORE', '-1'))
+
+    # Two-tier LLM pipeline: a cheap model classifies, the full model only extracts positives
+    LLM_TWO_TIER_ENABLED = os.environ.get('LLM_TWO_TIER_ENABLED', 'true').lower() == 'true'
+    LLM_CLASSIFICATION_MODELS = _parse_str_mapping(os.environ.get(
+        'LLM_CLASSIFICATION_MODELS',
+        'OpenAI=gpt-4o-mini,Anthropic=claude-3-5-haiku-20241022,Google=gemini-2.0-flash'
+    ))
+    # Overrides of the default extraction model per provider
+    LLM_EXTRACTION_MODELS = _parse_str_mapping(os.environ.get('LLM_EXTRACTION_MODELS', ''))
+
+    # Strip quoted history, signatures and disclaimers from the email body sent to the LLM
+    BODY_COMPACTION_ENABLED = os.environ.get('BODY_COMPACTION_ENABLED', 'true').lower() == 'true'
+
+    # Ordered LLM provider chain; providers without an API key or with an open circuit are skipped
+    LLM_PROVIDER_CHAIN = [
+        p.strip() for p in os.environ.get('LLM_PROVIDER_CHAIN', 'Anthropic,OpenAI,Google').split(',') if p.strip()
+    ]
+    LLM_PROVIDER_TIMEOUT_SECONDS = float(os.environ.get('LLM_PROVIDER_TIMEOUT_SECONDS', '120'))
+    LLM_PROVIDER_TIMEOUTS = _parse_float_mapping(os.environ.get('LLM_PROVIDER_TIMEOUTS', ''))
+    # Consecutive failures that open a provider's circuit, and how long it stays open
+    LLM_CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('LLM_CIRCUIT_FAILURE_THRESHOLD', '3'))
+    LLM_CIRCUIT_OPEN_SECONDS = float(os.environ.get('LLM_CIRCUIT_OPEN_SECONDS', '60'))
+    # Hedged requests: if a provider is slower than its own latency percentile, the same
+    # email is also sent to the next provider in the chain and the first answer wins
+    LLM_HEDGE_ENABLED = os.environ.get('LLM_HEDGE_ENABLED', 'false').lower() == 'true'
+    LLM_HEDGE_PERCENTILE = float(os.environ.get('LLM_HEDGE_PERCENTILE', '95'))
+    LLM_HEDGE_MIN_SAMPLES = int(os.environ.get('LLM_HEDGE_MIN_SAMPLES', '20'))
+
+    # Client-side rate limits per "Provider" or "Provider/model" (e.g. "Anthropic=50,OpenAI/gpt-4o-mini=500");
+    # requests queue for a slot instead of being rejected. 0 or unset means unlimited
+    LLM_RATE_LIMIT_RPM = _parse_int_mapping(os.environ.get('LLM_RATE_LIMIT_RPM', ''))
+    LLM_RATE_LIMIT_TPM = _parse_int_mapping(os.environ.get('LLM_RATE_LIMIT_TPM', ''))
+    # 429 responses pause the provider/model for retry-after (or this default) and are retried
+    LLM_RATE_LIMIT_MAX_RETRIES = int(os.environ.get('LLM_RATE_LIMIT_MAX_RETRIES', '3'))
+    LLM_RATE_LIMIT_DEFAULT_RETRY_SECONDS = float(os.environ.get('LLM_RATE_LIMIT_DEFAULT_RETRY_SECONDS', '10'))
+    # Rate-limit and routing stats are logged this often (0 disables) and served at GET /llm-metrics
+    LLM_METRICS_LOG_INTERVAL_SECONDS = float(os.environ.get('LLM_METRICS_LOG_INTERVAL_SECONDS', '300'))
+
+    # Processing attempts per email before a failing email is left alone; after a failed
+    # attempt the email is marked unread again so polling or delta mode picks it up
+    EMAIL_MAX_PROCESSING_ATTEMPTS = int(os.environ.get('EMAIL_MAX_PROCESSING_ATTEMPTS', '3'))
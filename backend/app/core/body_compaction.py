@@ -0,0 +1,145 @@
+import re
+from typing import List
+from ..config import Config
+
+# Start of a quoted earlier message in a reply thread (Outlook, Gmail, Apple Mail; Spanish and English)
+QUOTE_HEADER = re.compile(
+    r"^\s*(-{2,}\s*(original message|mensaje original|forwarded message|mensaje reenviado)\s*-{2,}"
+    r"|(de|from)\s*:.+"
+    r"|(el|on)\s.+(escribi[oó]|wrote)\s*:)\s*$",
+    re.IGNORECASE
+)
+# A "De:/From:" line only starts a quote when a header like "Enviado:/Sent:" follows
+QUOTE_HEADER_FOLLOWER = re.compile(r"^\s*(enviado|sent|fecha|date|para|to)\s*:", re.IGNORECASE)
+
+SIGNATURE_DELIMITER = re.compile(r"^\s*--\s*$")
+CLOSING_LINE = re.compile(
+    r"^\s*(saludos|atentamente|cordialmente|slds|best regards|kind regards|regards|thanks|gracias)\b[\s,.!]*\w{0,20}[\s,.!]*$",
+    re.IGNORECASE
+)
+CONTACT_LINE = re.compile(r"\b(tel|tel[eé]fono|fono|phone|cel|celular|m[oó]vil|mobile|fax)\b|@|www\.|https?://", re.IGNORECASE)
+
+DISCLAIMER = re.compile(
+    r"confidencial|confidential|privileged|aviso legal|disclaimer|destinatario|intended recipient|"
+    r"este (mensaje|correo)|this (message|e-?mail)",
+    re.IGNORECASE
+)
+MIN_DISCLAIMER_LENGTH = 150
+
+# "Producto: Forward", "Forma de Pago: SWIFT" ... but not the quoted mail headers
+KEY_VALUE = re.compile(r"^\s*([^:]{1,40}):\s*\S")
+MAIL_HEADER_LABELS = {"de", "from", "para", "to", "cc", "cco", "bcc", "enviado", "sent", "asunto", "subject", "fecha", "date"}
+
+# Trade terms in prose, e.g. "Compramos USD 1.000.000 a 950,25 con vencimiento 30-06-2025"
+AMOUNT = re.compile(r"(?<![\d.,])(\d{1,3}([.,]\d{3})+([.,]\d+)?|\d+[.,]\d+)(?![\d.,]*\d)")
+DATE = re.compile(r"\b(\d{1,2}[-/.]\d{1,2}[-/.]\d{2,4}|\d{4}-\d{2}-\d{2})\b")
+CURRENCY_CODE = re.compile(r"\b(USD|EUR|CLP|CLF|UF|GBP|JPY|CHF|CAD|AUD|CNY|BRL|MXN|PEN|COP|ARS)\b")
+
+# Quoted lines that name the trade are kept too: the quoted subject, and any line
+# with a trade number, in the book or not ("Favor confirmar la operación 4567891")
+SUBJECT_LABELS = {"asunto", "subject"}
+TRADE_NUMBER = re.compile(Config.TRADE_NUMBER_PATTERN)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)"""
+    return (len(text or '') + 3) // 4
+
+
+def is_data_line(line: str) -> bool:
+    """Whether a line looks like trade data
+
+    That is a "label: value" pair, a table row with numbers, or a sentence
+    with an amount, a date or a currency code.
+    """
+    if CONTACT_LINE.search(line) or QUOTE_HEADER.match(line):
+        return False
+    key_value = KEY_VALUE.match(line)
+    if key_value:
+        return key_value.group(1).strip().lower() not in MAIL_HEADER_LABELS
+    if re.search(r"\d", line) and re.search(r"\t|\||\S\s{2,}\S", line):
+        return True
+    return bool(AMOUNT.search(line) or DATE.search(line) or CURRENCY_CODE.search(line))
+
+
+def is_trade_reference(line: str) -> bool:
+    """Whether a quoted line names the trade: its Subject/Asunto or any line with a trade number"""
+    if CONTACT_LINE.search(line) or QUOTE_HEADER.match(line):
+        return False
+    key_value = KEY_VALUE.match(line)
+    if key_value and key_value.group(1).strip().lower() in MAIL_HEADER_LABELS:
+        return key_value.group(1).strip().lower() in SUBJECT_LABELS
+    return bool(TRADE_NUMBER.search(line))
+
+
+def compact_body(text: str) -> str:
+    """Shrink an email thread to what the LLM needs
+
+    Keeps the latest reply (without its signature and legal disclaimers)
+    and, from the quoted history, only the lines that look like trade
+    data or name the trade, each kept once.
+    """
+    if not text:
+        return text
+
+    lines = text.splitlines()
+    latest, quoted = _split_quoted_history(lines)
+    latest = _strip_signature(latest)
+
+    kept = _drop_disclaimers(latest)
+    seen = {line.strip() for line in kept if line.strip()}
+    quoted_data = []
+    for line in quoted:
+        stripped = line.strip().lstrip('>').strip()
+        if stripped and stripped not in seen and (is_data_line(stripped) or is_trade_reference(stripped)):
+            seen.add(stripped)
+            quoted_data.append(stripped)
+
+    compacted = "\n".join(kept).strip()
+    if quoted_data:
+        compacted += "\n\n[Trade data quoted from earlier messages]\n" + "\n".join(quoted_data)
+    return compacted
+
+
+def _split_quoted_history(lines: List[str]):
+    for index, line in enumerate(lines):
+        if line.lstrip().startswith('>'):
+            return lines[:index], lines[index:]
+        if QUOTE_HEADER.match(line):
+            if re.match(r"^\s*(de|from)\s*:", line, re.IGNORECASE):
+                following = [l for l in lines[index + 1:index + 4] if l.strip()]
+                if not any(QUOTE_HEADER_FOLLOWER.match(l) for l in following):
+                    continue
+            return lines[:index], lines[index:]
+    return lines, []
+
+
+def _strip_signature(lines: List[str]) -> List[str]:
+    """Cut the reply at the signature, keeping any trade data that follows it
+
+    A closing line ("Saludos," ...) only counts when contact details follow
+    it, so a "Gracias." at the top of a short reply is never mistaken for one.
+    """
+    for index in range(len(lines) - 1, -1, -1):
+        line = lines[index]
+        tail = lines[index + 1:]
+        if SIGNATURE_DELIMITER.match(line):
+            return lines[:index] + [l for l in tail if is_data_line(l)]
+        if CLOSING_LINE.match(line) and any(CONTACT_LINE.search(l) for l in tail):
+            return lines[:index + 1] + [l for l in tail if is_data_line(l)]
+    return lines
+
+
+def _drop_disclaimers(lines: List[str]) -> List[str]:
+    """Remove long paragraphs that read like legal disclaimers"""
+    kept, paragraph = [], []
+    for line in lines + ['']:
+        if line.strip():
+            paragraph.append(line)
+            continue
+        text = " ".join(paragraph)
+        if paragraph and not (len(text) >= MIN_DISCLAIMER_LENGTH and DISCLAIMER.search(text)):
+            kept.extend(paragraph)
+            kept.append('')
+        paragraph = []
+    return kept
@@ -0,0 +1,243 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+from ..config import Config
+from .logger import logger
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class _InterProcessLock:
+    """Exclusive lock on a ``.lock`` file, shared with other processes"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._file = open(self.path, 'a+')
+        if fcntl:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        else:
+            self._file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after ~10 seconds; keep waiting
+                    continue
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if fcntl:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._file.close()
+            self._file = None
+
+
+class JsonFileStore:
+    """Atomic, lock-protected reads and writes of JSON files
+
+    Writes go to a temporary file in the same directory which is fsynced and
+    renamed over the target, so readers (including the frontend) never see a
+    truncated file. Every write holds a per-path thread lock plus a
+    cross-process lock on a ``.lock`` file under STORAGE_PATH/locks, kept
+    out of the data folders because the assets folder is served statically.
+    ``schedule_write`` coalesces bursts of writes to the same file into a
+    single flush.
+    """
+
+    def __init__(self, coalesce_delay: float = 0.5):
+        self.coalesce_delay = coalesce_delay
+        self._reset_locks()
+
+    def _reset_locks(self):
+        # Also called in forked children, which must not inherit locks held by other threads
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+        self._pending = {}
+        self._pending_cond = threading.Condition()
+        self._flusher = None
+
+    def lock(self, path: str):
+        """Return a context manager holding both the thread and process lock for path"""
+        return _PathLock(self._thread_lock(path), self._lock_path(path))
+
+    def _thread_lock(self, path: str) -> threading.RLock:
+        path = os.path.abspath(path)
+        with self._locks_guard:
+            if path not in self._locks:
+                self._locks[path] = threading.RLock()
+            return self._locks[path]
+
+    @staticmethod
+    def _lock_path(path: str) -> str:
+        path = os.path.abspath(path)
+        # Hash the full path so files with the same name in different folders get different locks
+        digest = hashlib.sha1(path.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(Config.STORAGE_PATH, 'locks', f"{os.path.basename(path)}.{digest}.lock")
+
+    def read(self, path: str, default: Any = None) -> Any:
+        if not os.path.exists(path):
+            return default
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def write(self, path: str, data: Any):
+        """Atomically replace path with data, superseding any scheduled write
+
+        data may be a callable, evaluated while the lock is held so that
+        concurrent writers of the same file can't overwrite newer state.
+        """
+        with self._pending_cond:
+            self._pending.pop(os.path.abspath(path), None)
+        with self.lock(path):
+            self._write_atomic(path, data() if callable(data) else data)
+
+    def write_immutable(self, path: str, data: Any):
+        """Atomically write a content-addressed file
+
+        No lock is taken: every writer of such a path writes the same content.
+        """
+        self._write_atomic(path, data)
+
+    def update(self, path: str, mutate: Callable[[Any], Any], default: Callable[[], Any] = list) -> Any:
+        """Read, mutate in place and write back path under the lock
+
+        Returns whatever mutate returns. If mutate raises, the file is untouched.
+        """
+        with self.lock(path):
+            data = self.read(path)
+            if data is None:
+                data = default()
+            result = mutate(data)
+            self._write_atomic(path, data)
+            return result
+
+    def schedule_write(self, path: str, data: Any, delay: Optional[float] = None):
+        """Write data to path after a short delay, coalescing repeated calls
+
+        data may be a callable; it is called at flush time so the most recent
+        state is written once, however many writes were scheduled.
+        """
+        path = os.path.abspath(path)
+        with self._pending_cond:
+            deadline = self._pending.get(path, (None, None))[1]
+            if deadline is None:
+                deadline = time.monotonic() + (self.coalesce_delay if delay is None else delay)
+            self._pending[path] = (data, deadline)
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._run_flusher, name="json-file-store-flusher", daemon=True)
+                self._flusher.start()
+            self._pending_cond.notify()
+
+    def flush(self, path: Optional[str] = None):
+        """Write scheduled data now, for one path or for all of them"""
+        with self._pending_cond:
+            if path is None:
+                due = self._pending
+                self._pending = {}
+            else:
+                path = os.path.abspath(path)
+                due = {path: self._pending.pop(path)} if path in self._pending else {}
+        self._write_pending(due)
+
+    def _run_flusher(self):
+        while True:
+            with self._pending_cond:
+                while not self._pending:
+                    self._pending_cond.wait()
+                now = time.monotonic()
+                next_deadline = min(deadline for _, deadline in self._pending.values())
+                if next_deadline > now:
+                    self._pending_cond.wait(next_deadline - now)
+                    continue
+                due = {path: entry for path, entry in self._pending.items() if entry[1] <= now}
+                for path in due:
+                    del self._pending[path]
+            self._write_pending(due)
+
+    def _write_pending(self, due: Dict):
+        for path, (data, _) in due.items():
+            try:
+                with self.lock(path):
+                    self._write_atomic(path, data() if callable(data) else data)
+            except Exception as e:
+                # The flusher thread must keep running; the next write will retry
+                logger.log_exception(
+                    e,
+                    message="Error writing scheduled JSON file",
+                    user_id="system",
+                    data={"path": path},
+                    tags=["file", "write", "error"]
+                )
+
+    @staticmethod
+    def _write_atomic(path: str, data: Any):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            # mkstemp creates the file private to the owner
+            os.chmod(tmp_path, 0o644)
+
+            # On Windows the rename fails while a reader holds the file open
+            for attempt in range(10):
+                try:
+                    os.replace(tmp_path, path)
+                    break
+                except PermissionError:
+                    if attempt == 9:
+                        raise
+                    time.sleep(0.05)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+class _PathLock:
+    def __init__(self, thread_lock: threading.RLock, lock_path: str):
+        self._thread_lock = thread_lock
+        self._process_lock = _InterProcessLock(lock_path)
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        try:
+            self._process_lock.__enter__()
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self._process_lock.__exit__(exc_type, exc, tb)
+        finally:
+            self._thread_lock.release()
+
+
+# Shared by every service so all writers of a file go through the same locks
+file_store = JsonFileStore()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=file_store._reset_locks)
@@ -0,0 +1,63 @@
+import threading
+import time
+from typing import Awaitable, Callable, Optional
+from ..config import Config
+
+
+class FolderIdCache:
+    """Process-wide cache of mailbox folder path -> Graph folder ID
+
+    Resolving a path like "Inbox/Confirmations/Not Relevant" takes one Graph
+    call per path segment, while folder IDs practically never change. Entries
+    expire after ttl seconds and are dropped early with ``invalidate()`` when
+    Graph reports the folder as not found.
+    """
+
+    def __init__(self, ttl: float = 3600.0):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(user_email: str, folder_path: str):
+        return (user_email.lower(), folder_path.strip("/").lower())
+
+    def get_cached(self, user_email: str, folder_path: str) -> Optional[str]:
+        key = self._key(user_email, folder_path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            folder_id, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            return folder_id
+
+    async def get(self, user_email: str, folder_path: str,
+                  resolve: Callable[[str], Awaitable[Optional[str]]]) -> Optional[str]:
+        """Return the folder ID, calling resolve(folder_path) on a miss"""
+        folder_id = self.get_cached(user_email, folder_path)
+        if folder_id is not None:
+            return folder_id
+
+        folder_id = await resolve(folder_path)
+        # Missing folders aren't cached so they are found once created
+        if folder_id:
+            with self._lock:
+                self._entries[self._key(user_email, folder_path)] = (folder_id, time.monotonic() + self.ttl)
+        return folder_id
+
+    def invalidate(self, user_email: str, folder_path: Optional[str] = None):
+        """Forget one folder, or every folder of the mailbox"""
+        with self._lock:
+            if folder_path is not None:
+                self._entries.pop(self._key(user_email, folder_path), None)
+            else:
+                user_key = user_email.lower()
+                for key in [k for k in self._entries if k[0] == user_key]:
+                    del self._entries[key]
+
+
+# Shared by every service that resolves folder paths
+folder_cache = FolderIdCache(ttl=Config.FOLDER_CACHE_TTL_SECONDS)
@@ -0,0 +1,150 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+
+class LLMResponseCache:
+    """Content-addressed on-disk cache of LLM responses backed by SQLite
+
+    Entries are keyed on a SHA-256 of (provider, model, system message, prompt),
+    expire after ``ttl_seconds`` and the least recently used entries are evicted
+    once the cache grows beyond ``max_entries``.
+
+    Lookups are read-only: access times are collected in memory and written
+    with the next ``set()``, so a hit costs no write or fsync. The database
+    runs in WAL mode with synchronous=NORMAL, since losing the last few
+    entries on a power cut only costs a cache miss.
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: int = 86400, max_entries: int = 5000,
+                 disabled_providers: Optional[Iterable[str]] = None, enabled: bool = True):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.disabled_providers = {p.lower() for p in (disabled_providers or [])}
+        self.enabled = enabled
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._conn = None
+        # cache_key -> last access time, written with the next set()
+        self._pending_touches = {}
+        if self.enabled:
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_responses (
+                    cache_key TEXT PRIMARY KEY,
+                    provider TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_accessed REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_llm_responses_last_accessed ON llm_responses (last_accessed)"
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def make_key(provider: str, model: str, system_message: str, prompt: str) -> str:
+        """Hash the request inputs into a cache key"""
+        digest = hashlib.sha256()
+        for part in (provider, model, system_message, prompt):
+            encoded = (part or "").encode("utf-8")
+            # Length-prefix each part so field boundaries can't collide
+            digest.update(str(len(encoded)).encode("ascii") + b":" + encoded)
+        return digest.hexdigest()
+
+    def is_enabled_for(self, provider: str) -> bool:
+        return self.enabled and provider.lower() not in self.disabled_providers
+
+    def get(self, cache_key: str) -> Optional[str]:
+        """Return the cached response, or None on a miss or expired entry"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM llm_responses WHERE cache_key = ?",
+                (cache_key,)
+            ).fetchone()
+
+            # Expired entries are left for the next set() to evict
+            if row is None or now - row[1] > self.ttl_seconds:
+                self.misses += 1
+                return None
+
+            self._pending_touches[cache_key] = now
+            self.hits += 1
+            return row[0]
+
+    def set(self, cache_key: str, provider: str, model: str, response: str):
+        """Store a response and evict expired / least recently used entries"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO llm_responses
+                    (cache_key, provider, model, response, created_at, last_accessed)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (cache_key, provider, model, response, now, now)
+            )
+            self._write_touches()
+            self._evict(now)
+            self._conn.commit()
+
+    def _write_touches(self):
+        if self._pending_touches:
+            self._conn.executemany(
+                "UPDATE llm_responses SET last_accessed = ? WHERE cache_key = ?",
+                [(accessed, key) for key, accessed in self._pending_touches.items()]
+            )
+            self._pending_touches = {}
+
+    def _evict(self, now: float):
+        cursor = self._conn.execute(
+            "DELETE FROM llm_responses WHERE created_at < ?",
+            (now - self.ttl_seconds,)
+        )
+        self.evictions += max(cursor.rowcount, 0)
+
+        count = self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+        if count > self.max_entries:
+            cursor = self._conn.execute(
+                """
+                DELETE FROM llm_responses WHERE cache_key IN (
+                    SELECT cache_key FROM llm_responses ORDER BY last_accessed ASC LIMIT ?
+                )
+                """,
+                (count - self.max_entries,)
+            )
+            self.evictions += max(cursor.rowcount, 0)
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._write_touches()
+                self._conn.commit()
+                self._conn.close()
+                self._conn = None
+                self.enabled = False
@@ -0,0 +1,117 @@
+import bisect
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+# Upper bounds in seconds of the latency histogram buckets: 0.1s to about 10 minutes, 25% apart
+LATENCY_BUCKETS = tuple(round(0.1 * 1.25 ** i, 3) for i in range(40))
+
+
+class LatencyHistogram:
+    """Bucketed latency distribution of one provider/model
+
+    Fixed buckets keep recording O(log n) and memory constant however many
+    requests are seen; percentiles are accurate to the bucket width.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self._count = 0
+        self._total = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    def record(self, seconds: float):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self._counts[index] += 1
+            self._count += 1
+            self._total += seconds
+            self._max = max(self._max, seconds)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """Upper bound of the bucket holding the given percentile, capped at the max (None without samples)"""
+        with self._lock:
+            if not self._count:
+                return None
+            target = self._count * percent / 100.0
+            seen = 0
+            for index, count in enumerate(self._counts):
+                seen += count
+                if seen >= target:
+                    return min(self.buckets[index], self._max) if index < len(self.buckets) else self._max
+            return self._max
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            count, total, maximum = self._count, self._total, self._max
+        return {
+            "count": count,
+            "mean_seconds": round(total / count, 3) if count else None,
+            "p50_seconds": self.percentile(50),
+            "p95_seconds": self.percentile(95),
+            "p99_seconds": self.percentile(99),
+            "max_seconds": round(maximum, 3) if count else None
+        }
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one LLM provider
+
+    After failure_threshold failures in a row the circuit opens and the
+    provider is skipped for open_seconds. It is then half-open: requests go
+    through again, the first success closes the circuit and the first
+    failure opens it for another open_seconds.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 3, open_seconds: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = max(1, failure_threshold)
+        self.open_seconds = open_seconds
+        self._clock = clock
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if self._clock() - self._opened_at >= self.open_seconds:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow_request(self) -> bool:
+        return self.state != self.OPEN
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self) -> bool:
+        """Count a failure; returns True when this failure opened the circuit"""
+        with self._lock:
+            self._failures += 1
+            state = self._state()
+            if state == self.HALF_OPEN or (state == self.CLOSED and self._failures >= self.failure_threshold):
+                self._opened_at = self._clock()
+                return True
+            return False
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {"state": self._state(), "consecutive_failures": self._failures}
@@ -1,8 +1,266 @@
+import atexit
+import logging
+import queue
+import threading
+import time
 from core_logging.client import LogClient, EventType, LogLevel
+from ..config import Config
+
+# Methods that are queued and shipped from the background thread. log_exception
+# is not one of them: it captures the traceback of the exception being handled,
+# which only exists on the caller's thread, so it is sent synchronously.
+_BUFFERED_METHODS = ("debug", "info", "warning", "error", "critical")
+_LOW_PRIORITY_METHODS = ("debug", "info")
+
+
+class BufferedLogClient:
+    """Non-blocking front for LogClient
+
+    Log calls are put on a bounded in-memory queue and shipped to the log
+    server in batches by a background thread, so logging never adds network
+    latency to email processing. Under backpressure DEBUG/INFO events are
+    sampled once the queue passes the high watermark and dropped when it is
+    full; WARNING and above evict the oldest queued event instead. Anything
+    still queued is flushed on shutdown. log_exception calls go straight to
+    the wrapped client so the traceback is captured where it happened.
+
+    Attributes that aren't log methods are passed through to the wrapped client.
+    """
+
+    def __init__(self, client: LogClient, max_queue_size: int = 10000, batch_size: int = 100,
+                 flush_interval: float = 1.0, high_watermark: float = 0.8, sample_rate: int = 10):
+        self._client = client
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.high_watermark = int(max_queue_size * high_watermark)
+        self.sample_rate = max(1, sample_rate)
+
+        self._sample_counter = 0
+        self._dropped = 0
+        self._sampled_out = 0
+        self._stats_lock = threading.Lock()
+
+        self._stop = threading.Event()
+        self._worker = threading.Thread(target=self._run, name="log-shipper", daemon=True)
+        self._worker.start()
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name in _BUFFERED_METHODS:
+            def enqueue(*args, **kwargs):
+                self._enqueue(name, args, kwargs)
+            return enqueue
+        return getattr(self._client, name)
+
+    def _enqueue(self, method, args, kwargs):
+        low_priority = method in _LOW_PRIORITY_METHODS
+
+        if low_priority and self._queue.qsize() >= self.high_watermark:
+            with self._stats_lock:
+                self._sample_counter += 1
+                if self._sample_counter % self.sample_rate:
+                    self._sampled_out += 1
+                    return
+
+        try:
+            self._queue.put_nowait((method, args, kwargs))
+            return
+        except queue.Full:
+            pass
+
+        if not low_priority:
+            # Make room for warnings and errors by evicting the oldest event
+            try:
+                self._queue.get_nowait()
+                self._queue.task_done()
+                self._queue.put_nowait((method, args, kwargs))
+            except (queue.Empty, queue.Full):
+                pass
+        with self._stats_lock:
+            self._dropped += 1
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._ship_batch(timeout=self.flush_interval)
+        # Drain whatever is left after shutdown was requested
+        while self._ship_batch(timeout=0):
+            pass
+
+    def _ship_batch(self, timeout: float) -> int:
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=timeout) if timeout else self._queue.get_nowait())
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+
+        if not batch:
+            self._report_dropped()
+            return 0
+
+        for method, args, kwargs in batch:
+            try:
+                getattr(self._client, method)(*args, **kwargs)
+            except Exception as e:
+                print(f"Error shipping log event: {e}")
+        try:
+            self._client.flush()
+        except Exception as e:
+            print(f"Error flushing log client: {e}")
+
+        for _ in batch:
+            self._queue.task_done()
+        self._report_dropped()
+        return len(batch)
+
+    def _report_dropped(self):
+        with self._stats_lock:
+            dropped, sampled_out = self._dropped, self._sampled_out
+            self._dropped = self._sampled_out = 0
+        if dropped or sampled_out:
+            self._client.warning(
+                f"Log queue under backpressure: {dropped} events dropped, {sampled_out} sampled out",
+                event_type=EventType.SYSTEM_EVENT,
+                user_id="system",
+                data={"dropped": dropped, "sampled_out": sampled_out, "queue_size": self._queue.qsize()},
+                tags=["logging", "backpressure"]
+            )
+
+    def is_enabled_for(self, level: str) -> bool:
+        """Whether events at level (e.g. "INFO") pass the configured LOG_LEVEL"""
+        return logging.getLevelName(level) >= logging.getLevelName(Config.LOG_LEVEL.upper())
+
+    def flush(self, timeout: float = 5.0):
+        """Wait (up to timeout seconds) until every queued event has been shipped"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self._client.flush()
+
+    def shutdown(self, timeout: float = 5.0):
+        """Ship the remaining events and shut the wrapped client down (once)"""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._worker.join(timeout)
+        self._client.shutdown()
+
+
+class LogSampler:
+    """1-in-N sampling of hot-path log events, configured per tag prefix
+
+    Rates are keyed on dotted tag prefixes, e.g. {"trade.lookup": 100} keeps
+    the first and then every 100th event whose tags start with
+    ["trade", "lookup"]. Events with no configured prefix are always kept.
+    """
+
+    def __init__(self, rates: dict):
+        self.rates = {tuple(key.split(".")): rate for key, rate in rates.items() if rate > 0}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def should_log(self, tags) -> bool:
+        tags = tuple(tags)
+        for prefix, rate in self.rates.items():
+            if tags[:len(prefix)] == prefix:
+                with self._lock:
+                    count = self._counters.get(prefix, 0)
+                    self._counters[prefix] = count + 1
+                return count % rate == 0
+        return True
+
+
+class EventCounter:
+    """Counts hot-path outcomes and logs one summary event per interval
+
+    Replaces per-call log spam with e.g. "250 lookups, 3 misses in last 60s".
+    A background thread emits the summary every interval, and whatever was
+    counted since the last summary is emitted on close() and at exit. Services
+    get a process-wide counter from get_event_counter().
+    """
+
+    def __init__(self, client, name: str, tags, interval: float = 60.0, entity=None):
+        self._client = client
+        self.name = name
+        self.tags = list(tags)
+        self.interval = interval
+        self.entity = entity
+
+        self._counts = {}
+        self._window_start = time.monotonic()
+        self._lock = threading.Lock()
+
+        self._stop = threading.Event()
+        self._worker = threading.Thread(target=self._run, name=f"event-counter-{name}", daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
+    def record(self, outcome: str):
+        with self._lock:
+            self._counts[outcome] = self._counts.get(outcome, 0) + 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def flush(self):
+        """Log the summary of the current window, if anything was counted"""
+        now = time.monotonic()
+        with self._lock:
+            counts, self._counts = self._counts, {}
+            elapsed = now - self._window_start
+            self._window_start = now
+        if not counts:
+            return
+
+        total = sum(counts.values())
+        breakdown = ", ".join(f"{count} {outcome}" for outcome, count in sorted(counts.items()))
+        self._client.info(
+            f"{total} {self.name} ({breakdown}) in last {int(elapsed)}s",
+            event_type=EventType.SYSTEM_EVENT,
+            entity=self.entity,
+            user_id="system",
+            data={"total": total, "window_seconds": int(elapsed), **counts},
+            tags=self.tags + ["summary"]
+        )
+
+    def close(self):
+        """Stop the timer and emit the last partial window (once)"""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self.flush()
+
+
+# Process-wide counters by name, so each has a single timer thread and exit hook
+_event_counters = {}
+_event_counters_lock = threading.Lock()
+
+def get_event_counter(name: str, tags, interval: float = 60.0, entity=None) -> EventCounter:
+    """Return the shared EventCounter called name, creating it on first use"""
+    with _event_counters_lock:
+        counter = _event_counters.get(name)
+        if counter is None:
+            counter = _event_counters[name] = EventCounter(logger, name, tags, interval=interval, entity=entity)
+        return counter
+
 
 # Initialize the logger
-logger = LogClient(
-    app_name="Confirmation Manager",
-    api_url="http://localhost:8001/api/",
-    default_source="confirmation_manager"
-)
\ No newline at end of file
+logger = BufferedLogClient(
+    LogClient(
+        app_name="Confirmation Manager",
+        api_url="http://localhost:8001/api/",
+        default_source="confirmation_manager"
+    ),
+    max_queue_size=Config.LOG_QUEUE_SIZE,
+    batch_size=Config.LOG_BATCH_SIZE,
+    flush_interval=Config.LOG_FLUSH_INTERVAL_SECONDS
+)
+
+atexit.register(logger.shutdown)
+
+# Shared sampler for hot-path events (see LOG_SAMPLE_RATES)
+log_sampler = LogSampler(Config.LOG_SAMPLE_RATES)
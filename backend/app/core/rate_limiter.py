@@ -0,0 +1,125 @@
+import asyncio
+import time
+from typing import Callable, Dict
+
+
+class TokenBucket:
+    """Continuously refilling bucket holding up to per_minute units"""
+
+    def __init__(self, per_minute: float, now: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self._updated = now
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until amount units are available (amounts above capacity wait for a full bucket)"""
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.level
+        return missing / self.rate if missing > 0 else 0.0
+
+    def consume(self, amount: float, now: float):
+        """Take amount units; the level may go negative, which later requests wait off"""
+        self._refill(now)
+        self.level -= amount
+
+
+class RateLimiter:
+    """Client-side RPM/TPM limiter for one provider/model
+
+    Requests wait in FIFO order until both the request bucket and the token
+    bucket can cover them, instead of being sent and rejected with a 429.
+    When the provider still answers 429, pause() holds every queued request
+    back for the retry-after period. A limit of 0 means unlimited.
+    """
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0,
+                 clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        now = clock()
+        self.requests = TokenBucket(requests_per_minute, now) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute, now) if tokens_per_minute > 0 else None
+        self._paused_until = 0.0
+        # asyncio.Lock wakes its waiters in FIFO order, which makes it the queue;
+        # it is bound to one event loop, so a new loop gets a new lock (_get_lock)
+        self._lock = None
+        self._lock_loop = None
+
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.total_requests = 0
+        self.delayed_requests = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.rate_limited = 0
+
+    async def acquire(self, tokens: int = 0) -> float:
+        """Wait until a request of about `tokens` tokens may be sent; returns the seconds waited"""
+        start = self._clock()
+        delayed = False
+        self.queue_depth += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        try:
+            async with self._get_lock():
+                while True:
+                    delay = self._wait_time(tokens)
+                    if delay <= 0:
+                        break
+                    delayed = True
+                    await asyncio.sleep(delay)
+                now = self._clock()
+                if self.requests:
+                    self.requests.consume(1, now)
+                if self.tokens:
+                    self.tokens.consume(tokens, now)
+        finally:
+            self.queue_depth -= 1
+
+        waited = self._clock() - start
+        self.total_requests += 1
+        self.total_wait_seconds += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        if delayed:
+            self.delayed_requests += 1
+        return waited
+
+    def _get_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._lock_loop is not loop:
+            self._lock, self._lock_loop = asyncio.Lock(), loop
+        return self._lock
+
+    def _wait_time(self, tokens: int) -> float:
+        now = self._clock()
+        delay = self._paused_until - now
+        if self.requests:
+            delay = max(delay, self.requests.wait_time(1, now))
+        if self.tokens:
+            delay = max(delay, self.tokens.wait_time(tokens, now))
+        return delay
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int):
+        """Correct the token bucket once the provider reports the real usage"""
+        if self.tokens and actual_tokens:
+            self.tokens.consume(actual_tokens - estimated_tokens, self._clock())
+
+    def pause(self, seconds: float):
+        """Hold back all requests for `seconds` after the provider answered 429"""
+        self.rate_limited += 1
+        self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+    def snapshot(self) -> Dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "requests": self.total_requests,
+            "delayed_requests": self.delayed_requests,
+            "mean_wait_seconds": round(self.total_wait_seconds / self.total_requests, 3) if self.total_requests else 0.0,
+            "max_wait_seconds": round(self.max_wait_seconds, 3),
+            "rate_limited": self.rate_limited,
+            "paused_seconds": round(max(0.0, self._paused_until - self._clock()), 3)
+        }
@@ -0,0 +1,35 @@
+import io
+from typing import Optional
+
+# Runs inside ProcessPoolExecutor workers: keep this module free of app imports
+# so the workers don't need anything beyond PyPDF2 to run it. Spawned workers
+# still re-import the main script as __mp_main__ (run.py imports app.main,
+# which sets up the log client and its shipper thread), so entry points must
+# keep their startup code under `if __name__ == "__main__"`.
+
+
+def is_pdf(name: str, content_type: str) -> bool:
+    return (content_type or '').lower() == 'application/pdf' or (name or '').lower().endswith('.pdf')
+
+
+def extract_pdf_text(content_bytes: bytes, max_pages: Optional[int] = None) -> str:
+    """Extract the text of (at most max_pages pages of) a PDF"""
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(io.BytesIO(content_bytes))
+    pages = reader.pages if not max_pages else reader.pages[:max_pages]
+    return "\n".join(page.extract_text() or '' for page in pages)
+
+
+def extract_text(name: str, content_type: str, content_bytes: bytes, max_pages: Optional[int] = None) -> str:
+    """Extract text from a PDF or plain-text attachment"""
+    name = (name or '').lower()
+    content_type = (content_type or '').lower()
+
+    if is_pdf(name, content_type):
+        return extract_pdf_text(content_bytes, max_pages)
+
+    if content_type.startswith('text/') or name.endswith(('.txt', '.csv')):
+        return content_bytes.decode('utf-8', errors='replace')
+
+    return 'No text extracted'
@@ -1,13 +1,15 @@
 # backend/app/main.py
 import asyncio
-from flask import Flask
 from . import create_app
 from .config import Config
-from .services.email_processor_service import EmailProcessorService
-from .services.llm_service import LLMService
-from .services.confirmation_service import ConfirmationService
-from azure.identity import ClientSecretCredential
-from msgraph import GraphServiceClient
+from .api.deps import (
+    get_graph_client,
+    get_email_processor_service,
+    get_graph_batch_service,
+    get_llm_service,
+    get_confirmation_service,
+    get_notification_ingest_service
+)
 import threading
 from .core.logger import logger
 from core_logging.client import EventType, LogLevel
@@ -15,13 +17,8 @@ from core_logging.client import EventType, LogLevel
 # Create the Flask app
 app = create_app()
 
-def get_graph_client():
-    credentials = ClientSecretCredential(
-        tenant_id=Config.GRAPH_TENANT_ID,
-        client_id=Config.GRAPH_CLIENT_ID,
-        client_secret=Config.GRAPH_CLIENT_SECRET
-    )
-    return GraphServiceClient(credentials=credentials)
+# Folders emails are moved between; their IDs are resolved once at startup
+KNOWN_FOLDERS = ["Inbox/Confirmations", "Inbox/Confirmations/Not Relevant"]
 
 async def monitor_outlook_emails():
     """Start monitoring Outlook folder for new emails"""
@@ -38,15 +35,11 @@ async def monitor_outlook_emails():
         tags=["startup", "monitoring"]
     )
     
-    # Create services
-    email_processor = EmailProcessorService(graph_client=graph_client)
-    llm_service = LLMService(graph_client=graph_client)
-    confirmation_service = ConfirmationService(
-        graph_client=graph_client,
-        llm_service=llm_service,
-        email_processor_service=email_processor,
-        logger=logger  # Pass logger to confirmation service
-    )
+    # Use the process-wide services shared with the Flask endpoints
+    llm_service = get_llm_service()
+    confirmation_service = get_confirmation_service()
+    
+    await get_email_processor_service().warm_folder_cache(KNOWN_FOLDERS)
     
     # Create and configure the monitor
     monitor = OutlookMonitorService(user_email, graph_client)
@@ -55,17 +48,54 @@ async def monitor_outlook_emails():
     monitor.register_event_handler("new_unread_email", 
     lambda emails: asyncio.create_task(confirmation_service.handle_new_unread_email(emails)))
 
+    # With change notifications enabled, new emails are pushed to the pipeline
+    # and polling only reconciles anything a notification missed
+    push_enabled = bool(Config.GRAPH_NOTIFICATION_URL)
+    check_interval = Config.RECONCILE_INTERVAL_SECONDS if push_enabled else 10
+    background_tasks = []
+    if Config.LLM_METRICS_LOG_INTERVAL_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(
+            llm_service.report_metrics(Config.LLM_METRICS_LOG_INTERVAL_SECONDS)))
+    if push_enabled:
+        ingest_service = get_notification_ingest_service()
+        ingest_service.attach(asyncio.get_running_loop())
+        background_tasks.append(asyncio.create_task(ingest_service.run(confirmation_service)))
+
+        folder_id = await monitor.get_folder_id("Inbox/Confirmations")
+        if folder_id:
+            background_tasks.append(asyncio.create_task(ingest_service.maintain_subscription(folder_id)))
+
     logger.info(
         f"Starting email monitoring for {user_email}",
         event_type=EventType.SYSTEM_EVENT,
         user_id="system",
         entity="Banco ABC",
-        data={"folder": "Inbox/Confirmations", "check_interval": 10},
+        data={
+            "folder": "Inbox/Confirmations",
+            "check_interval": check_interval,
+            "mode": Config.MONITOR_MODE,
+            "push_notifications": push_enabled
+        },
         tags=["startup", "monitoring"]
     )
     
     # Start monitoring
-    await monitor.monitor_folder("Inbox/Confirmations", check_interval=10)
+    try:
+        if Config.MONITOR_MODE == "delta":
+            await monitor.monitor_folder_delta(
+                "Inbox/Confirmations",
+                min_interval=check_interval if push_enabled else None,
+                max_interval=check_interval if push_enabled else None
+            )
+        else:
+            await monitor.monitor_folder("Inbox/Confirmations", check_interval=check_interval)
+    finally:
+        for task in background_tasks:
+            task.cancel()
+        graph_batch = get_graph_batch_service()
+        if graph_batch:
+            await graph_batch.close()
+        await llm_service.close()
 
 def start_email_monitor():
     """Run the email monitor in a separate thread"""
@@ -0,0 +1,570 @@
+# backend/app/repositories/match_repository.py
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+from ..config import Config
+from ..core.logger import logger
+from ..core.file_store import file_store
+from core_logging.client import EventType
+
+# Collection names, matching the JSON snapshot files the frontend reads
+IDENTIFIED_TRADES = 'matched_trades'
+EMAIL_MATCHES = 'email_matches'
+COLLECTIONS = (IDENTIFIED_TRADES, EMAIL_MATCHES)
+
+
+class MatchNotFoundError(LookupError):
+    """No email match exists for the given trade ID"""
+
+
+class NoPreviousStatusError(ValueError):
+    """The email match has no previous status to revert to"""
+
+
+class MatchRepository:
+    """Storage interface for identified trades and email matches
+
+    Services call this instead of touching matched_trades.json and
+    email_matches.json directly. Every backend keeps those JSON files up to
+    date in the assets folder, because the frontend reads them as static files.
+    """
+
+    def __init__(self, assets_path: str = None):
+        self.assets_path = assets_path or Config.ASSETS_PATH
+
+    def snapshot_path(self, collection: str) -> str:
+        if collection not in COLLECTIONS:
+            raise ValueError(f"Invalid file type: {collection}")
+        return os.path.join(self.assets_path, f"{collection}.json")
+
+    def _write_snapshot(self, collection: str, records: List[Dict]):
+        file_store.write(self.snapshot_path(collection), records)
+
+    def _read_snapshot(self, collection: str) -> List[Dict]:
+        return file_store.read(self.snapshot_path(collection), default=[])
+
+    def add_identified_trade(self, trade: Dict):
+        raise NotImplementedError
+
+    def add_email_match(self, match: Dict):
+        raise NotImplementedError
+
+    def update_email_status(self, email_id, status: str) -> str:
+        """Set the status of the email match and return its previous status"""
+        raise NotImplementedError
+
+    def undo_status_change(self, email_id) -> str:
+        """Revert the email match to its previous status and return it"""
+        raise NotImplementedError
+
+    def clear(self, collection: str):
+        raise NotImplementedError
+
+    def list_records(self, collection: str) -> List[Dict]:
+        raise NotImplementedError
+
+    def flush(self):
+        """Make sure the JSON snapshots reflect every write so far"""
+
+    def close(self):
+        self.flush()
+
+    @staticmethod
+    def _apply_status_update(match: Dict, status: str) -> str:
+        previous_status = match.get("status", "")
+        match["previous_status"] = previous_status
+        match["status"] = status
+        return previous_status
+
+    @staticmethod
+    def _apply_status_undo(match: Dict) -> str:
+        if "previous_status" not in match:
+            raise NoPreviousStatusError("No previous status found to undo")
+        match["status"] = match["previous_status"]
+        return match["previous_status"]
+
+
+class JsonMatchRepository(MatchRepository):
+    """Stores matches directly in the JSON snapshot files"""
+
+    def _append(self, collection: str, record: Dict):
+        file_store.update(self.snapshot_path(collection), lambda records: records.append(record))
+
+    def _update_match(self, email_id, update) -> str:
+        path = self.snapshot_path(EMAIL_MATCHES)
+        if not os.path.exists(path):
+            raise FileNotFoundError("Email matches file not found")
+
+        def apply(matches):
+            for match in matches:
+                if match.get("InferredTradeID") == email_id:
+                    return update(match)
+            raise MatchNotFoundError(f"Email with ID {email_id} not found")
+
+        # Read-modify-write under the file lock so concurrent writers can't lose updates
+        return file_store.update(path, apply)
+
+    def add_identified_trade(self, trade: Dict):
+        self._append(IDENTIFIED_TRADES, trade)
+
+    def add_email_match(self, match: Dict):
+        self._append(EMAIL_MATCHES, match)
+
+    def update_email_status(self, email_id, status: str) -> str:
+        return self._update_match(email_id, lambda match: self._apply_status_update(match, status))
+
+    def undo_status_change(self, email_id) -> str:
+        return self._update_match(email_id, self._apply_status_undo)
+
+    def clear(self, collection: str):
+        path = self.snapshot_path(collection)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{collection}.json not found")
+        self._write_snapshot(collection, [])
+
+    def list_records(self, collection: str) -> List[Dict]:
+        return self._read_snapshot(collection)
+
+
+class SqliteMatchRepository(MatchRepository):
+    """Stores matches in SQLite (WAL mode) and exports the JSON snapshots
+
+    Inserts from the ingest path are O(log N) and the JSON export they trigger
+    is debounced by ``export_delay`` seconds. Status changes made from the UI
+    export immediately, because the frontend reloads the snapshot right after.
+    """
+
+    def __init__(self, db_path: str = None, assets_path: str = None, export_delay: float = None):
+        super().__init__(assets_path)
+        self.db_path = db_path or os.path.join(Config.STORAGE_PATH, 'matches.sqlite3')
+        self.export_delay = Config.STORAGE_EXPORT_DELAY_SECONDS if export_delay is None else export_delay
+
+        self._lock = threading.RLock()
+
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS identified_trades (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    trade_number TEXT,
+                    identified_at TEXT,
+                    data TEXT NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_identified_trades_trade_number ON identified_trades (trade_number)"
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS email_matches (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    inferred_trade_id INTEGER,
+                    status TEXT,
+                    previous_status TEXT,
+                    data TEXT NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_email_matches_inferred_trade_id ON email_matches (inferred_trade_id)"
+            )
+
+        # Tables that start empty are seeded from the existing JSON snapshots, so
+        # the first export can't replace them with nothing
+        self._import_into_empty_tables()
+
+    @staticmethod
+    def _identified_trade_row(trade: Dict):
+        return (
+            str(trade.get("TradeNumber")),
+            trade.get("identified_at"),
+            json.dumps(trade, ensure_ascii=False)
+        )
+
+    @staticmethod
+    def _email_match_row(match: Dict):
+        record = dict(match)
+        status = record.pop("status", None)
+        previous_status = record.pop("previous_status", None)
+        return (
+            record.get("InferredTradeID"),
+            status,
+            previous_status,
+            json.dumps(record, ensure_ascii=False)
+        )
+
+    def _insert(self, collection: str, records: List[Dict]):
+        if collection == IDENTIFIED_TRADES:
+            self._conn.executemany(
+                "INSERT INTO identified_trades (trade_number, identified_at, data) VALUES (?, ?, ?)",
+                [self._identified_trade_row(record) for record in records]
+            )
+        else:
+            self._conn.executemany(
+                """
+                INSERT INTO email_matches (inferred_trade_id, status, previous_status, data)
+                VALUES (?, ?, ?, ?)
+                """,
+                [self._email_match_row(record) for record in records]
+            )
+
+    def add_identified_trade(self, trade: Dict):
+        with self._lock, self._conn:
+            self._insert(IDENTIFIED_TRADES, [trade])
+        self._schedule_export(IDENTIFIED_TRADES)
+
+    def add_email_match(self, match: Dict):
+        with self._lock, self._conn:
+            self._insert(EMAIL_MATCHES, [match])
+        self._schedule_export(EMAIL_MATCHES)
+
+    def _find_match(self, email_id):
+        row = self._conn.execute(
+            """
+            SELECT id, status, previous_status FROM email_matches
+            WHERE inferred_trade_id = ? ORDER BY id LIMIT 1
+            """,
+            (email_id,)
+        ).fetchone()
+        if row is None:
+            raise MatchNotFoundError(f"Email with ID {email_id} not found")
+        return row
+
+    def update_email_status(self, email_id, status: str) -> str:
+        with self._lock:
+            with self._conn:
+                row_id, current_status, _ = self._find_match(email_id)
+                previous_status = current_status or ""
+                self._conn.execute(
+                    "UPDATE email_matches SET status = ?, previous_status = ? WHERE id = ?",
+                    (status, previous_status, row_id)
+                )
+        self.export_snapshot(EMAIL_MATCHES)
+        return previous_status
+
+    def undo_status_change(self, email_id) -> str:
+        with self._lock:
+            with self._conn:
+                row_id, _, previous_status = self._find_match(email_id)
+                if previous_status is None:
+                    raise NoPreviousStatusError("No previous status found to undo")
+                self._conn.execute(
+                    "UPDATE email_matches SET status = ? WHERE id = ?",
+                    (previous_status, row_id)
+                )
+        self.export_snapshot(EMAIL_MATCHES)
+        return previous_status
+
+    def clear(self, collection: str):
+        table = self._table(collection)
+        with self._lock:
+            with self._conn:
+                self._conn.execute(f"DELETE FROM {table}")
+        self.export_snapshot(collection)
+
+    def list_records(self, collection: str) -> List[Dict]:
+        table = self._table(collection)
+        with self._lock:
+            if table == 'email_matches':
+                rows = self._conn.execute(
+                    "SELECT data, status, previous_status FROM email_matches ORDER BY id"
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT data, NULL, NULL FROM identified_trades ORDER BY id"
+                ).fetchall()
+
+        records = []
+        for data, status, previous_status in rows:
+            record = json.loads(data)
+            if table == 'email_matches':
+                record["status"] = status
+                if previous_status is not None:
+                    record["previous_status"] = previous_status
+            records.append(record)
+        return records
+
+    def export_snapshot(self, collection: str):
+        """Write the JSON snapshot the frontend reads for a collection
+
+        Must not be called while holding self._lock: the file lock is always
+        taken first and the records are read under it.
+        """
+        file_store.write(self.snapshot_path(collection), lambda: self.list_records(collection))
+
+    def _schedule_export(self, collection: str):
+        """Export after export_delay; a burst of inserts becomes a single write"""
+        if self.export_delay <= 0:
+            self.export_snapshot(collection)
+            return
+        file_store.schedule_write(
+            self.snapshot_path(collection),
+            lambda: self.list_records(collection),
+            delay=self.export_delay
+        )
+
+    def flush(self):
+        for collection in COLLECTIONS:
+            file_store.flush(self.snapshot_path(collection))
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+    def _is_empty(self, collection: str) -> bool:
+        return not self._conn.execute(f"SELECT COUNT(*) FROM {self._table(collection)}").fetchone()[0]
+
+    def _import_snapshot(self, collection: str) -> int:
+        """Insert the records of a collection's JSON snapshot; the snapshot already matches, so nothing is exported"""
+        records = self._read_snapshot(collection)
+        with self._lock, self._conn:
+            self._insert(collection, records)
+        return len(records)
+
+    def _import_into_empty_tables(self):
+        for collection in COLLECTIONS:
+            with self._lock:
+                empty = self._is_empty(collection)
+            if empty:
+                count = self._import_snapshot(collection)
+                if count:
+                    logger.info(
+                        f"Imported {count} records from {collection}.json into {self.db_path}",
+                        event_type=EventType.DATA_CHANGE,
+                        user_id="system",
+                        data={"collection": collection, "count": count},
+                        tags=["storage", "sqlite", "import"]
+                    )
+
+    def import_json_snapshots(self) -> Dict[str, int]:
+        """One-shot import of the existing JSON files into empty tables"""
+        with self._lock:
+            for collection in COLLECTIONS:
+                if not self._is_empty(collection):
+                    raise ValueError(f"Table {self._table(collection)} is not empty, refusing to import {collection}.json")
+
+        return {collection: self._import_snapshot(collection) for collection in COLLECTIONS}
+
+    @staticmethod
+    def _table(collection: str) -> str:
+        if collection == IDENTIFIED_TRADES:
+            return 'identified_trades'
+        if collection == EMAIL_MATCHES:
+            return 'email_matches'
+        raise ValueError(f"Invalid file type: {collection}")
+
+
+class JournalMatchRepository(MatchRepository):
+    """Appends every change to a JSONL journal and compacts it in the background
+
+    Writes are a single appended line (O(1)); the in-memory state is replayed
+    from the last compacted state plus the journal on start-up. A compactor
+    thread periodically writes the state, together with the sequence number
+    of the last event it includes, to a single state file next to the
+    journal, drops those events from the journal and exports
+    matched_trades.json / email_matches.json from it. Because state and
+    sequence number are committed by one atomic rename, a crash at any point
+    never replays an event into a state that already contains it. Status
+    changes made from the UI compact immediately, because the frontend
+    reloads the snapshot right after.
+    """
+
+    def __init__(self, journal_path: str = None, assets_path: str = None,
+                 compact_interval: float = None, fsync: bool = None):
+        super().__init__(assets_path)
+        self.journal_path = journal_path or os.path.join(Config.STORAGE_PATH, 'match_journal.jsonl')
+        self.state_path = f"{self.journal_path}.state.json"
+        self.compact_interval = Config.JOURNAL_COMPACT_INTERVAL_SECONDS if compact_interval is None else compact_interval
+        self.fsync = Config.JOURNAL_FSYNC if fsync is None else fsync
+
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._state, self._compacted_seq = self._load_state()
+        self._pending_events = []
+        self._seq = self._compacted_seq
+
+        os.makedirs(os.path.dirname(self.journal_path), exist_ok=True)
+        self._replay()
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+        # A crash may have happened between committing the state and exporting it
+        self._export_snapshots(self._state)
+
+        self._stop = threading.Event()
+        self._compactor = threading.Thread(target=self._run_compactor, name="match-journal-compactor", daemon=True)
+        self._compactor.start()
+
+    def _load_state(self):
+        """Return the compacted state and the seq of the last event it includes
+
+        Before the first compaction the state starts from the exported JSON
+        files (e.g. written by the json backend) with no events applied.
+        """
+        committed = file_store.read(self.state_path)
+        if committed is None:
+            return {collection: self._read_snapshot(collection) for collection in COLLECTIONS}, 0
+        collections = committed.get("collections", {})
+        return {collection: collections.get(collection, []) for collection in COLLECTIONS}, int(committed["seq"])
+
+    def _replay(self):
+        """Apply journal events newer than the compacted state to it"""
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final line from a crash mid-append; it was never acknowledged
+                    continue
+                if event["seq"] <= self._compacted_seq:
+                    continue
+                try:
+                    self._apply(event)
+                except (MatchNotFoundError, NoPreviousStatusError):
+                    # Only reachable if the snapshots were edited by hand
+                    pass
+                self._pending_events.append(event)
+                self._seq = max(self._seq, event["seq"])
+
+    def _apply(self, event: Dict):
+        event_type = event["type"]
+        if event_type == "identified_trade_added":
+            self._state[IDENTIFIED_TRADES].append(event["record"])
+        elif event_type == "email_match_added":
+            self._state[EMAIL_MATCHES].append(event["record"])
+        elif event_type == "email_status_updated":
+            self._apply_status_update(self._find_match(event["email_id"]), event["status"])
+        elif event_type == "email_status_reverted":
+            self._apply_status_undo(self._find_match(event["email_id"]))
+        elif event_type == "collection_cleared":
+            self._state[event["collection"]] = []
+
+    def _append(self, event: Dict):
+        """Write an event to the journal, then apply it to the in-memory state"""
+        with self._lock:
+            self._seq += 1
+            event = {"seq": self._seq, **event}
+            self._journal.write(json.dumps(event, ensure_ascii=False) + "\n")
+            self._journal.flush()
+            if self.fsync:
+                os.fsync(self._journal.fileno())
+            self._apply(event)
+            self._pending_events.append(event)
+
+    def _find_match(self, email_id) -> Dict:
+        for match in self._state[EMAIL_MATCHES]:
+            if match.get("InferredTradeID") == email_id:
+                return match
+        raise MatchNotFoundError(f"Email with ID {email_id} not found")
+
+    def add_identified_trade(self, trade: Dict):
+        self._append({"type": "identified_trade_added", "record": trade})
+
+    def add_email_match(self, match: Dict):
+        self._append({"type": "email_match_added", "record": match})
+
+    def update_email_status(self, email_id, status: str) -> str:
+        with self._lock:
+            previous_status = self._find_match(email_id).get("status", "")
+            self._append({"type": "email_status_updated", "email_id": email_id, "status": status})
+        self.flush()
+        return previous_status
+
+    def undo_status_change(self, email_id) -> str:
+        with self._lock:
+            match = self._find_match(email_id)
+            if "previous_status" not in match:
+                raise NoPreviousStatusError("No previous status found to undo")
+            self._append({"type": "email_status_reverted", "email_id": email_id})
+            previous_status = match["status"]
+        self.flush()
+        return previous_status
+
+    def clear(self, collection: str):
+        self.snapshot_path(collection)
+        self._append({"type": "collection_cleared", "collection": collection})
+        self.flush()
+
+    def list_records(self, collection: str) -> List[Dict]:
+        with self._lock:
+            return json.loads(json.dumps(self._state[collection]))
+
+    def compact(self):
+        """Commit the state, drop compacted events from the journal and export the JSON snapshots"""
+        with self._compact_lock:
+            with self._lock:
+                if self._seq == self._compacted_seq:
+                    return
+                seq = self._seq
+                snapshots = {collection: json.loads(json.dumps(records))
+                             for collection, records in self._state.items()}
+
+            # State and seq are committed together by one atomic write, outside
+            # the lock so appends are never blocked by it
+            file_store.write(self.state_path, {"seq": seq, "collections": snapshots})
+
+            with self._lock:
+                self._compacted_seq = seq
+                self._pending_events = [event for event in self._pending_events if event["seq"] > seq]
+                self._rewrite_journal()
+
+            self._export_snapshots(snapshots)
+
+    def _export_snapshots(self, snapshots: Dict[str, List[Dict]]):
+        """Write the JSON files the frontend reads; they are only read back before the first compaction"""
+        for collection, records in snapshots.items():
+            self._write_snapshot(collection, records)
+
+    def _rewrite_journal(self):
+        """Replace the journal with the events that are not yet compacted"""
+        self._journal.close()
+        tmp_path = f"{self.journal_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for event in self._pending_events:
+                f.write(json.dumps(event, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.journal_path)
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+
+    def _run_compactor(self):
+        while not self._stop.wait(self.compact_interval):
+            try:
+                self.compact()
+            except Exception as e:
+                logger.log_exception(
+                    e,
+                    message="Error compacting match journal",
+                    user_id="system",
+                    data={"journal_path": self.journal_path},
+                    tags=["storage", "journal", "error"]
+                )
+
+    def flush(self):
+        self.compact()
+
+    def close(self):
+        self._stop.set()
+        self.compact()
+        with self._lock:
+            self._journal.close()
+
+
+def create_match_repository(backend: Optional[str] = None) -> MatchRepository:
+    """Create the match repository selected by MATCH_STORAGE_BACKEND"""
+    backend = (backend or Config.MATCH_STORAGE_BACKEND).lower()
+    if backend == 'json':
+        return JsonMatchRepository()
+    if backend == 'sqlite':
+        return SqliteMatchRepository()
+    if backend == 'journal':
+        return JournalMatchRepository()
+    raise ValueError(f"Unknown match storage backend: {backend}")
@@ -0,0 +1,195 @@
+import json
+import re
+from typing import Annotated, Any, Dict, List, Optional
+from pydantic import BaseModel, BeforeValidator, ConfigDict, Field, ValidationError, field_validator
+
+
+class InvalidLLMResponseError(ValueError):
+    """The LLM response is not a valid confirmation response, even after repair"""
+
+
+def _to_text(value: Any) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, (int, float)):
+        return str(value)
+    return value
+
+def _to_number(value: Any) -> Optional[float]:
+    """Parse numbers the way they appear in confirmations: 1.000.000,00 / 1,000,000.00 / USD 950,25
+
+    Digits grouped in threes by a single kind of separator (1.000 / 1,000)
+    are thousands; any other lone separator is the decimal point.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    if not isinstance(value, str):
+        return value
+
+    text = re.sub(r"[^\d,.\-]", "", value)
+    if not re.search(r"\d", text):
+        return None
+    if ',' in text and '.' in text:
+        if text.rfind(',') > text.rfind('.'):
+            text = text.replace('.', '').replace(',', '.')
+        else:
+            text = text.replace(',', '')
+    elif ',' in text:
+        text = text.replace(',', '') if re.fullmatch(r"-?[1-9]\d{0,2}(,\d{3})+", text) else text.replace(',', '.')
+    elif '.' in text:
+        # "1.000" and "1.000.000" are thousands, as in Latin-American confirmations
+        text = text.replace('.', '') if re.fullmatch(r"-?[1-9]\d{0,2}(\.\d{3})+", text) else text
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+def _to_int(value: Any) -> Optional[int]:
+    number = _to_number(value)
+    return int(number) if isinstance(number, float) else number
+
+def _to_yes_no(value: Any) -> Optional[str]:
+    if isinstance(value, bool):
+        return "Yes" if value else "No"
+    if isinstance(value, str) and value.strip().lower() in ("yes", "no", "si", "sí"):
+        return "No" if value.strip().lower() == "no" else "Yes"
+    return value
+
+Text = Annotated[Optional[str], BeforeValidator(_to_text)]
+Number = Annotated[Optional[float], BeforeValidator(_to_number)]
+Integer = Annotated[Optional[int], BeforeValidator(_to_int)]
+YesNo = Annotated[str, BeforeValidator(_to_yes_no)]
+
+
+class EmailSummary(BaseModel):
+    model_config = ConfigDict(extra='allow')
+
+    Email_subject: Text = None
+    Email_sender: Text = None
+    Email_date: Text = None
+    Email_time: Text = None
+    Confirmation: YesNo
+    Num_trades: Integer = None
+
+    @field_validator('Confirmation')
+    @classmethod
+    def check_confirmation(cls, value):
+        if value not in ("Yes", "No"):
+            raise ValueError("Confirmation must be Yes or No")
+        return value
+
+
+class TradeExtraction(BaseModel):
+    model_config = ConfigDict(extra='allow')
+
+    Confirmation_OK: Annotated[Optional[str], BeforeValidator(_to_yes_no)] = None
+    TradeNumber: Text = None
+    CounterpartyID: Text = None
+    CounterpartyName: Text = None
+    ProductType: Text = None
+    Currency1: Text = None
+    QuantityCurrency1: Number = None
+    Currency2: Text = None
+    QuantityCurrency2: Number = None
+    Buyer: Text = None
+    Seller: Text = None
+    SettlementType: Text = None
+    SettlementCurrency: Text = None
+    ValueDate: Text = None
+    MaturityDate: Text = None
+    PaymentDate: Text = None
+    Duration: Integer = None
+    ForwardPrice: Number = None
+    FixingReference: Text = None
+    CounterpartyPaymentMethod: Text = None
+    BankPaymentMethod: Text = None
+
+
+class ConfirmationResponse(BaseModel):
+    """The Email/Trades JSON the extraction prompt asks for"""
+    model_config = ConfigDict(extra='allow')
+
+    Email: EmailSummary
+    Trades: List[TradeExtraction] = Field(default_factory=list)
+
+    @field_validator('Trades', mode='before')
+    @classmethod
+    def null_trades(cls, value):
+        return [] if value is None else value
+
+
+def repair_json(text: str) -> str:
+    """Fix the usual defects of LLM JSON: markdown fences, surrounding prose, comments, trailing commas"""
+    text = (text or '').strip()
+    fence = re.match(r"^```[\w-]*\s*(.*?)\s*```$", text, re.DOTALL)
+    if fence:
+        text = fence.group(1)
+
+    start, end = text.find('{'), text.rfind('}')
+    if start != -1 and end > start:
+        text = text[start:end + 1]
+
+    # Drop comments and trailing commas outside string literals
+    out = []
+    i, n = 0, len(text)
+    in_string = False
+    while i < n:
+        char = text[i]
+        if in_string:
+            out.append(char)
+            if char == '\\' and i + 1 < n:
+                out.append(text[i + 1])
+                i += 2
+                continue
+            if char == '"':
+                in_string = False
+            i += 1
+            continue
+
+        if char == '"':
+            in_string = True
+        elif text.startswith('//', i):
+            newline = text.find('\n', i)
+            i = n if newline == -1 else newline
+            continue
+        elif text.startswith('/*', i):
+            close = text.find('*/', i + 2)
+            i = n if close == -1 else close + 2
+            continue
+        elif char in '}]':
+            k = len(out) - 1
+            while k >= 0 and out[k].isspace():
+                k -= 1
+            if k >= 0 and out[k] == ',':
+                del out[k]
+        out.append(char)
+        i += 1
+    return ''.join(out)
+
+
+def validate_llm_response(text: str) -> ConfirmationResponse:
+    """Validate an LLM response, repairing it locally if the first attempt fails"""
+    try:
+        return ConfirmationResponse.model_validate_json(text)
+    except ValidationError as first_error:
+        repaired = repair_json(text)
+        if repaired == text:
+            raise InvalidLLMResponseError(str(first_error)) from first_error
+        try:
+            return ConfirmationResponse.model_validate_json(repaired)
+        except ValidationError as e:
+            raise InvalidLLMResponseError(str(e)) from e
+
+
+def parse_llm_response(text: str) -> Dict:
+    """Validated LLM response as a plain dict, without the fields the LLM left out"""
+    return validate_llm_response(text).model_dump(exclude_none=True)
+
+
+def normalize_llm_response(text: str) -> str:
+    """Validated LLM response re-serialised as clean JSON"""
+    return json.dumps(parse_llm_response(text), ensure_ascii=False)
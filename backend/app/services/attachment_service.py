@@ -0,0 +1,145 @@
+# backend/app/services/attachment_service.py
+import asyncio
+import atexit
+import hashlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from ..config import Config
+from ..core.logger import logger
+from ..core.file_store import file_store
+from ..core import text_extraction
+from core_logging.client import EventType, LogLevel
+
+# PDF parsing runs in worker processes so it never blocks the event loop.
+# The pool is shared by every AttachmentService in the process.
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: forking a process that runs logger/flusher threads can deadlock.
+            # Workers re-import the main script, see the note in text_extraction
+            _executor = ProcessPoolExecutor(
+                max_workers=max(1, Config.ATTACHMENT_EXTRACTION_WORKERS),
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor
+
+def _reset_executor(executor: ProcessPoolExecutor):
+    """Kill the workers of a pool with a stuck extraction and start afresh on next use"""
+    global _executor
+    with _executor_lock:
+        if _executor is not executor:
+            return
+        _executor = None
+    for process in list((getattr(executor, '_processes', None) or {}).values()):
+        process.terminate()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+def _shutdown_executor():
+    with _executor_lock:
+        executor = _executor
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+atexit.register(_shutdown_executor)
+
+
+class AttachmentService:
+    """Downloads message attachments from Graph and extracts their text
+
+    PDFs are parsed in a process pool with a per-file timeout and page cap.
+    Extracted text is cached on disk by SHA-256 of the attachment bytes, so
+    a confirmation PDF that is sent again costs nothing.
+    """
+
+    def __init__(self, graph_client=None, user_email=None):
+        self.graph_client = graph_client
+        self.user_email = user_email or Config.USER_EMAIL
+        self.my_entity = os.environ.get('MY_ENTITY')
+
+        self.timeout = Config.ATTACHMENT_EXTRACTION_TIMEOUT_SECONDS
+        self.max_pages = Config.ATTACHMENT_MAX_PAGES
+        self.cache_enabled = Config.ATTACHMENT_CACHE_ENABLED
+        self.cache_dir = os.path.join(Config.CACHE_PATH, 'attachment_text')
+
+    async def load_attachments(self, message):
+        """Fetch the attachments of a message and set extracted_text on each one"""
+        try:
+            response = await self.graph_client.users.by_user_id(self.user_email).messages.by_message_id(message.id).attachments.get()
+            attachments = list(response.value or []) if response else []
+
+            texts = await asyncio.gather(*(self._extract_attachment_text(attachment) for attachment in attachments))
+            for attachment, text in zip(attachments, texts):
+                attachment.extracted_text = text
+
+            message.attachments = attachments
+            return attachments
+        except Exception as e:
+            logger.log_exception(
+                e,
+                message="Error loading email attachments",
+                entity=self.my_entity,
+                user_id="system",
+                data={"email_id": getattr(message, 'id', None)},
+                tags=["email", "attachments", "error"]
+            )
+            message.attachments = []
+            return []
+
+    async def _extract_attachment_text(self, attachment) -> str:
+        content_bytes = getattr(attachment, 'content_bytes', None)
+        if not content_bytes:
+            return 'No text extracted'
+        try:
+            return await self.extract_text(attachment.name, attachment.content_type, content_bytes)
+        except Exception as e:
+            logger.warning(
+                f"Could not extract text from attachment {attachment.name}: {str(e)}",
+                event_type=EventType.SYSTEM_EVENT,
+                entity=self.my_entity,
+                user_id="system",
+                data={"attachment": attachment.name, "content_type": attachment.content_type},
+                tags=["email", "attachments", "extraction"]
+            )
+            return 'No text extracted'
+
+    async def extract_text(self, name, content_type, content_bytes) -> str:
+        """Extract text from a PDF or plain-text attachment"""
+        if not text_extraction.is_pdf(name, content_type):
+            # Plain text only needs decoding; not worth a round trip to the pool
+            return text_extraction.extract_text(name, content_type, content_bytes)
+
+        cache_path = self._cache_path(content_bytes)
+        if self.cache_enabled:
+            cached = file_store.read(cache_path)
+            if cached is not None:
+                return cached["text"]
+
+        executor = _get_executor()
+        loop = asyncio.get_running_loop()
+        try:
+            text = await asyncio.wait_for(
+                loop.run_in_executor(executor, text_extraction.extract_pdf_text, content_bytes, self.max_pages),
+                timeout=self.timeout
+            )
+        except asyncio.TimeoutError:
+            _reset_executor(executor)
+            raise TimeoutError(f"PDF text extraction took longer than {self.timeout}s")
+        except BrokenProcessPool:
+            _reset_executor(executor)
+            raise
+
+        if self.cache_enabled:
+            await asyncio.to_thread(file_store.write_immutable, cache_path, {"name": name, "text": text})
+        return text
+
+    def _cache_path(self, content_bytes) -> str:
+        digest = hashlib.sha256(content_bytes).hexdigest()
+        # The page cap changes the result, so it is part of the key
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}-p{self.max_pages or 0}.json")
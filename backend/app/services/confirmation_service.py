@@ -3,22 +3,45 @@ import asyncio
 import os
 import logging
 import json
+from collections import OrderedDict
 from datetime import datetime, UTC
 from ..config import Config
-from ..core.logger import logger
-from core_logging.client import EventType, LogLevel
-from email_monitoring.utils import clean_html, extract_dates
+from ..core.body_compaction import compact_body, estimate_tokens
+from ..repositories.match_repository import create_match_repository
+from ..schemas.confirmation import parse_llm_response
+from .attachment_service import AttachmentService
+from .prefilter_service import PrefilterService
+from core_logging.client import EventType
+from email_monitoring.utils import clean_html
+
+NOT_RELEVANT_FOLDER = "Inbox/Confirmations/Not Relevant"
 
 class ConfirmationService:
-    def __init__(self, graph_client=None, llm_service=None, email_processor_service=None, logger=None):
+    def __init__(self, graph_client=None, llm_service=None, email_processor_service=None, logger=None,
+                 match_repository=None):
         self.graph_client = graph_client
         self.llm_service = llm_service
         self.email_processor = email_processor_service
+        self.match_repository = match_repository or create_match_repository()
+        self.attachment_service = AttachmentService(graph_client, Config.USER_EMAIL)
+        self.prefilter = PrefilterService(email_processor_service)
         self.assets_path = Config.ASSETS_PATH
         self.logger = logger
 
         # Get parameters from environment variables
         self.my_entity = os.environ.get('MY_ENTITY')
+
+        # Serialises result handling so file writes never interleave; bound to the
+        # event loop of the current monitor run (see _get_results_lock)
+        self._results_lock = None
+        self._results_lock_loop = None
+
+        # IDs of emails already taken into processing; change notifications and
+        # reconciliation polling can both deliver the same message
+        self._handled_ids = OrderedDict()
+        self._max_handled_ids = 10000
+        # Failed processing attempts per email ID (see _release_failed_email)
+        self._failed_attempts = {}
         
         # Set up logging
         logging.basicConfig(
@@ -55,27 +78,13 @@ class ConfirmationService:
 
     def save_identified_trade(self, trade_data: dict):
         """Save identified trade to matched_trades.json"""
-        matches_file = os.path.join(self.assets_path, 'matched_trades.json')
         print(f"Saving trade data: {trade_data}")
         try:
-            # Create file with empty list if it doesn't exist
-            if not os.path.exists(matches_file):
-                with open(matches_file, 'w', encoding='utf-8') as f:
-                    f.write('[]')
-            
-            # Read existing matches
-            with open(matches_file, 'r', encoding='utf-8') as f:
-                matches = json.load(f)
-            
-            # Add timestamp to trade data
+            # Add timestamp to a copy so the shared trade book isn't modified
+            trade_data = dict(trade_data)
             trade_data['identified_at'] = datetime.now(UTC).isoformat()
             
-            # Append new match
-            matches.append(trade_data)
-            
-            # Write back to file
-            with open(matches_file, 'w', encoding='utf-8') as f:
-                json.dump(matches, f, indent=2, ensure_ascii=False)
+            self.match_repository.add_identified_trade(trade_data)
                 
             trade_number = trade_data.get('TradeNumber')
             self.logger.info(f"Trade {trade_number} identified and saved")
@@ -86,17 +95,7 @@ class ConfirmationService:
 
     def save_email_match(self, trade_data: dict, email_data: dict, status: str = None):
         """Save email match to email_matches.json"""
-        email_matches_file = os.path.join(self.assets_path, 'email_matches.json')
         try:
-            # Create file with empty list if it doesn't exist
-            if not os.path.exists(email_matches_file):
-                with open(email_matches_file, 'w', encoding='utf-8') as f:
-                    f.write('[]')
-            
-            # Read existing matches
-            with open(email_matches_file, 'r', encoding='utf-8') as f:
-                matches = json.load(f)
-            
             # Create new match record using only email data
             new_match = {
                 "EmailSender": email_data.get("sender_email"),
@@ -128,12 +127,7 @@ class ConfirmationService:
                 "status": status  # Add the status field
             }
             
-            # Append new match
-            matches.append(new_match)
-            
-            # Write back to file
-            with open(email_matches_file, 'w', encoding='utf-8') as f:
-                json.dump(matches, f, indent=2, ensure_ascii=False)
+            self.match_repository.add_email_match(new_match)
             
             trade_number = trade_data.get("TradeNumber")
             self.logger.info(f"Trade {trade_number} matched with email from {new_match['EmailSender']}")
@@ -153,195 +147,344 @@ class ConfirmationService:
             return False
         return True
 
+    def _build_email_data(self, email, email_entities):
+        """Extract the fields we need from a Graph message"""
+        raw_email = email.sender.email_address.address
+
+        # Clean up the email address (remove the sandbox part)
+        if '@sandbox.mgsend.net' in raw_email:
+            parts = raw_email.split('=')
+            username = parts[0]
+            domain = parts[1].split('@')[0]
+            sender_email = f"{username}@{domain}"
+        else:
+            sender_email = raw_email
+
+        # Get other details
+        subject = getattr(email, 'subject', 'No subject')
+        received_date = email.received_date_time.date().isoformat() if hasattr(email, 'received_date_time') else 'No date'
+        received_time = email.received_date_time.time().isoformat() if hasattr(email, 'received_date_time') else 'No time'
+
+        # Log email receipt
+        self.logger.info(f"Processing email from {sender_email}")
+
+        # Print comprehensive email details
+        print("\n" + "="*80)
+        print(f"EMAIL DETAILS:")
+        print(f"Subject: {subject}")
+        print(f"Date: {received_date}")
+        print(f"Time: {received_time}")
+        print(f"From: {sender_email}")
+
+        # Check sender against entities list
+        entity_name, entity_display_name, client_id = self.get_entity_info(sender_email, email_entities)
+
+        if entity_name:
+            print(f"Entity: {entity_display_name} ({entity_name})")
+            print(f"Client ID: {client_id}")
+            self.logger.info(f"Email sender identified as {entity_display_name}")
+        else:
+            print("Email not registered")
+            self.logger.warning(f"Unregistered email sender: {sender_email}")
+
+        # Use the core utility for cleaning HTML
+        if hasattr(email, 'body') and email.body and hasattr(email.body, 'content'):
+            body_content = clean_html(email.body.content)
+        else:
+            body_content = 'No body content'
+
+        print("\nBODY CONTENT:")
+        print("-" * 40)
+        print(body_content[:1000] + "..." if len(body_content) > 1000 else body_content)
+        print("-" * 40)
+
+        # Collect email data
+        email_data = {
+            "subject": subject,
+            "received_date": received_date,
+            "received_time": received_time,
+            "sender_email": sender_email,
+            "entity_name": entity_name,
+            "client_id": client_id,
+            "body_content": body_content,
+            "attachments_text": "\n".join([
+                f"- {att.name} ({att.content_type}): {getattr(att, 'extracted_text', 'No text extracted')[:1000]}"
+                for att in email.attachments
+            ]) if hasattr(email, 'attachments') and email.attachments else "No attachments"
+        }
+
+        # The LLM gets a compacted body; body_content is kept whole for storage and display
+        email_data["llm_body_content"] = self._compact_body(email, body_content)
+        return email_data
+
+    def _compact_body(self, email, body_content):
+        """Strip quoted history, signatures and disclaimers from the body sent to the LLM"""
+        if not Config.BODY_COMPACTION_ENABLED or body_content == 'No body content':
+            return body_content
+        try:
+            compacted = compact_body(body_content)
+        except Exception as e:
+            self.logger.warning(f"Body compaction failed, using the full body: {str(e)}")
+            return body_content
+
+        tokens_before = estimate_tokens(body_content)
+        tokens_after = estimate_tokens(compacted)
+        self.logger.info(
+            f"Compacted email body from ~{tokens_before} to ~{tokens_after} tokens",
+            event_type=EventType.SYSTEM_EVENT,
+            entity=self.my_entity,
+            user_id="system",
+            data={
+                "email_id": getattr(email, 'id', None),
+                "tokens_before": tokens_before,
+                "tokens_after": tokens_after,
+                "chars_before": len(body_content),
+                "chars_after": len(compacted)
+            },
+            tags=["email", "compaction", "tokens"]
+        )
+        return compacted
+
+    async def _load_attachments_if_needed(self, email):
+        """Download attachments only when the subject and body carry no trade number"""
+        if getattr(email, 'attachments', None) or not getattr(email, 'has_attachments', False):
+            return
+
+        body = email.body.content if getattr(email, 'body', None) and email.body.content else ''
+        trade_numbers = self.email_processor.find_trade_numbers(f"{email.subject or ''}\n{clean_html(body)}")
+        if trade_numbers:
+            self.logger.info(
+                "Trade number found in email body, skipping attachments",
+                event_type=EventType.SYSTEM_EVENT,
+                entity=self.my_entity,
+                user_id="system",
+                data={"email_id": email.id, "trade_numbers": trade_numbers[:5]},
+                tags=["email", "attachments", "skipped"]
+            )
+            return
+
+        await self.attachment_service.load_attachments(email)
+
+    async def _request_llm_response(self, email_data):
+        """Send one email to the LLM; LLMService bounds concurrency and picks the provider"""
+        self.logger.info("Sending email to LLM for processing")
+        return await self.llm_service.process_email_data(email_data)
+
+    def _get_results_lock(self) -> asyncio.Lock:
+        """Get the results lock, with a fresh one for a new event loop"""
+        loop = asyncio.get_running_loop()
+        if self._results_lock_loop is not loop:
+            self._results_lock, self._results_lock_loop = asyncio.Lock(), loop
+        return self._results_lock
+
+    def _claim_new_emails(self, emails):
+        """Return the emails that haven't been handled yet and mark them as handled"""
+        claimed = []
+        for email in emails:
+            email_id = getattr(email, 'id', None)
+            if email_id is not None:
+                if email_id in self._handled_ids:
+                    continue
+                self._handled_ids[email_id] = True
+            claimed.append(email)
+
+        while len(self._handled_ids) > self._max_handled_ids:
+            self._handled_ids.popitem(last=False)
+        return claimed
+
+    async def _release_failed_email(self, email, error):
+        """Give an email whose processing failed back to the monitor for another attempt
+
+        The claim is dropped and the email marked unread again, so the next
+        poll, delta round or reconciliation delivers it again. After
+        EMAIL_MAX_PROCESSING_ATTEMPTS failures the email keeps its claim and
+        is left for manual handling.
+        """
+        email_id = getattr(email, 'id', None)
+        if email_id is None:
+            return
+
+        attempts = self._failed_attempts.get(email_id, 0) + 1
+        if attempts >= Config.EMAIL_MAX_PROCESSING_ATTEMPTS:
+            self._failed_attempts.pop(email_id, None)
+            self.logger.error(f"Giving up on email {email_id} after {attempts} failed attempts: {str(error)}")
+            return
+
+        self._failed_attempts[email_id] = attempts
+        while len(self._failed_attempts) > self._max_handled_ids:
+            self._failed_attempts.pop(next(iter(self._failed_attempts)))
+        self._handled_ids.pop(email_id, None)
+        await self.email_processor.mark_email_unread(email)
+
     async def handle_new_unread_email(self, new_emails):
-        """Process new unread emails"""
+        """Process new unread emails
+
+        LLM calls run concurrently (LLMService bounds them and fails over along
+        LLM_PROVIDER_CHAIN), while the results are applied strictly in the
+        order the emails arrived so that file writes stay ordered and consistent.
+        Emails that were already handled (e.g. delivered by both a change
+        notification and polling) are skipped; emails whose processing fails
+        are released so they are delivered and tried again.
+        """
+        new_emails = self._claim_new_emails(new_emails)
+        if not new_emails:
+            return
+
         email_entities = self.load_email_entities('email_entities.json')
         
-        # Choose your preferred AI provider
-        AI_PROVIDER = "Anthropic"
-        
         self.logger.info(f"Processing {len(new_emails)} new unread emails")
-        
+
+        # Messages arrive without attachments; fetch the ones that are needed concurrently
+        await asyncio.gather(*(self._load_attachments_if_needed(email) for email in new_emails), return_exceptions=True)
+
+        # Extract email data and start the LLM calls for every email up front;
+        # obvious non-confirmations are moved straight away without an LLM call
+        pending = []
+        not_relevant = []
         for email in new_emails:
-            print("\n" + "="*80)
-            
             try:
-                # Get basic email details with error checking
-                raw_email = email.sender.email_address.address
-                
-                # Clean up the email address (remove the sandbox part)
-                if '@sandbox.mgsend.net' in raw_email:
-                    parts = raw_email.split('=')
-                    username = parts[0]
-                    domain = parts[1].split('@')[0]
-                    sender_email = f"{username}@{domain}"
-                else:
-                    sender_email = raw_email
-
-                # Get other details
-                subject = getattr(email, 'subject', 'No subject')
-                received_date = email.received_date_time.date().isoformat() if hasattr(email, 'received_date_time') else 'No date'
-                received_time = email.received_date_time.time().isoformat() if hasattr(email, 'received_date_time') else 'No time'
-                
-                # Log email receipt
-                self.logger.info(f"Processing email from {sender_email}")
-                
-                # Print comprehensive email details
-                print(f"EMAIL DETAILS:")
-                print(f"Subject: {subject}")
-                print(f"Date: {received_date}")
-                print(f"Time: {received_time}")
-                print(f"From: {sender_email}")
-                
-                # Check sender against entities list
-                entity_name, entity_display_name, client_id = self.get_entity_info(sender_email, email_entities)
-                
-                if entity_name:
-                    print(f"Entity: {entity_display_name} ({entity_name})")
-                    print(f"Client ID: {client_id}")
-                    self.logger.info(f"Email sender identified as {entity_display_name}")
-                else:
-                    print("Email not registered")
-                    self.logger.warning(f"Unregistered email sender: {sender_email}")
-                    
-                # Use the core utility for cleaning HTML
-                if hasattr(email, 'body') and email.body and hasattr(email.body, 'content'):
-                    body_content = clean_html(email.body.content)
-                else:
-                    body_content = 'No body content'
-                    
-                print("\nBODY CONTENT:")
-                print("-" * 40)
-                print(body_content[:1000] + "..." if len(body_content) > 1000 else body_content)
-                print("-" * 40)
-                
-                # Collect email data
-                email_data = {
-                    "subject": subject,
-                    "received_date": received_date,
-                    "received_time": received_time,
-                    "sender_email": sender_email,
-                    "entity_name": entity_name,
-                    "client_id": client_id,
-                    "body_content": body_content,
-                    "attachments_text": "\n".join([
-                        f"- {att.name} ({att.content_type}): {getattr(att, 'extracted_text', 'No text extracted')[:1000]}"
-                        for att in email.attachments
-                    ]) if hasattr(email, 'attachments') and email.attachments else "No attachments"
-                }
-                
-                # Process with LLM
+                email_data = self._build_email_data(email, email_entities)
+            except Exception as e:
+                self.logger.error(f"Error processing email: {str(e)}")
+                print(f"Error processing email: {str(e)}")
+                await self._release_failed_email(email, e)
+                continue
+
+            decision = self.prefilter.evaluate(email, email_data)
+            if not decision.send_to_llm:
+                print(f"Pre-filter: not a confirmation ({', '.join(decision.reasons)})")
+                not_relevant.append(email)
+                continue
+
+            llm_task = asyncio.create_task(self._request_llm_response(email_data))
+            pending.append((email, email_data, llm_task))
+
+        move_task = asyncio.gather(
+            *(self.email_processor.move_email_to_folder(email, NOT_RELEVANT_FOLDER) for email in not_relevant)
+        )
+
+        # Apply the results in arrival order
+        for email, email_data, llm_task in pending:
+            try:
+                llm_response = await llm_task
+            except Exception as e:
+                self.logger.error(f"Error processing email with LLM: {str(e)}")
+                print(f"Error processing with LLM: {str(e)}")
+                await self._release_failed_email(email, e)
+                continue
+
+            async with self._get_results_lock():
                 try:
-                    self.logger.info("Sending email to LLM for processing")
-                    
-                    llm_response = self.llm_service.process_email_data(email_data, ai_provider=AI_PROVIDER)
-                    print(f"\nLLM RESPONSE:")
-                    print("-" * 40)
-                    print(llm_response)
-                    print("-" * 40)
-                    
-                    # Check if the response indicates a confirmation email
-                    llm_data = json.loads(llm_response)
-                    is_confirmation = llm_data["Email"]["Confirmation"].lower() == "yes"
-                    
-                    if is_confirmation:
-                        
-                        self.logger.info(f"Email identified as trade confirmation")
-                        print("This email is a confirmation email.")
-                        
-                        # Process each trade in the LLM response
-                        if "Trades" in llm_data and llm_data["Trades"]:
-                            
-                            for trade in llm_data["Trades"]:
-                                trade_number = trade.get("TradeNumber")
-                                if trade_number:
-                                    self.logger.info(f"Trade {trade_number} referenced in email")
-                                    
-                                    # Try to find the trade in unmatched_trades.json
-                                    trade_details = self.email_processor.get_trade_details(trade_number)
-                                    if trade_details:
-                                        print(f"Trade {trade_number} found")
-                                        
-                                        self.logger.info(f"Trade {trade_number} found in entity system")
-                                        
-                                        # Always save as identified trade, which goes in the top-left grid
-                                        self.save_identified_trade(trade_details)
-                                        
-                                        # Check if trade is confirmed
-                                        if trade.get("Confirmation_OK", "").lower() == "yes":
-                                            # If the trade is confirmed by the client, save the email match with the very same trade in the top-right grid
-                                            print(f"Trade {trade_number} is confirmed - saving email match")
-                                            self.save_email_match(trade_details, email_data, "Confirmation OK")
-                                        else:
-                                            # In this case the client has indicated that there is at least one data point that is not correct in the trade
-                                            print(f"Trade {trade_number} found but not confirmed")
-                                            self.logger.warning(f"Trade {trade_number} has discrepancies")
-                                            
-                                            # Create a merged trade data dictionary with the Murex trade details as our starting point
-                                            merged_trade = trade_details.copy()
-                                            
-                                            # Track what fields were updated from the email
-                                            updated_fields = {}
-                                            
-                                            # And then we can overwrite with any data that has valid values from the email or attachments
-                                            for field, value in trade.items():
-                                                if self.is_valid_value(value):
-                                                    updated_fields[field] = {
-                                                        "before": merged_trade.get(field),
-                                                        "after": value
-                                                    }
-                                                    merged_trade[field] = value
-                                                    print(f"Updating {field} to {value} from email")
-                                                    
-                                            # Log the updated fields
-                                            if updated_fields:
-                                                self.logger.warning(f"Updated trade {trade_number} with data from email")
-
-                                            # Save the merged trade data
-                                            self.save_email_match(merged_trade, email_data, "Difference")
-                                    else:
-                                        # Client email references a trade we don't have in our system
-                                        print(f"Trade {trade_number} not found")
-                                        self.logger.warning(f"Trade {trade_number} not found in entity system")
-                                        
-                                        # Create a minimal trade record for unrecognized trades
-                                        unrecognized_trade = {
-                                            "TradeNumber": trade_number,
-                                            "CounterpartyID": trade.get("CounterpartyID", "Not available"),
-                                            "CounterpartyName": trade.get("CounterpartyName", "Not available"),
-                                            "ProductType": "Not a recognized trade",
-                                            "Currency1": trade.get("Currency1", ""),
-                                            "QuantityCurrency1": float(trade.get("QuantityCurrency1", 0)),
-                                            "Currency2": trade.get("Currency2", ""),
-                                            "QuantityCurrency2": float(trade.get("QuantityCurrency2", 0)),
-                                            "Buyer": trade.get("Buyer", ""),
-                                            "Seller": trade.get("Seller", ""),
-                                            "SettlementType": trade.get("SettlementType", ""),
-                                            "SettlementCurrency": trade.get("SettlementCurrency", ""),
-                                            "ValueDate": trade.get("ValueDate", ""),
-                                            "MaturityDate": trade.get("MaturityDate", ""),
-                                            "PaymentDate": trade.get("PaymentDate", ""),
-                                            "Duration": int(trade.get("Duration", 0)),
-                                            "ForwardPrice": float(trade.get("ForwardPrice", 0)),
-                                            "FixingReference": trade.get("FixingReference", ""),
-                                            "CounterpartyPaymentMethod": trade.get("CounterpartyPaymentMethod", ""),
-                                            "BankPaymentMethod": trade.get("BankPaymentMethod", "")
-                                        }
-                                        self.save_email_match(unrecognized_trade, email_data, "Unrecognized")
-                        else:
-                            print("No trades identified in the email")
-                            self.logger.info("No trades identified in confirmation email")
-                    else:
-                        print("This email is NOT a confirmation email.")
-                        self.logger.info("Email not relevant to trade confirmation")
-                        await self.email_processor.move_email_to_folder(email, "Inbox/Confirmations/Not Relevant")
-                    
+                    await self.process_llm_response(email, email_data, llm_response)
+                    self._failed_attempts.pop(getattr(email, 'id', None), None)
                 except Exception as e:
                     self.logger.error(f"Error processing email with LLM: {str(e)}")
                     print(f"Error processing with LLM: {str(e)}")
-                    
-            except Exception as e:
-                self.logger.error(f"Error processing email: {str(e)}")
-                print(f"Error processing email: {str(e)}")
+                    await self._release_failed_email(email, e)
+
+            print("="*80 + "\n")
+
+        await move_task
+
+    async def process_llm_response(self, email, email_data, llm_response):
+        """Save the matches for one email based on the LLM response"""
+        print(f"\nLLM RESPONSE ({email_data.get('subject')}):")
+        print("-" * 40)
+        print(llm_response)
+        print("-" * 40)
+        
+        # Check if the response indicates a confirmation email
+        llm_data = parse_llm_response(llm_response)
+        is_confirmation = llm_data["Email"]["Confirmation"].lower() == "yes"
+        
+        if is_confirmation:
+            
+            self.logger.info(f"Email identified as trade confirmation")
+            print("This email is a confirmation email.")
+            
+            # Process each trade in the LLM response
+            if "Trades" in llm_data and llm_data["Trades"]:
                 
-            print("="*80 + "\n")
\ No newline at end of file
+                for trade in llm_data["Trades"]:
+                    trade_number = trade.get("TradeNumber")
+                    if trade_number:
+                        self.logger.info(f"Trade {trade_number} referenced in email")
+                        
+                        # Try to find the trade in unmatched_trades.json
+                        trade_details = self.email_processor.get_trade_details(trade_number)
+                        if trade_details:
+                            print(f"Trade {trade_number} found")
+                            
+                            self.logger.info(f"Trade {trade_number} found in entity system")
+                            
+                            # Always save as identified trade, which goes in the top-left grid
+                            self.save_identified_trade(trade_details)
+                            
+                            # Check if trade is confirmed
+                            if trade.get("Confirmation_OK", "").lower() == "yes":
+                                # If the trade is confirmed by the client, save the email match with the very same trade in the top-right grid
+                                print(f"Trade {trade_number} is confirmed - saving email match")
+                                self.save_email_match(trade_details, email_data, "Confirmation OK")
+                            else:
+                                # In this case the client has indicated that there is at least one data point that is not correct in the trade
+                                print(f"Trade {trade_number} found but not confirmed")
+                                self.logger.warning(f"Trade {trade_number} has discrepancies")
+                                
+                                # Create a merged trade data dictionary with the Murex trade details as our starting point
+                                merged_trade = trade_details.copy()
+                                
+                                # Track what fields were updated from the email
+                                updated_fields = {}
+                                
+                                # And then we can overwrite with any data that has valid values from the email or attachments
+                                for field, value in trade.items():
+                                    if self.is_valid_value(value):
+                                        updated_fields[field] = {
+                                            "before": merged_trade.get(field),
+                                            "after": value
+                                        }
+                                        merged_trade[field] = value
+                                        print(f"Updating {field} to {value} from email")
+                                        
+                                # Log the updated fields
+                                if updated_fields:
+                                    self.logger.warning(f"Updated trade {trade_number} with data from email")
+
+                                # Save the merged trade data
+                                self.save_email_match(merged_trade, email_data, "Difference")
+                        else:
+                            # Client email references a trade we don't have in our system
+                            print(f"Trade {trade_number} not found")
+                            self.logger.warning(f"Trade {trade_number} not found in entity system")
+                            
+                            # Create a minimal trade record for unrecognized trades
+                            unrecognized_trade = {
+                                "TradeNumber": trade_number,
+                                "CounterpartyID": trade.get("CounterpartyID", "Not available"),
+                                "CounterpartyName": trade.get("CounterpartyName", "Not available"),
+                                "ProductType": "Not a recognized trade",
+                                "Currency1": trade.get("Currency1", ""),
+                                "QuantityCurrency1": float(trade.get("QuantityCurrency1", 0)),
+                                "Currency2": trade.get("Currency2", ""),
+                                "QuantityCurrency2": float(trade.get("QuantityCurrency2", 0)),
+                                "Buyer": trade.get("Buyer", ""),
+                                "Seller": trade.get("Seller", ""),
+                                "SettlementType": trade.get("SettlementType", ""),
+                                "SettlementCurrency": trade.get("SettlementCurrency", ""),
+                                "ValueDate": trade.get("ValueDate", ""),
+                                "MaturityDate": trade.get("MaturityDate", ""),
+                                "PaymentDate": trade.get("PaymentDate", ""),
+                                "Duration": int(trade.get("Duration", 0)),
+                                "ForwardPrice": float(trade.get("ForwardPrice", 0)),
+                                "FixingReference": trade.get("FixingReference", ""),
+                                "CounterpartyPaymentMethod": trade.get("CounterpartyPaymentMethod", ""),
+                                "BankPaymentMethod": trade.get("BankPaymentMethod", "")
+                            }
+                            self.save_email_match(unrecognized_trade, email_data, "Unrecognized")
+            else:
+                print("No trades identified in the email")
+                self.logger.info("No trades identified in confirmation email")
+        else:
+            print("This email is NOT a confirmation email.")
+            self.logger.info("Email not relevant to trade confirmation")
+            await self.email_processor.move_email_to_folder(email, NOT_RELEVANT_FOLDER)
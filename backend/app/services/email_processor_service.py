@@ -1,24 +1,53 @@
 # backend/app/services/email_processor_service.py
 import json
 import os
+import re
+import threading
+import time
 from ..config import Config
 from typing import Optional, Dict, List
 from msgraph.generated.models.message import Message
-from ..core.logger import logger
+from ..core.logger import logger, log_sampler, get_event_counter
+from ..core.folder_cache import folder_cache
+from ..schemas.confirmation import InvalidLLMResponseError, parse_llm_response
+from ..repositories.match_repository import (
+    create_match_repository,
+    EMAIL_MATCHES,
+    IDENTIFIED_TRADES,
+    MatchNotFoundError,
+    NoPreviousStatusError
+)
 from core_logging.client import EventType, LogLevel
 from email_monitoring import EmailProcessor
 from email_monitoring.utils import clean_html
 
 class EmailProcessorService:
-    def __init__(self, graph_client=None):
+    def __init__(self, graph_client=None, match_repository=None, graph_batch=None):
         self.assets_path = Config.ASSETS_PATH
         self.unmatched_trades_path = os.path.join(self.assets_path, 'unmatched_trades.json')
         self.graph_client = graph_client
+        # Optional GraphBatchService; mailbox mutations go through $batch when set
+        self.graph_batch = graph_batch
+        self.match_repository = match_repository or create_match_repository()
         self.user_email = Config.USER_EMAIL
         self.my_entity = os.environ.get('MY_ENTITY')
         
         # Use the core email processor
         self.email_processor = EmailProcessor(logger=logger)
+
+        self._trade_number_pattern = re.compile(Config.TRADE_NUMBER_PATTERN)
+
+        # Resolves folder paths on cache misses (see get_folder_id_by_path)
+        self._folder_monitor = None
+
+        # Periodic "N lookups, M misses" summary in place of per-lookup events,
+        # shared by every instance in the process
+        self.trade_lookup_stats = get_event_counter(
+            "trade lookups",
+            tags=["trade", "lookup"],
+            interval=Config.LOG_SUMMARY_INTERVAL_SECONDS,
+            entity=self.my_entity
+        )
         
         logger.info(
             "Initializing Email Processor Service",
@@ -29,8 +58,31 @@ class EmailProcessorService:
             tags=["initialization", "service"]
         )
         
+        # The trade book is swapped in as a single (trades, index) tuple so
+        # readers never see a list and index from different loads
+        self._trade_book = ([], {})
+        self._trades_file_signature = None
+        self._trades_reload_lock = threading.Lock()
+        self._next_trades_check = 0.0
+
         self.load_unmatched_trades()
 
+    @property
+    def unmatched_trades(self) -> List[Dict]:
+        return self._trade_book[0]
+
+    @property
+    def trade_index(self) -> Dict[str, Dict]:
+        return self._trade_book[1]
+
+    def _get_trades_file_signature(self):
+        """Return (mtime, size) of unmatched_trades.json, or None if it is missing"""
+        try:
+            stat = os.stat(self.unmatched_trades_path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
     def load_unmatched_trades(self):
         try:
             logger.info(
@@ -42,8 +94,12 @@ class EmailProcessorService:
                 tags=["data", "loading"]
             )
             
+            signature = self._get_trades_file_signature()
             with open(self.unmatched_trades_path, 'r', encoding='utf-8') as f:
-                self.unmatched_trades = json.load(f)
+                unmatched_trades = json.load(f)
+
+            self._trade_book = (unmatched_trades, self.build_trade_index(unmatched_trades))
+            self._trades_file_signature = signature
                 
             logger.info(
                 f"Loaded {len(self.unmatched_trades)} unmatched trades",
@@ -62,7 +118,7 @@ class EmailProcessorService:
                 data={"path": self.unmatched_trades_path},
                 tags=["error", "data", "loading"]
             )
-            self.unmatched_trades = []
+            self._trade_book = ([], {})
             logger.warning(
                 "Initialized with empty unmatched trades list due to error",
                 event_type=EventType.SYSTEM_EVENT,
@@ -71,6 +127,86 @@ class EmailProcessorService:
                 tags=["data", "fallback"]
             )
 
+    def reload_unmatched_trades_if_changed(self, force_check: bool = False) -> bool:
+        """Reload unmatched_trades.json if it changed on disk since the last load
+
+        The file is stat-ed at most every TRADES_RELOAD_INTERVAL_SECONDS. On a
+        change the trades are re-indexed and the new list and index are swapped
+        in atomically. If the file can't be parsed (e.g. it is mid-write) the
+        current book is kept.
+        """
+        now = time.monotonic()
+        if not force_check and now < self._next_trades_check:
+            return False
+        self._next_trades_check = now + Config.TRADES_RELOAD_INTERVAL_SECONDS
+
+        signature = self._get_trades_file_signature()
+        if signature is None or signature == self._trades_file_signature:
+            return False
+
+        with self._trades_reload_lock:
+            # Another thread may have reloaded while we waited for the lock
+            if signature == self._trades_file_signature:
+                return False
+
+            try:
+                with open(self.unmatched_trades_path, 'r', encoding='utf-8') as f:
+                    unmatched_trades = json.load(f)
+            except Exception as e:
+                logger.log_exception(
+                    e,
+                    message="Error reloading unmatched trades, keeping current book",
+                    entity=self.my_entity,
+                    user_id="system",
+                    data={"path": self.unmatched_trades_path},
+                    tags=["error", "data", "reload"]
+                )
+                return False
+
+            # Swap the new list and its index in together so lookups never mix books
+            self._trade_book = (unmatched_trades, self.build_trade_index(unmatched_trades))
+            self._trades_file_signature = signature
+
+        logger.info(
+            f"Reloaded {len(unmatched_trades)} unmatched trades",
+            event_type=EventType.DATA_CHANGE,
+            entity=self.my_entity,
+            user_id="system",
+            data={"count": len(unmatched_trades)},
+            tags=["data", "trades", "reload"]
+        )
+        return True
+
+    @staticmethod
+    def normalize_trade_number(trade_number) -> str:
+        """Normalize a trade number so 12345, "12345", " 12345 " and 12345.0 compare equal"""
+        if isinstance(trade_number, float) and trade_number.is_integer():
+            trade_number = int(trade_number)
+        return str(trade_number).strip()
+
+    def find_trade_numbers(self, text: str) -> List[str]:
+        """Return the trade numbers mentioned in text
+
+        Candidates matching TRADE_NUMBER_PATTERN are checked against the trade
+        book; with no trades loaded every candidate is returned.
+        """
+        candidates = dict.fromkeys(m.group(0) for m in self._trade_number_pattern.finditer(text or ''))
+        index = self.trade_index
+        if not index:
+            return list(candidates)
+        return [number for number in candidates if self.normalize_trade_number(number) in index]
+
+    @classmethod
+    def build_trade_index(cls, trades: List[Dict]) -> Dict[str, Dict]:
+        """Index trades by normalized trade number, keeping the first occurrence"""
+        index = {}
+        for trade in trades:
+            trade_number = trade.get('TradeNumber')
+            if trade_number is None:
+                continue
+            index.setdefault(cls.normalize_trade_number(trade_number), trade)
+        return index
+
     async def process_email_result(self, email_obj, llm_response: str) -> Dict:
         """Process the LLM's response about an email"""
         try:
@@ -87,7 +223,7 @@ class EmailProcessorService:
             )
             
             # Parse the LLM response into JSON
-            llm_data = json.loads(llm_response)
+            llm_data = parse_llm_response(llm_response)
             
             # Check if this is a confirmation email
             is_confirmation = llm_data["Email"]["Confirmation"].lower() == "yes"
@@ -165,7 +301,8 @@ class EmailProcessorService:
                         tags=["trade", "found"]
                     )
                     
-                    details["confirmation_ok"] = confirmation_ok
+                    # details is shared with the trade book; annotate a copy
+                    details = {**details, "confirmation_ok": confirmation_ok}
                     identified_trade_details.append(details)
                 else:
                     logger.warning(
@@ -198,7 +335,7 @@ class EmailProcessorService:
             
             return result
             
-        except json.JSONDecodeError as e:
+        except InvalidLLMResponseError as e:
             logger.log_exception(
                 e,
                 message="Error parsing LLM response JSON",
@@ -232,6 +369,15 @@ class EmailProcessorService:
 
     async def mark_email_unread(self, email_obj):
         """Mark an email as unread using Microsoft Graph API"""
+        return await self._set_read_flag(email_obj, False)
+
+    async def mark_email_read(self, email_obj) -> bool:
+        """Mark an email as read using Microsoft Graph API"""
+        return await self._set_read_flag(email_obj, True)
+
+    async def _set_read_flag(self, email_obj, is_read: bool) -> bool:
+        """Set the isRead flag of an email; returns whether the update succeeded"""
+        state = "read" if is_read else "unread"
         try:
             if not self.graph_client:
                 raise ValueError("Graph client not initialized")
@@ -239,30 +385,38 @@ class EmailProcessorService:
                 raise ValueError("User email not initialized")
             
             logger.info(
-                f"Marking email as unread: {email_obj.subject if hasattr(email_obj, 'subject') else 'Unknown'}",
+                f"Marking email as {state}: {email_obj.subject if hasattr(email_obj, 'subject') else 'Unknown'}",
                 event_type=EventType.SYSTEM_EVENT,
                 entity=self.my_entity,
                 user_id="system",
                 data={"email_id": email_obj.id if hasattr(email_obj, 'id') else None},
-                tags=["email", "status", "unread"]
+                tags=["email", "status", state]
             )
             
-            update = Message()
-            update.is_read = False
-            await self.graph_client.users.by_user_id(self.user_email).messages.by_message_id(email_obj.id).patch(body=update)
+            if self.graph_batch:
+                await self.graph_batch.submit(
+                    "PATCH",
+                    self.graph_batch.message_url(self.user_email, email_obj.id),
+                    {"isRead": is_read}
+                )
+            else:
+                update = Message()
+                update.is_read = is_read
+                await self.graph_client.users.by_user_id(self.user_email).messages.by_message_id(email_obj.id).patch(body=update)
             
             logger.info(
-                f"Successfully marked email as unread",
+                f"Successfully marked email as {state}",
                 event_type=EventType.SYSTEM_EVENT,
                 entity=self.my_entity,
                 user_id="system",
                 data={"email_id": email_obj.id},
                 tags=["email", "status", "success"]
             )
+            return True
         except Exception as e:
             logger.log_exception(
                 e,
-                message="Error marking email as unread",
+                message=f"Error marking email as {state}",
                 entity=self.my_entity,
                 user_id="system",
                 data={
@@ -271,6 +425,7 @@ class EmailProcessorService:
                 },
                 tags=["email", "status", "error"]
             )
+            return False
 
     async def move_email_to_folder(self, email_obj, folder_path):
         """Move an email to a different folder using Microsoft Graph API"""
@@ -293,10 +448,7 @@ class EmailProcessorService:
                 tags=["email", "folder", "move"]
             )
             
-            # Use shared implementation from core module to get folder ID
-            from email_monitoring.core.monitor import OutlookMonitor
-            temp_monitor = OutlookMonitor(self.user_email, self.graph_client, logger)
-            folder_id = await temp_monitor.get_folder_id(folder_path)
+            folder_id = await self.get_folder_id_by_path(folder_path)
             
             if not folder_id:
                 error_msg = f"Could not find folder: {folder_path}"
@@ -310,16 +462,18 @@ class EmailProcessorService:
                 )
                 raise ValueError(error_msg)
                 
-            # Import the correct model from the newer SDK
-            from msgraph.generated.users.item.messages.item.move.move_post_request_body import MovePostRequestBody
-            
-            # Create the request body using the model
-            request_body = MovePostRequestBody(
-                destination_id = folder_id
-            )
-            
             # Call the move API
-            result = await self.graph_client.users.by_user_id(self.user_email).messages.by_message_id(email_obj.id).move.post(request_body)
+            try:
+                result = await self._move_message(email_obj.id, folder_id)
+            except Exception as e:
+                if getattr(e, 'response_status_code', None) != 404:
+                    raise
+                # The cached folder ID may be stale (folder deleted or recreated)
+                folder_cache.invalidate(self.user_email, folder_path)
+                fresh_folder_id = await self.get_folder_id_by_path(folder_path)
+                if not fresh_folder_id or fresh_folder_id == folder_id:
+                    raise
+                result = await self._move_message(email_obj.id, fresh_folder_id)
             
             logger.info(
                 f"Successfully moved email to folder {folder_path}",
@@ -349,12 +503,30 @@ class EmailProcessorService:
            )
            return None
 
+    async def _move_message(self, message_id, folder_id):
+        if self.graph_batch:
+            return await self.graph_batch.submit(
+                "POST",
+                self.graph_batch.message_url(self.user_email, message_id, "move"),
+                {"destinationId": folder_id}
+            )
+
+        # Import the correct model from the newer SDK
+        from msgraph.generated.users.item.messages.item.move.move_post_request_body import MovePostRequestBody
+        
+        # Create the request body using the model
+        request_body = MovePostRequestBody(
+            destination_id = folder_id
+        )
+        return await self.graph_client.users.by_user_id(self.user_email).messages.by_message_id(message_id).move.post(request_body)
+
     async def get_folder_id_by_path(self, folder_path):
-        """Get the folder ID for a given folder path - uses shared implementation"""
+        """Get the folder ID for a given folder path, cached process-wide"""
         try:
-            from email_monitoring.core.monitor import OutlookMonitor
-            temp_monitor = OutlookMonitor(self.user_email, self.graph_client, logger)
-            return await temp_monitor.get_folder_id(folder_path)
+            if self._folder_monitor is None:
+                from email_monitoring.core.monitor import OutlookMonitor
+                self._folder_monitor = OutlookMonitor(self.user_email, self.graph_client, logger)
+            return await folder_cache.get(self.user_email, folder_path, self._folder_monitor.get_folder_id)
         except Exception as e:
             logger.log_exception(
                e,
@@ -366,11 +538,33 @@ class EmailProcessorService:
             )
             return None
 
+    async def warm_folder_cache(self, folder_paths):
+        """Resolve folder IDs ahead of time so the first moves don't pay for it"""
+        resolved = {}
+        for folder_path in folder_paths:
+            resolved[folder_path] = await self.get_folder_id_by_path(folder_path)
+
+        logger.info(
+            f"Folder ID cache warmed for {sum(1 for f in resolved.values() if f)} of {len(resolved)} folders",
+            event_type=EventType.SYSTEM_EVENT,
+            entity=self.my_entity,
+            user_id="system",
+            data={"folders": {path: bool(folder_id) for path, folder_id in resolved.items()}},
+            tags=["email", "folder", "cache"]
+        )
+        return resolved
+
     def get_trade_details(self, trade_number: str) -> Optional[Dict]:
        """Get the details of a trade from unmatched_trades.json"""
        try:
-           for trade in self.unmatched_trades:
-               if str(trade.get('TradeNumber')) == str(trade_number):
+           self.reload_unmatched_trades_if_changed()
+           trade = self.trade_index.get(self.normalize_trade_number(trade_number))
+           self.trade_lookup_stats.record("hits" if trade is not None else "misses")
+
+           # Per-lookup events are sampled (LOG_SAMPLE_RATES); the message and
+           # data are only built for the events that are actually logged
+           if trade is not None:
+               if logger.is_enabled_for("INFO") and log_sampler.should_log(["trade", "lookup", "success"]):
                    logger.info(
                        f"Found trade details for trade number: {trade_number}",
                        event_type=EventType.SYSTEM_EVENT,
@@ -379,16 +573,17 @@ class EmailProcessorService:
                        data={"trade_number": trade_number},
                        tags=["trade", "lookup", "success"]
                    )
-                   return trade
+               return trade
                    
-           logger.info(
-               f"No trade details found for trade number: {trade_number}",
-               event_type=EventType.SYSTEM_EVENT,
-               entity=self.my_entity,
-               user_id="system",
-               data={"trade_number": trade_number},
-               tags=["trade", "lookup", "not_found"]
-           )
+           if logger.is_enabled_for("INFO") and log_sampler.should_log(["trade", "lookup", "not_found"]):
+               logger.info(
+                   f"No trade details found for trade number: {trade_number}",
+                   event_type=EventType.SYSTEM_EVENT,
+                   entity=self.my_entity,
+                   user_id="system",
+                   data={"trade_number": trade_number},
+                   tags=["trade", "lookup", "not_found"]
+               )
            return None
        except Exception as e:
            logger.log_exception(
@@ -413,46 +608,20 @@ class EmailProcessorService:
                tags=["email", "status", "update"]
            )
            
-           email_matches_file = os.path.join(self.assets_path, 'email_matches.json')
-           
-           if not os.path.exists(email_matches_file):
+           try:
+               previous_status = self.match_repository.update_email_status(email_id, status)
+           except FileNotFoundError:
                error_msg = "Email matches file not found"
                logger.error(
                    error_msg,
                    event_type=EventType.SYSTEM_EVENT,
                    entity=self.my_entity,
                    user_id="system",
-                   data={"path": email_matches_file},
+                   data={"path": self.match_repository.snapshot_path(EMAIL_MATCHES)},
                    tags=["email", "file", "error"]
                )
                return {"success": False, "message": error_msg}
-           
-           with open(email_matches_file, 'r', encoding='utf-8') as f:
-               email_matches = json.load(f)
-           
-           found = False
-           for email in email_matches:
-               if email.get("InferredTradeID") == email_id:
-                   # Store previous status before updating
-                   email["previous_status"] = email.get("status", "")
-                   email["status"] = status
-                   found = True
-                   break
-           
-           if found:
-               logger.info(
-                   f"Updated email status to '{status}'",
-                   event_type=EventType.DATA_CHANGE,
-                   entity=self.my_entity,
-                   user_id="system",
-                   data={
-                       "email_id": email_id, 
-                       "status": status,
-                       "previous_status": email.get("previous_status", "")
-                   },
-                   tags=["email", "status", "success"]
-               )
-           else:
+           except MatchNotFoundError:
                error_msg = f"Email with ID {email_id} not found"
                logger.warning(
                    error_msg,
@@ -464,8 +633,18 @@ class EmailProcessorService:
                )
                return {"success": False, "message": error_msg}
            
-           with open(email_matches_file, 'w', encoding='utf-8') as f:
-               json.dump(email_matches, f, indent=2, ensure_ascii=False)
+           logger.info(
+               f"Updated email status to '{status}'",
+               event_type=EventType.DATA_CHANGE,
+               entity=self.my_entity,
+               user_id="system",
+               data={
+                   "email_id": email_id, 
+                   "status": status,
+                   "previous_status": previous_status
+               },
+               tags=["email", "status", "success"]
+           )
            
            return {"success": True, "message": f"Email status updated to {status}"}
        
@@ -493,45 +672,31 @@ class EmailProcessorService:
                tags=["email", "status", "undo"]
            )
            
-           email_matches_file = os.path.join(self.assets_path, 'email_matches.json')
-           
-           if not os.path.exists(email_matches_file):
+           try:
+               previous_status = self.match_repository.undo_status_change(email_id)
+           except FileNotFoundError:
                error_msg = "Email matches file not found"
                logger.error(
                    error_msg,
                    event_type=EventType.SYSTEM_EVENT,
                    entity=self.my_entity,
                    user_id="system",
-                   data={"path": email_matches_file},
+                   data={"path": self.match_repository.snapshot_path(EMAIL_MATCHES)},
                    tags=["email", "file", "error"]
                )
                return {"success": False, "message": error_msg}
-           
-           with open(email_matches_file, 'r', encoding='utf-8') as f:
-               email_matches = json.load(f)
-           
-           found = False
-           previous_status = None
-           for email in email_matches:
-               if email.get("InferredTradeID") == email_id:
-                   if "previous_status" in email:
-                       previous_status = email["previous_status"]
-                       email["status"] = previous_status
-                       found = True
-                   else:
-                       error_msg = "No previous status found to undo"
-                       logger.warning(
-                           error_msg,
-                           event_type=EventType.SYSTEM_EVENT,
-                           entity=self.my_entity,
-                           user_id="system",
-                           data={"email_id": email_id},
-                           tags=["email", "status", "no_previous"]
-                       )
-                       return {"success": False, "message": error_msg}
-                   break
-           
-           if not found:
+           except NoPreviousStatusError:
+               error_msg = "No previous status found to undo"
+               logger.warning(
+                   error_msg,
+                   event_type=EventType.SYSTEM_EVENT,
+                   entity=self.my_entity,
+                   user_id="system",
+                   data={"email_id": email_id},
+                   tags=["email", "status", "no_previous"]
+               )
+               return {"success": False, "message": error_msg}
+           except MatchNotFoundError:
                error_msg = f"Email with ID {email_id} not found"
                logger.warning(
                    error_msg,
@@ -543,9 +708,6 @@ class EmailProcessorService:
                )
                return {"success": False, "message": error_msg}
            
-           with open(email_matches_file, 'w', encoding='utf-8') as f:
-               json.dump(email_matches, f, indent=2, ensure_ascii=False)
-           
            logger.info(
                f"Successfully reverted email status to '{previous_status}'",
                event_type=EventType.DATA_CHANGE,
@@ -580,13 +742,7 @@ class EmailProcessorService:
                tags=["file", "clear"]
            )
            
-           if file_type == 'email_matches':
-               file_path = os.path.join(self.assets_path, 'email_matches.json')
-               file_name = 'email_matches.json'
-           elif file_type == 'matched_trades':
-               file_path = os.path.join(self.assets_path, 'matched_trades.json')
-               file_name = 'matched_trades.json'
-           else:
+           if file_type not in (EMAIL_MATCHES, IDENTIFIED_TRADES):
                error_msg = f"Invalid file type: {file_type}"
                logger.error(
                    error_msg,
@@ -597,8 +753,13 @@ class EmailProcessorService:
                    tags=["file", "invalid"]
                )
                return {"success": False, "message": error_msg}
+
+           file_path = self.match_repository.snapshot_path(file_type)
+           file_name = os.path.basename(file_path)
            
-           if not os.path.exists(file_path):
+           try:
+               self.match_repository.clear(file_type)
+           except FileNotFoundError:
                error_msg = f"{file_name} not found"
                logger.error(
                    error_msg,
@@ -610,9 +771,6 @@ class EmailProcessorService:
                )
                return {"success": False, "message": error_msg}
            
-           with open(file_path, 'w', encoding='utf-8') as f:
-               f.write('[]')
-           
            logger.info(
                f"Successfully cleared {file_name}",
                event_type=EventType.DATA_CHANGE,
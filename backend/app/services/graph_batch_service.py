@@ -0,0 +1,230 @@
+# backend/app/services/graph_batch_service.py
+import asyncio
+import os
+import urllib.parse
+from datetime import datetime, UTC
+from email.utils import parsedate_to_datetime
+import aiohttp
+from ..core.logger import logger
+from core_logging.client import EventType, LogLevel
+
+GRAPH_BATCH_URL = "https://graph.microsoft.com/v1.0/$batch"
+GRAPH_SCOPE = "https://graph.microsoft.com/.default"
+# Graph rejects batches with more than 20 requests
+MAX_BATCH_SIZE = 20
+# Per-request statuses worth retrying in a later batch
+RETRYABLE_STATUSES = (429, 503, 504)
+# Retry delay when a throttled response has no usable Retry-After header
+DEFAULT_RETRY_AFTER_SECONDS = 1.0
+
+
+class GraphBatchError(Exception):
+    """A request inside a $batch call failed"""
+
+    def __init__(self, status, body=None):
+        message = (body or {}).get("error", {}).get("message") if isinstance(body, dict) else None
+        super().__init__(f"Graph batch request failed with status {status}: {message or body}")
+        # Same attribute name as the SDK's APIError so callers can treat both alike
+        self.response_status_code = status
+        self.body = body
+
+
+class _PendingRequest:
+    def __init__(self, request, future):
+        self.request = request
+        self.future = future
+        self.attempts = 0
+
+
+class _LoopBatchState:
+    """Pending requests and HTTP session belonging to one event loop"""
+
+    def __init__(self):
+        self.pending = []
+        self.flush_handle = None
+        # Running flushes; the loop only keeps weak references to tasks
+        self.flush_tasks = set()
+        self.session = None
+
+
+def parse_retry_after(value) -> float:
+    """Seconds to wait from a Retry-After header, which is either seconds or an HTTP date"""
+    if value is None:
+        return DEFAULT_RETRY_AFTER_SECONDS
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        retry_at = parsedate_to_datetime(str(value))
+    except (TypeError, ValueError, IndexError):
+        return DEFAULT_RETRY_AFTER_SECONDS
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=UTC)
+    return max(0.0, (retry_at - datetime.now(UTC)).total_seconds())
+
+
+class GraphBatchService:
+    """Combines Graph mailbox mutations into JSON $batch requests
+
+    Callers await ``submit()`` as if it were a single request. Requests are
+    collected for a short window (or until MAX_BATCH_SIZE are pending), sent
+    as one $batch call, and each caller gets its own response body or
+    GraphBatchError back. Throttled requests are retried in a later batch.
+    """
+
+    def __init__(self, credential, window_seconds: float = 0.05, max_batch_size: int = MAX_BATCH_SIZE,
+                 max_attempts: int = 3):
+        self.credential = credential
+        self.window_seconds = window_seconds
+        self.max_batch_size = max(1, min(max_batch_size, MAX_BATCH_SIZE))
+        self.max_attempts = max(1, max_attempts)
+        self.my_entity = os.environ.get('MY_ENTITY')
+
+        # aiohttp sessions and futures are bound to a loop, so state is kept per loop
+        self._states = {}
+
+    def _get_state(self) -> _LoopBatchState:
+        loop = asyncio.get_running_loop()
+        state = self._states.get(loop)
+        if state is None:
+            state = self._states[loop] = _LoopBatchState()
+        return state
+
+    @staticmethod
+    def message_url(user_email: str, message_id: str, action: str = None) -> str:
+        url = f"/users/{urllib.parse.quote(user_email, safe='@')}/messages/{urllib.parse.quote(message_id, safe='')}"
+        return f"{url}/{action}" if action else url
+
+    async def submit(self, method: str, url: str, body: dict = None):
+        """Queue one Graph request and wait for its response body"""
+        request = {"method": method, "url": url}
+        if body is not None:
+            request["body"] = body
+            request["headers"] = {"Content-Type": "application/json"}
+
+        state = self._get_state()
+        pending = _PendingRequest(request, asyncio.get_running_loop().create_future())
+        self._enqueue(state, pending)
+        return await pending.future
+
+    def _enqueue(self, state: _LoopBatchState, pending: _PendingRequest, delay: float = None):
+        state.pending.append(pending)
+        if len(state.pending) >= self.max_batch_size:
+            self._schedule_flush(state, 0)
+        elif state.flush_handle is None:
+            self._schedule_flush(state, self.window_seconds if delay is None else delay)
+
+    def _schedule_flush(self, state: _LoopBatchState, delay: float):
+        if state.flush_handle is not None:
+            state.flush_handle.cancel()
+        state.flush_handle = asyncio.get_running_loop().call_later(delay, self._start_flush, state)
+
+    def _start_flush(self, state: _LoopBatchState):
+        state.flush_handle = None
+        task = asyncio.get_running_loop().create_task(self._flush(state))
+        state.flush_tasks.add(task)
+        task.add_done_callback(state.flush_tasks.discard)
+
+    async def _flush(self, state: _LoopBatchState):
+        # Requests queued while these are in flight (including retries) go out in a later flush
+        due, state.pending = state.pending, []
+        for start in range(0, len(due), self.max_batch_size):
+            batch = due[start:start + self.max_batch_size]
+            try:
+                await self._send_batch(state, batch)
+            except Exception as e:
+                logger.log_exception(
+                    e,
+                    message="Error handling Graph batch response",
+                    entity=self.my_entity,
+                    user_id="system",
+                    data={"batch_size": len(batch)},
+                    tags=["graph", "batch", "error"]
+                )
+            finally:
+                # Every caller awaits its future without a timeout, so none may be left unresolved
+                for pending in batch:
+                    if not pending.future.done() and pending not in state.pending:
+                        pending.future.set_exception(GraphBatchError(None, "Batched request was not completed"))
+
+    async def _send_batch(self, state: _LoopBatchState, batch):
+        requests = []
+        for index, pending in enumerate(batch):
+            pending.attempts += 1
+            requests.append({"id": str(index), **pending.request})
+
+        try:
+            token = await asyncio.to_thread(self.credential.get_token, GRAPH_SCOPE)
+            if state.session is None or state.session.closed:
+                state.session = aiohttp.ClientSession()
+            async with state.session.post(
+                GRAPH_BATCH_URL,
+                json={"requests": requests},
+                headers={"Authorization": f"Bearer {token.token}"}
+            ) as response:
+                payload = await response.json(content_type=None)
+                if response.status >= 400:
+                    raise GraphBatchError(response.status, payload)
+        except Exception as e:
+            logger.log_exception(
+                e,
+                message="Error sending Graph batch request",
+                entity=self.my_entity,
+                user_id="system",
+                data={"batch_size": len(batch)},
+                tags=["graph", "batch", "error"]
+            )
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+            return
+
+        responses = {item.get("id"): item for item in payload.get("responses", [])}
+        retry_after = 0
+        retried = 0
+        for index, pending in enumerate(batch):
+            if pending.future.done():
+                continue
+            item = responses.get(str(index))
+            if item is None:
+                pending.future.set_exception(GraphBatchError(None, "No response for batched request"))
+                continue
+
+            status = item.get("status", 500)
+            if status < 400:
+                pending.future.set_result(item.get("body"))
+            elif status in RETRYABLE_STATUSES and pending.attempts < self.max_attempts:
+                headers = {k.lower(): v for k, v in (item.get("headers") or {}).items()}
+                retry_after = max(retry_after, parse_retry_after(headers.get("retry-after")))
+                self._enqueue(state, pending, delay=retry_after)
+                retried += 1
+            else:
+                pending.future.set_exception(GraphBatchError(status, item.get("body")))
+
+        logger.info(
+            f"Sent Graph batch of {len(batch)} requests",
+            event_type=EventType.INTEGRATION,
+            entity=self.my_entity,
+            user_id="system",
+            data={"batch_size": len(batch), "retried": retried, "retry_after": retry_after},
+            tags=["graph", "batch"]
+        )
+
+    async def close(self):
+        """Send anything still pending and close this loop's HTTP session"""
+        state = self._states.pop(asyncio.get_running_loop(), None)
+        if state is None:
+            return
+        # Retries are sent straight away; each request has a bounded number of attempts
+        while True:
+            if state.flush_handle is not None:
+                state.flush_handle.cancel()
+                state.flush_handle = None
+            if state.flush_tasks:
+                await asyncio.gather(*state.flush_tasks, return_exceptions=True)
+            if not state.pending:
+                break
+            await self._flush(state)
+        if state.session is not None:
+            await state.session.close()
@@ -1,17 +1,122 @@
 import os
 import json
+import threading
+import time
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Callable, Dict, Optional
 import asyncio
 from ..config import Config
 from ..core.logger import logger
+from ..core.llm_cache import LLMResponseCache
+from ..core.llm_routing import CircuitBreaker, LatencyHistogram
+from ..core.rate_limiter import RateLimiter
+from ..core.body_compaction import estimate_tokens
+from ..schemas.confirmation import InvalidLLMResponseError, normalize_llm_response
 from core_logging.client import EventType, LogLevel
 from core_ai_cost import AICostCalculator, AIProvider
-from llm_services import LLMService as CoreLLMService, LLMRequest, LLMResponse
+from llm_services import LLMService as CoreLLMService, LLMRequest
+
+EXTRACTION_SYSTEM_MESSAGE = "You are an expert in the field of OTC derivatives and FX. You have many years of experience in trade confirmations so you are able to extract the relevantdata from the email and return it in a structured format."
+
+# Static part of the extraction prompt. It is sent as the system message, ahead of
+# the per-email payload, so the prefix is byte-identical on every call. That is
+# all that is done for prompt caching: llm_services' LLMRequest has no option to
+# mark a cacheable prefix, so only providers that cache long prefixes
+# automatically (e.g. OpenAI) benefit.
+EXTRACTION_INSTRUCTIONS = """Tell me if the email at the end of the user message is regarding a confirmation of a trade, regardless of whether the sender is confirming or rejecting it.
+
+Look for the trade number in the subject of the email, in the body and in the attachment text.
+
+I also need you to extract some data from the email body and the attachments. You should use the email as a more likely source of truth.
+Data in the email body should override data in the attachments. This is because it is text from a human indicating whether they agree with the
+trade data in the attachments or not. Data in the email body should also override data in the email subject, as it is possible that the conversation
+has moved on from the initial subject line.
+
+The specific data you need to find is as follows:
+
+- Trade Number, a number indicating the ID of the trade
+- Counterparty ID, a number indicating the ID of the counterparty (the Client ID in the email details, if given)
+- Counterparty Name, a company name (the Entity in the email details, if given)
+- Product Type, usually one of the following values: "Seguro de Cambio", "Seguro de Inflación", "Arbitraje", "Forward" or "Spot"
+- Currency 1, an ISO 4217 currency code
+- Amount of Currency 1, a number
+- Currency 2, an ISO 4217 currency code
+- Amount of Currency, a number (the amount of currency 1 multiplied by the forward price)
+- Buyer, a company name
+- Seller, a company name
+- Settlement Type, usually one of the following values: "Non-Deliverable", "Deliverable"
+- Settlement Currency, an ISO 4217 currency code
+- Value Date, a date, which can be in different formats
+- Maturity Date, a date, which can be in different formats
+- Payment Date, a date, which can be in different formats
+- Duration, an integer number, indicating the number of days between the value date and the maturity date
+- Forward Price, a number usually with decimal places
+- Fixing Reference, usually one of the following values: "USD Obs", "CLP Obs"
+- Counterparty Payment Method, look in fields labelled "Forma de Pago". Usually one of the following values: "Trans Alto Valor", "ComBanc", "SWIFT", "Cuenta Corriente".
+- Bank Payment Method, look in fields labelled "Forma de Pago". Usually one of the following values: "Trans Alto Valor", "ComBanc", "SWIFT", "Cuenta Corriente"
+
+Return this in a JSON format, but do not include any markdown formatting such as ```json or ```. This causes errors so I really need you to return it without any markdown formatting.
+DO NOT return any other text than the JSON, as this causes errors.
+
+The required structured of the JSON file is as follows:
+
+{
+    "Email": {
+        "Email_subject": string,
+        "Email_sender": string,
+        "Email_date": date (dd-mm-yyyy),
+        "Email_time": time (hh:mm:ss),
+        "Confirmation": string (Yes if it has at least one confirmation of a trade (regardless of whether the counterparty agrees or disagrees), or No if there are no references to confirmations of trades)
+        "Num_trades": integer (the number of trades referred to in the email),
+    },
+    "Trades": [
+        {
+            "Confirmation_OK": string (Yes or No),
+            "TradeNumber": string,
+            "CounterpartyID": string,
+            "CounterpartyName": string,
+            "ProductType": string,
+            "Currency1": string (ISO 4217 currency code),
+            "QuantityCurrency1": number to a minimum of two decimal places,
+            "Currency2": string (ISO 4217 currency code),
+            "QuantityCurrency2": number to a minimum of two decimal places,
+            "Buyer": string,
+            "Seller": string,
+            "SettlementType": string, ("Non-Deliverable" or "Deliverable"),
+            "SettlementCurrency": string (ISO 4217 currency code),
+            "ValueDate": date in format dd-mm-yyyy,
+            "MaturityDate": date in format dd-mm-yyyy,
+            "PaymentDate": date in format dd-mm-yyyy,
+            "Duration": integer,
+            "ForwardPrice": number to a minimum of two decimal places,
+            "FixingReference": string,
+            "CounterpartyPaymentMethod": string,
+            "BankPaymentMethod": string
+        }
+        // Repeat as many times as there are trades in the email
+    ]
+}
+
+Now STOP for a minute, before you return the JSON. I need you to compare the data you have extracted into the Trades array in the JSON with the data in the email. If there is any difference on a specific field, overwrite the data in the JSON with the data you think is correct in the email.
+Remember that QuantityCurrency2 is the amount of currency 1 multiplied by the forward price, so if any of these values have changed, you need to update QuantityCurrency2.
+
+I repeat, the email body is the best source of truth.
+
+DO NOT return any other text than the JSON, as this causes errors. NO MARKDOWN.
+"""
+
+EXTRACTION_PREFIX = f"{EXTRACTION_SYSTEM_MESSAGE}\n\n{EXTRACTION_INSTRUCTIONS}"
+
+CLASSIFICATION_SYSTEM_MESSAGE = "You classify emails received by the trade confirmations desk of a bank. Answer with a single word: Yes or No."
+
+# Only the start of the body and attachments is needed to tell whether an email is a confirmation
+CLASSIFICATION_BODY_CHARS = 2000
+CLASSIFICATION_ATTACHMENT_CHARS = 1000
 
 class LLMService:
-    def __init__(self, graph_client=None):
+    def __init__(self, graph_client=None, email_processor_service=None):
         self.graph_client = graph_client
+        self.email_processor_service = email_processor_service
         self.my_entity = os.environ.get('MY_ENTITY')
 
         # Record available API keys
@@ -36,9 +141,37 @@ class LLMService:
             log_client=logger
         )
 
-        # Cache for LLM service instances
+        # Cache for LLM service instances. These are only ever used from the
+        # monitor's event loop, so their connection pools are shared by all emails.
         self.llm_instances = {}
 
+        # Cache of responses for byte-identical requests (retries, forwarded copies)
+        self.response_cache = LLMResponseCache(
+            db_path=os.path.join(Config.CACHE_PATH, 'llm_responses.sqlite3'),
+            ttl_seconds=Config.LLM_CACHE_TTL_SECONDS,
+            max_entries=Config.LLM_CACHE_MAX_ENTRIES,
+            disabled_providers=Config.LLM_CACHE_DISABLED_PROVIDERS,
+            enabled=Config.LLM_CACHE_ENABLED
+        )
+
+        # Bound the number of emails in flight with the LLMs, overall and per provider.
+        # asyncio semaphores are bound to one event loop, so they are created for
+        # each monitor run (see _get_global_semaphore)
+        self._semaphore_loop = None
+        self._global_semaphore = None
+        self._provider_semaphores = {}
+
+        # Failover and hedging state: a circuit breaker per provider and a
+        # latency histogram per provider/model
+        self.circuit_breakers = {}
+        self.latency_histograms = {}
+
+        # Client-side RPM/TPM limiters per provider/model
+        self.rate_limiters = {}
+
+        # Guards inserts into the per-provider dicts, which /llm-metrics reads from a Flask thread
+        self._stats_lock = threading.Lock()
+
     def _get_llm_instance(self, provider: str):
         """Get or create a provider-specific LLM service instance"""
         if provider not in self.llm_instances:
@@ -74,29 +207,217 @@ class LLMService:
             
         return self.llm_instances[provider]
     
-    def process_email_data(self, email_data: Dict, ai_provider: str = "OpenAI") -> str:
-        """Process email data using the specified AI provider (synchronous wrapper)"""
-        # Use ThreadPoolExecutor to run async code from sync context
-        import concurrent.futures
-        import threading
-        
-        # Define function to run in separate thread
-        def run_async_in_thread():
-            # Create new event loop for this thread
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
+    async def process_email_data(self, email_data: Dict, ai_provider: Optional[str] = None) -> str:
+        """Process email data, failing over along the provider chain
+
+        ai_provider, if given, is tried first, followed by the rest of
+        LLM_PROVIDER_CHAIN. Awaited directly on the caller's event loop so the
+        cached provider clients (and their HTTP connection pools) are reused
+        across emails.
+        """
+        async with self._get_global_semaphore():
+            return await self._process_with_failover(email_data, self._get_provider_chain(ai_provider))
+
+    def _get_provider_chain(self, preferred: Optional[str] = None):
+        """Providers to try in order: configured, with an API key, and with a closed circuit"""
+        chain = [preferred] if preferred else []
+        chain += [provider for provider in Config.LLM_PROVIDER_CHAIN if provider not in chain]
+        available = [provider for provider in chain if self.services_available.get(provider)]
+        allowed = [provider for provider in available if self._get_circuit_breaker(provider).allow_request()]
+        # With every circuit open, still try them rather than fail the email outright;
+        # with no API keys at all, _get_llm_instance reports the configuration error
+        return allowed or available or chain
+
+    async def _process_with_failover(self, email_data: Dict, chain) -> str:
+        """Try each provider in turn, hedging a slow one with the next in the chain"""
+        remaining = list(chain)
+        tasks = set()
+        last_error = None
+        try:
+            while remaining:
+                provider = remaining.pop(0)
+                tasks = {asyncio.create_task(self._attempt_provider(email_data, provider))}
+
+                hedge_delay = self._get_hedge_delay(provider) if remaining else None
+                if hedge_delay is not None:
+                    done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+                    if not done:
+                        hedge_provider = remaining.pop(0)
+                        logger.info(
+                            f"{provider} slower than {hedge_delay}s, hedging with {hedge_provider}",
+                            event_type=EventType.INTEGRATION,
+                            entity=self.my_entity,
+                            user_id="system",
+                            data={"provider": provider, "hedge_provider": hedge_provider,
+                                  "hedge_delay_seconds": hedge_delay, "subject": email_data.get('subject')},
+                            tags=["llm", "hedge", provider.lower(), hedge_provider.lower()]
+                        )
+                        tasks.add(asyncio.create_task(self._attempt_provider(email_data, hedge_provider)))
+
+                # The first successful answer wins; the other request is cancelled
+                while tasks:
+                    done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        if task.exception() is None:
+                            return task.result()
+                        last_error = task.exception()
+
+                if remaining:
+                    logger.warning(
+                        f"LLM request failed, failing over to {remaining[0]}: {str(last_error)}",
+                        event_type=EventType.INTEGRATION,
+                        entity=self.my_entity,
+                        user_id="system",
+                        data={"failed_provider": provider, "next_provider": remaining[0],
+                              "subject": email_data.get('subject')},
+                        tags=["llm", "failover", provider.lower()]
+                    )
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        raise last_error or Exception("No LLM provider configured")
+
+    async def _attempt_provider(self, email_data: Dict, provider: str) -> str:
+        """One provider attempt, bounded by its concurrency limit
+
+        The provider timeout applies to each API call in _send_request, so
+        time spent queued by the rate limiter never counts as a failure.
+        """
+        breaker = self._get_circuit_breaker(provider)
+
+        async with self._get_provider_semaphore(provider):
             try:
-                # Run async function to completion
-                return loop.run_until_complete(
-                    self._async_process_email_data(email_data, ai_provider)
+                result = await self._async_process_email_data(email_data, provider)
+            except InvalidLLMResponseError:
+                # The provider answered; a malformed answer doesn't count against its circuit
+                raise
+            except Exception:
+                self._record_provider_failure(provider, breaker)
+                raise
+
+        breaker.record_success()
+        return result
+
+    def _record_provider_failure(self, provider: str, breaker: CircuitBreaker):
+        if breaker.record_failure():
+            logger.warning(
+                f"Circuit opened for {provider} for {breaker.open_seconds}s",
+                event_type=EventType.INTEGRATION,
+                entity=self.my_entity,
+                user_id="system",
+                data={"provider": provider, **breaker.snapshot()},
+                tags=["llm", "circuit_breaker", provider.lower()]
+            )
+
+    def _get_hedge_delay(self, provider: str) -> Optional[float]:
+        """Latency percentile of the provider's extraction model, once enough samples exist"""
+        if not Config.LLM_HEDGE_ENABLED:
+            return None
+        histogram = self.latency_histograms.get((provider, self._get_stage_model(provider, "extraction")))
+        if histogram is None or histogram.count < Config.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return histogram.percentile(Config.LLM_HEDGE_PERCENTILE)
+
+    def _get_global_semaphore(self) -> asyncio.Semaphore:
+        """Get the semaphore bounding all LLM calls, with fresh semaphores for a new event loop"""
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            self._semaphore_loop = loop
+            self._global_semaphore = asyncio.Semaphore(max(1, Config.EMAIL_PROCESSING_CONCURRENCY))
+            self._provider_semaphores = {}
+        return self._global_semaphore
+
+    def _get_provider_semaphore(self, provider: str) -> asyncio.Semaphore:
+        """Get the semaphore bounding concurrent LLM calls for a provider"""
+        if provider not in self._provider_semaphores:
+            limit = Config.LLM_PROVIDER_CONCURRENCY.get(provider, Config.EMAIL_PROCESSING_CONCURRENCY)
+            self._provider_semaphores[provider] = asyncio.Semaphore(max(1, limit))
+        return self._provider_semaphores[provider]
+
+    def _get_circuit_breaker(self, provider: str) -> CircuitBreaker:
+        if provider not in self.circuit_breakers:
+            with self._stats_lock:
+                self.circuit_breakers[provider] = CircuitBreaker(
+                    failure_threshold=Config.LLM_CIRCUIT_FAILURE_THRESHOLD,
+                    open_seconds=Config.LLM_CIRCUIT_OPEN_SECONDS
                 )
-            finally:
-                loop.close()
-        
-        # Execute in thread pool to avoid event loop conflicts
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            future = executor.submit(run_async_in_thread)
-            return future.result()
+        return self.circuit_breakers[provider]
+
+    def _get_latency_histogram(self, provider: str, model: str) -> LatencyHistogram:
+        key = (provider, model)
+        if key not in self.latency_histograms:
+            with self._stats_lock:
+                self.latency_histograms[key] = LatencyHistogram()
+        return self.latency_histograms[key]
+
+    def _get_rate_limiter(self, provider: str, model: str) -> RateLimiter:
+        """Get the RPM/TPM limiter of a provider/model ("Provider/model" limits override "Provider" ones)"""
+        key = (provider, model)
+        if key not in self.rate_limiters:
+            with self._stats_lock:
+                self.rate_limiters[key] = RateLimiter(
+                    requests_per_minute=Config.LLM_RATE_LIMIT_RPM.get(f"{provider}/{model}", Config.LLM_RATE_LIMIT_RPM.get(provider, 0)),
+                    tokens_per_minute=Config.LLM_RATE_LIMIT_TPM.get(f"{provider}/{model}", Config.LLM_RATE_LIMIT_TPM.get(provider, 0))
+                )
+        return self.rate_limiters[key]
+
+    def get_rate_limit_stats(self) -> Dict:
+        """Queue depth, wait times and 429 counts per provider/model"""
+        with self._stats_lock:
+            rate_limiters = list(self.rate_limiters.items())
+        return {f"{provider}/{model}": limiter.snapshot() for (provider, model), limiter in rate_limiters}
+
+    def get_routing_stats(self) -> Dict:
+        """Circuit state per provider and latency distribution per provider/model"""
+        with self._stats_lock:
+            circuit_breakers = list(self.circuit_breakers.items())
+            latency_histograms = list(self.latency_histograms.items())
+        return {
+            "circuits": {provider: breaker.snapshot() for provider, breaker in circuit_breakers},
+            "latency": {
+                f"{provider}/{model}": histogram.snapshot()
+                for (provider, model), histogram in latency_histograms
+            }
+        }
+
+    async def report_metrics(self, interval_seconds: float):
+        """Log rate-limit and routing stats every interval_seconds until cancelled"""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            if not self.rate_limiters and not self.circuit_breakers:
+                continue
+            logger.info(
+                "LLM rate limit and routing metrics",
+                event_type=EventType.INTEGRATION,
+                entity=self.my_entity,
+                user_id="system",
+                data={"rate_limits": self.get_rate_limit_stats(), **self.get_routing_stats()},
+                tags=["llm", "metrics", "rate_limit"]
+            )
+
+    async def close(self):
+        """Release the HTTP resources held by the cached provider clients
+
+        The clients are recreated on the next monitor run. The response cache is
+        shared for the life of the process and stays open.
+        """
+        for provider, instance in list(self.llm_instances.items()):
+            try:
+                close = getattr(instance, "aclose", None) or getattr(instance, "close", None)
+                if close:
+                    result = close()
+                    if asyncio.iscoroutine(result):
+                        await result
+            except Exception as e:
+                logger.warning(
+                    f"Error closing {provider} client: {str(e)}",
+                    event_type=EventType.SYSTEM_EVENT,
+                    entity=self.my_entity,
+                    user_id="system",
+                    tags=["llm", provider.lower(), "shutdown"]
+                )
+        self.llm_instances.clear()
             
     async def _async_process_email_data(self, email_data: Dict, ai_provider: str = "OpenAI") -> str:
         """Async implementation of email data processing"""
@@ -113,9 +434,71 @@ class LLMService:
             tags=["llm", "processing", ai_provider.lower()]
         )
         
-        # Format the email data
-        formatted_data = f"""
-        Email Details:
+        try:
+            # A cheap model screens out non-confirmations before the full extraction
+            if Config.LLM_TWO_TIER_ENABLED and not await self._classify_email(email_data, ai_provider):
+                return self._not_confirmation_response(email_data)
+
+            prompt = self._build_extraction_prompt(email_data)
+            try:
+                return await self._generate(
+                    ai_provider, "extraction", EXTRACTION_PREFIX, prompt,
+                    max_tokens=1000, validate=normalize_llm_response
+                )
+            except InvalidLLMResponseError as e:
+                # Only reached when the local repair could not fix the response. The
+                # same prompt at temperature 0 would mostly repeat the same answer, so
+                # the retry tells the model what was wrong
+                logger.warning(
+                    f"Invalid extraction response from {ai_provider}, retrying once: {str(e)[:200]}",
+                    event_type=EventType.INTEGRATION,
+                    entity=self.my_entity,
+                    user_id="system",
+                    data={"provider": ai_provider, "subject": email_data.get('subject')},
+                    tags=["llm", "extraction", "invalid_response", ai_provider.lower()]
+                )
+                return await self._generate(
+                    ai_provider, "extraction", EXTRACTION_PREFIX, self._build_correction_prompt(prompt, e),
+                    max_tokens=1000, validate=normalize_llm_response
+                )
+
+        except Exception as e:
+            logger.log_exception(
+                e,
+                message=f"Error processing with {ai_provider} API",
+                entity=self.my_entity,
+                user_id="system",
+                data={
+                    "provider": ai_provider, 
+                    "subject": email_data.get('subject'),
+                    "error": str(e)
+                },
+                level=LogLevel.ERROR,
+                tags=["llm", "error", ai_provider.lower()]
+            )
+            if isinstance(e, InvalidLLMResponseError):
+                raise InvalidLLMResponseError(f"Error processing with {ai_provider} API: {str(e)}") from e
+            raise Exception(f"Error processing with {ai_provider} API: {str(e)}")
+
+    @staticmethod
+    def _get_llm_body(email_data: Dict) -> str:
+        """The compacted body when ConfirmationService provided one, else the full body"""
+        return email_data.get('llm_body_content') or email_data.get('body_content') or ''
+
+    @staticmethod
+    def _build_correction_prompt(prompt: str, error: Exception) -> str:
+        """The extraction prompt followed by the reason the previous answer was rejected"""
+        return f"""{prompt}
+
+        Your previous answer was not valid JSON in the requested format:
+        {str(error)[:1000]}
+
+        Return only the corrected JSON.
+        """
+
+    def _build_extraction_prompt(self, email_data: Dict) -> str:
+        """Build the per-email part of the extraction prompt (the instructions are in EXTRACTION_PREFIX)"""
+        return f"""Email Details:
         Subject: {email_data.get('subject')}
         Date: {email_data.get('received_date')}
         Time: {email_data.get('received_time')}
@@ -124,182 +507,285 @@ class LLMService:
         Client ID: {email_data.get('client_id')}
 
         Body Content:
-        {email_data.get('body_content')}
+        {self._get_llm_body(email_data)}
 
         Attachments:
         {email_data.get('attachments_text', 'No attachments')}
+
+        Return the JSON for this email.
         """
 
-        prompt = f"""Tell me if this email is regarding a confirmation of a trade, regardless of whether the sender is confirming or rejecting it:
-
-                {formatted_data}
-
-                Look for the trade number in the subject of the email, in the body and in the attachment text.
-
-                I also need you to extract some data from the email body and the attachments. You should use the email as a more likely source of truth.
-                Data in the email body should override data in the attachments. This is because it is text from a human indicating whether they agree with the
-                trade data in the attachments or not. Data in the email body should also override data in the email subject, as it is possible that the conversation
-                has moved on from the initial subject line.
-
-                The specific data you need to find is as follows:
-                 
-                - Trade Number, a number indicating the ID of the trade
-                - Counterparty ID, a number indicating the ID of the counterparty {email_data.get('client_id')}
-                - Counterparty Name, a company name {email_data.get('entity_name')}
-                - Product Type, usually one of the following values: "Seguro de Cambio", "Seguro de Inflación", "Arbitraje", "Forward" or "Spot"
-                - Currency 1, an ISO 4217 currency code
-                - Amount of Currency 1, a number
-                - Currency 2, an ISO 4217 currency code
-                - Amount of Currency, a number (the amount of currency 1 multiplied by the forward price)
-                - Buyer, a company name
-                - Seller, a company name
-                - Settlement Type, usually one of the following values: "Non-Deliverable", "Deliverable"
-                - Settlement Currency, an ISO 4217 currency code
-                - Value Date, a date, which can be in different formats
-                - Maturity Date, a date, which can be in different formats
-                - Payment Date, a date, which can be in different formats
-                - Duration, an integer number, indicating the number of days between the value date and the maturity date
-                - Forward Price, a number usually with decimal places
-                - Fixing Reference, usually one of the following values: "USD Obs", "CLP Obs"
-                - Counterparty Payment Method, look in fields labelled "Forma de Pago". Usually one of the following values: "Trans Alto Valor", "ComBanc", "SWIFT", "Cuenta Corriente".
-                - Bank Payment Method, look in fields labelled "Forma de Pago". Usually one of the following values: "Trans Alto Valor", "ComBanc", "SWIFT", "Cuenta Corriente"
-
-                Return this in a JSON format, but do not include any markdown formatting such as ```json or ```. This causes errors so I really need you to return it without any markdown formatting.
-                DO NOT return any other text than the JSON, as this causes errors.
-
-                The required structured of the JSON file is as follows:
-
-                {{
-                    "Email": {{
-                        "Email_subject": string,
-                        "Email_sender": string,
-                        "Email_date": date (dd-mm-yyyy),
-                        "Email_time": time (hh:mm:ss),
-                        "Confirmation": string (Yes if it has at least one confirmation of a trade (regardless of whether the counterparty agrees or disagrees), or No if there are no references to confirmations of trades)
-                        "Num_trades": integer (the number of trades referred to in the email),
-                    }},
-                    "Trades": [
-                        {{
-                            "Confirmation_OK": string (Yes or No),
-                            "TradeNumber": string,
-                            "CounterpartyID": string,
-                            "CounterpartyName": string,
-                            "ProductType": string,
-                            "Currency1": string (ISO 4217 currency code),
-                            "QuantityCurrency1": number to a minimum of two decimal places,
-                            "Currency2": string (ISO 4217 currency code),
-                            "QuantityCurrency2": number to a minimum of two decimal places,
-                            "Buyer": string,
-                            "Seller": string,
-                            "SettlementType": string, ("Non-Deliverable" or "Deliverable"),
-                            "SettlementCurrency": string (ISO 4217 currency code),
-                            "ValueDate": date in format dd-mm-yyyy,
-                            "MaturityDate": date in format dd-mm-yyyy,
-                            "PaymentDate": date in format dd-mm-yyyy,
-                            "Duration": integer,
-                            "ForwardPrice": number to a minimum of two decimal places,
-                            "FixingReference": string,
-                            "CounterpartyPaymentMethod": string,
-                            "BankPaymentMethod": string
-                        }}
-                        // Repeat as many times as there are trades in the email
-                    ]
-                }}
-
-                Now STOP for a minute, before you return the JSON. I need you to compare the data you have extracted into the Trades array in the JSON with the data in the email. If there is any difference on a specific field, overwrite the data in the JSON with the data you think is correct in the email.
-                Remember that QuantityCurrency2 is the amount of currency 1 multiplied by the forward price, so if any of these values have changed, you need to update QuantityCurrency2.
-
-                I repeat, the email body is the best source of truth.
-
-                DO NOT return any other text than the JSON, as this causes errors. NO MARKDOWN.
-            """
+    
+    async def _generate(self, ai_provider: str, stage: str, system_message: str, prompt: str, max_tokens: int,
+                        validate: Optional[Callable[[str], str]] = None) -> str:
+        """Send one prompt to the stage's model, with caching and per-stage cost/latency reporting
+
+        validate, if given, turns the raw response into the returned content
+        (raising on invalid output) before it is cached, so the cache only
+        ever holds valid responses.
+        """
+        # Get the appropriate LLM service for the provider
+        llm_service = self._get_llm_instance(ai_provider)
+        model = self._get_stage_model(ai_provider, stage)
+
+        # Identical requests are answered from the response cache
+        cache_key = None
+        if self.response_cache.is_enabled_for(ai_provider):
+            cache_key = LLMResponseCache.make_key(ai_provider, model, system_message, prompt)
+            cached_response = await self._get_cached_response(cache_key)
 
-        try:
-            # Get the appropriate LLM service for the provider
-            llm_service = self._get_llm_instance(ai_provider)
-            
-            # Select the right model based on the provider
-            model = self._get_default_model(ai_provider)
-            
             logger.info(
-                f"Sending request to {ai_provider} API",
+                f"LLM response cache {'hit' if cached_response is not None else 'miss'}",
                 event_type=EventType.INTEGRATION,
                 entity=self.my_entity,
                 user_id="system",
-                data={"model": model},
-                tags=["llm", ai_provider.lower(), "request"]
+                data={"provider": ai_provider, "model": model, "stage": stage, **self.response_cache.stats()},
+                tags=["llm", "cache", ai_provider.lower(), stage]
             )
-            
-            # Calculate execution time
-            start_time = datetime.utcnow()
-            request_id = f"req-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}"
-            system_message = "You are an expert in the field of OTC derivatives and FX. You have many years of experience in trade confirmations so you are able to extract the relevantdata from the email and return it in a structured format."
-            
-            # Create the request object
-            request = LLMRequest(
-                prompt=prompt,
-                system_message=system_message,
-                model=model,
-                max_tokens=1000,
-                temperature=0
-            )
-            
-            # Send the request to the LLM service
-            response = await llm_service.generate(request)
-            
-            # Calculate execution time
-            end_time = datetime.utcnow()
-            execution_time_ms = int((end_time - start_time).total_seconds() * 1000)
-            
-            # Log metrics based on provider
-            ai_provider_enum = self._get_provider_enum(ai_provider)
-            
-            # Calculate cost
-            cost_data = self.cost_calculator.calculate_cost(
-                provider=ai_provider_enum,
-                model_name=model,
-                input_tokens=response.metadata.get("input_tokens", response.tokens_used // 2),
-                output_tokens=response.metadata.get("output_tokens", response.tokens_used // 2),
-                log_cost=True,
-                user_id="system",
+
+            if cached_response is not None:
+                return cached_response
+
+        logger.info(
+            f"Sending {stage} request to {ai_provider} API",
+            event_type=EventType.INTEGRATION,
+            entity=self.my_entity,
+            user_id="system",
+            data={"model": model, "stage": stage},
+            tags=["llm", ai_provider.lower(), "request", stage]
+        )
+
+        request_id = f"req-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}"
+
+        # llm_services' LLMRequest has no JSON-mode option; the extraction's JSON is
+        # enforced by the prompt and checked by validate (normalize_llm_response)
+        request = LLMRequest(
+            prompt=prompt,
+            system_message=system_message,
+            model=model,
+            max_tokens=max_tokens,
+            temperature=0
+        )
+
+        # Send the request to the LLM service within the provider's rate limits
+        estimated_tokens = estimate_tokens(system_message) + estimate_tokens(prompt) + max_tokens
+        response, execution_time_ms = await self._send_request(
+            llm_service, request, ai_provider, model, stage, estimated_tokens
+        )
+
+        # Hedge delays come from the extraction call's own latency (no cache hits,
+        # classification or rate-limiter queueing)
+        if stage == "extraction":
+            self._get_latency_histogram(ai_provider, model).record(execution_time_ms / 1000)
+
+        # Calculate cost
+        self.cost_calculator.calculate_cost(
+            provider=self._get_provider_enum(ai_provider),
+            model_name=model,
+            input_tokens=response.metadata.get("input_tokens", response.tokens_used // 2),
+            output_tokens=response.metadata.get("output_tokens", response.tokens_used // 2),
+            log_cost=True,
+            user_id="system",
+            entity=self.my_entity,
+            context={
+                "request_id": request_id,
+                "duration_ms": str(execution_time_ms),
+                "text_length": str(len(prompt)),
+                "ai_provider": ai_provider,
+                "model": model,
+                "stage": stage
+            },
+            tags=["ai-cost", ai_provider.lower(), self._get_model_tag(model), stage]
+        )
+
+        logger.info(
+            f"Received {stage} response from {ai_provider} API",
+            event_type=EventType.INTEGRATION,
+            entity=self.my_entity,
+            user_id="system",
+            data={"response_length": len(response.content), "model": model, "stage": stage,
+                  "duration_ms": execution_time_ms},
+            tags=["llm", ai_provider.lower(), "response", stage]
+        )
+
+        content = validate(response.content) if validate else response.content
+
+        if cache_key:
+            await self._store_cached_response(cache_key, ai_provider, model, content)
+
+        return content
+
+    async def _send_request(self, llm_service, request: LLMRequest, ai_provider: str, model: str,
+                            stage: str, estimated_tokens: int):
+        """Send a request once the rate limiter allows it, retrying 429s after their retry-after
+
+        Returns the response and the duration of the successful call in ms.
+        """
+        rate_limiter = self._get_rate_limiter(ai_provider, model)
+        timeout = Config.LLM_PROVIDER_TIMEOUTS.get(ai_provider, Config.LLM_PROVIDER_TIMEOUT_SECONDS)
+        retries = 0
+        while True:
+            waited = await rate_limiter.acquire(estimated_tokens)
+            if waited >= 1:
+                logger.info(
+                    f"{stage.capitalize()} request to {ai_provider} queued for {waited:.1f}s by the rate limiter",
+                    event_type=EventType.INTEGRATION,
+                    entity=self.my_entity,
+                    user_id="system",
+                    data={"provider": ai_provider, "model": model, "stage": stage,
+                          "wait_seconds": round(waited, 3), "estimated_tokens": estimated_tokens,
+                          **rate_limiter.snapshot()},
+                    tags=["llm", "rate_limit", "queued", ai_provider.lower()]
+                )
+
+            start = time.monotonic()
+            try:
+                response = await asyncio.wait_for(llm_service.generate(request), timeout=timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"{ai_provider} did not respond within {timeout}s")
+            except Exception as e:
+                retry_after = self._get_retry_after(e)
+                if retry_after is None or retries >= Config.LLM_RATE_LIMIT_MAX_RETRIES:
+                    raise
+                retries += 1
+                rate_limiter.pause(retry_after)
+                logger.warning(
+                    f"{ai_provider} rate limited the {stage} request, retrying in {retry_after}s",
+                    event_type=EventType.INTEGRATION,
+                    entity=self.my_entity,
+                    user_id="system",
+                    data={"provider": ai_provider, "model": model, "stage": stage,
+                          "retry_after_seconds": retry_after, "retry": retries},
+                    tags=["llm", "rate_limit", "429", ai_provider.lower()]
+                )
+                continue
+
+            rate_limiter.record_usage(estimated_tokens, getattr(response, "tokens_used", 0) or 0)
+            return response, int((time.monotonic() - start) * 1000)
+
+    @staticmethod
+    def _get_retry_after(error) -> Optional[float]:
+        """Seconds to back off if error is a rate-limit (429) response from the provider, else None
+
+        Only the HTTP status or the SDK's RateLimitError type count: error
+        messages merely mentioning "429" or "rate limit" are not retried.
+        """
+        response = getattr(error, "response", None)
+        status = getattr(error, "status_code", None) or getattr(response, "status_code", None) or getattr(error, "status", None)
+        if status != 429 and type(error).__name__ != "RateLimitError":
+            return None
+
+        headers = getattr(response, "headers", None) or getattr(error, "headers", None) or {}
+        for header, scale in (("retry-after-ms", 0.001), ("retry-after", 1)):
+            try:
+                value = headers.get(header)
+                if value is not None:
+                    return max(0.0, float(value) * scale)
+            except (TypeError, ValueError, AttributeError):
+                continue
+        return Config.LLM_RATE_LIMIT_DEFAULT_RETRY_SECONDS
+
+    async def _classify_email(self, email_data: Dict, ai_provider: str) -> bool:
+        """Ask the classification model whether the email is a trade confirmation
+
+        An unclear answer counts as a confirmation, so the email still gets
+        the full extraction. Provider and transport errors (timeouts,
+        connection errors, API errors) are raised, so failover and the
+        circuit breaker react to them.
+        """
+        prompt = f"""Is this email about the confirmation of one or more trades (whether the sender agrees with the trade data or not)? Answer Yes or No.
+
+        Subject: {email_data.get('subject')}
+        From: {email_data.get('sender_email')}
+
+        Body:
+        {self._get_llm_body(email_data)[:CLASSIFICATION_BODY_CHARS]}
+
+        Attachments:
+        {(email_data.get('attachments_text') or 'No attachments')[:CLASSIFICATION_ATTACHMENT_CHARS]}
+        """
+
+        answer = await self._generate(ai_provider, "classification", CLASSIFICATION_SYSTEM_MESSAGE, prompt, max_tokens=5)
+
+        normalized = answer.strip().strip('."\'').lower()
+        is_confirmation = not normalized.startswith("no")
+        if not normalized.startswith(("yes", "no")):
+            logger.warning(
+                f"Unclear classification answer from {ai_provider}, falling back to full extraction",
+                event_type=EventType.INTEGRATION,
                 entity=self.my_entity,
-                context={
-                    "request_id": request_id,
-                    "duration_ms": str(execution_time_ms),
-                    "text_length": str(len(prompt)),
-                    "ai_provider": ai_provider,
-                    "model": model
-                },
-                tags=["ai-cost", ai_provider.lower(), self._get_model_tag(model), "extraction"]
+                user_id="system",
+                data={"provider": ai_provider, "subject": email_data.get('subject'), "answer": answer.strip()[:20]},
+                tags=["llm", "classification", "unclear", ai_provider.lower()]
             )
-            
-            logger.info(
-                f"Received response from {ai_provider} API",
-                event_type=EventType.INTEGRATION,
+            return True
+
+        logger.info(
+            f"Email classified as {'confirmation' if is_confirmation else 'not a confirmation'}",
+            event_type=EventType.INTEGRATION,
+            entity=self.my_entity,
+            user_id="system",
+            data={"provider": ai_provider, "subject": email_data.get('subject'), "answer": answer.strip()[:20]},
+            tags=["llm", "classification", "confirmation" if is_confirmation else "not_confirmation"]
+        )
+        return is_confirmation
+
+    def _not_confirmation_response(self, email_data: Dict) -> str:
+        """Extraction-shaped response for emails the classifier rejected"""
+        return json.dumps({
+            "Email": {
+                "Email_subject": email_data.get('subject'),
+                "Email_sender": email_data.get('sender_email'),
+                "Email_date": email_data.get('received_date'),
+                "Email_time": email_data.get('received_time'),
+                "Confirmation": "No",
+                "Num_trades": 0
+            },
+            "Trades": []
+        }, ensure_ascii=False)
+
+    async def _get_cached_response(self, cache_key: str) -> Optional[str]:
+        """Look up a cached response off the event loop, treating cache failures as misses"""
+        try:
+            return await asyncio.to_thread(self.response_cache.get, cache_key)
+        except Exception as e:
+            logger.warning(
+                f"LLM response cache lookup failed: {str(e)}",
+                event_type=EventType.SYSTEM_EVENT,
                 entity=self.my_entity,
                 user_id="system",
-                data={"response_length": len(response.content)},
-                tags=["llm", ai_provider.lower(), "response"]
+                tags=["llm", "cache", "error"]
             )
-            
-            return response.content
+            return None
 
+    async def _store_cached_response(self, cache_key: str, provider: str, model: str, content: str):
+        """Store a response in the cache off the event loop, without letting cache errors fail the request"""
+        try:
+            await asyncio.to_thread(self.response_cache.set, cache_key, provider, model, content)
         except Exception as e:
-            logger.log_exception(
-                e,
-                message=f"Error processing with {ai_provider} API",
+            logger.warning(
+                f"LLM response cache write failed: {str(e)}",
+                event_type=EventType.SYSTEM_EVENT,
                 entity=self.my_entity,
                 user_id="system",
-                data={
-                    "provider": ai_provider, 
-                    "subject": email_data.get('subject'),
-                    "error": str(e)
-                },
-                level=LogLevel.ERROR,
-                tags=["llm", "error", ai_provider.lower()]
+                tags=["llm", "cache", "error"]
             )
-            raise Exception(f"Error processing with {ai_provider} API: {str(e)}")
-    
+
+    def _get_email_processor(self):
+        """Get the shared email processor, creating it once if none was injected"""
+        if self.email_processor_service is None:
+            from .email_processor_service import EmailProcessorService
+            self.email_processor_service = EmailProcessorService(graph_client=self.graph_client)
+        return self.email_processor_service
+
+    def _get_stage_model(self, provider: str, stage: str) -> str:
+        """Get the model configured for a pipeline stage ("classification" or "extraction")"""
+        if stage == "classification" and provider in Config.LLM_CLASSIFICATION_MODELS:
+            return Config.LLM_CLASSIFICATION_MODELS[provider]
+        if stage == "extraction" and provider in Config.LLM_EXTRACTION_MODELS:
+            return Config.LLM_EXTRACTION_MODELS[provider]
+        return self._get_default_model(provider)
+
     def _get_default_model(self, provider: str) -> str:
         """Get the default model name for a provider"""
         if provider == "OpenAI":
@@ -324,20 +810,26 @@ class LLMService:
     
     def _get_model_tag(self, model: str) -> str:
         """Get a simplified tag for the model"""
-        if "gpt-4" in model:
+        if "gpt-4o-mini" in model:
+            return "gpt4omini"
+        elif "gpt-4" in model:
             return "gpt4"
+        elif "claude-3-5-haiku" in model:
+            return "claude35haiku"
         elif "claude-3-5" in model:
             return "claude35"
+        elif "gemini" in model and "flash" in model:
+            return "gemini20flash"
         elif "gemini" in model:
             return "gemini20"
         else:
             return "other"
 
-    async def process_email(self, email_content, email_obj, ai_provider="Google"):
+    async def process_email(self, email_content, email_obj, ai_provider=None):
         """Process an email and determine if it's a confirmation"""
         try:
             logger.info(
-                f"Processing email with {ai_provider}",
+                f"Processing email with {ai_provider or 'the provider chain'}",
                 event_type=EventType.INTEGRATION,
                 entity=self.my_entity,
                 user_id="system",
@@ -349,7 +841,7 @@ class LLMService:
             )
             
             # Process with the specified AI provider
-            llm_response = self.process_email_data(email_content, ai_provider=ai_provider)
+            llm_response = await self.process_email_data(email_content, ai_provider=ai_provider)
             
             logger.info(
                 "LLM response received, processing with email processor",
@@ -360,10 +852,8 @@ class LLMService:
                 tags=["llm", "response", "processing"]
             )
 
-            # Process the result using EmailProcessor
-            from .email_processor_service import EmailProcessorService
-            email_processor = EmailProcessorService(graph_client=self.graph_client)
-            result = await email_processor.process_email_result(email_obj, llm_response)
+            # Process the result using the shared EmailProcessor
+            result = await self._get_email_processor().process_email_result(email_obj, llm_response)
             
             logger.info(
                 "Email processing completed",
@@ -0,0 +1,155 @@
+# backend/app/services/notification_service.py
+import asyncio
+import hmac
+import os
+from datetime import datetime, timedelta, UTC
+from typing import Dict, List
+from ..config import Config
+from ..core.logger import logger
+from core_logging.client import EventType, LogLevel
+from .outlook_monitor_service import MESSAGE_SELECT_FIELDS
+
+class NotificationIngestService:
+    """Feeds Graph change notifications into the ConfirmationService pipeline
+
+    The Flask webhook runs on request threads while the pipeline runs on the
+    monitor's event loop, so message IDs are handed over with
+    ``submit()`` (thread-safe) and consumed by ``run()`` on the loop.
+    Messages are marked read when they are picked up, like the polling
+    monitor does, so reconciliation and restarts don't process them again.
+    """
+
+    def __init__(self, graph_client=None, user_email=None, email_processor_service=None):
+        self.graph_client = graph_client
+        self.user_email = user_email or Config.USER_EMAIL
+        self.email_processor = email_processor_service
+        self.my_entity = os.environ.get('MY_ENTITY')
+        self.client_state = Config.GRAPH_NOTIFICATION_CLIENT_STATE
+
+        self._loop = None
+        self._queue = None
+        self.subscription_id = None
+
+    def attach(self, loop: asyncio.AbstractEventLoop):
+        """Bind the service to the event loop that runs the pipeline"""
+        self._loop = loop
+        self._queue = asyncio.Queue()
+
+    def validate_notification(self, notification: Dict) -> bool:
+        """Check that a notification comes from our subscription"""
+        client_state = notification.get("clientState") or ""
+        if not self.client_state or not hmac.compare_digest(client_state, self.client_state):
+            return False
+        return bool((notification.get("resourceData") or {}).get("id"))
+
+    def submit(self, message_ids: List[str]) -> int:
+        """Queue message IDs for processing; safe to call from any thread"""
+        if self._loop is None or self._loop.is_closed():
+            return 0
+        if message_ids:
+            self._loop.call_soon_threadsafe(self._enqueue, list(message_ids))
+        return len(message_ids)
+
+    def _enqueue(self, message_ids):
+        for message_id in message_ids:
+            self._queue.put_nowait(message_id)
+
+    async def run(self, confirmation_service):
+        """Fetch notified messages and pass them to the confirmation pipeline"""
+        while True:
+            message_ids = [await self._queue.get()]
+            # Take everything that is already queued so it is processed concurrently
+            while not self._queue.empty():
+                message_ids.append(self._queue.get_nowait())
+
+            messages = []
+            for message_id in dict.fromkeys(message_ids):
+                message = await self._fetch_message(message_id)
+                if message is not None and not message.is_read:
+                    messages.append(message)
+
+            messages = await self._claim_messages(messages)
+            if messages:
+                logger.info(
+                    f"Processing {len(messages)} emails from change notifications",
+                    event_type=EventType.SYSTEM_EVENT,
+                    entity=self.my_entity,
+                    user_id="system",
+                    data={"count": len(messages)},
+                    tags=["monitoring", "notifications", "new_emails"]
+                )
+                await confirmation_service.handle_new_unread_email(messages)
+
+    async def _claim_messages(self, messages):
+        """Mark messages read; the ones that can't be marked are left to reconciliation polling"""
+        if not messages or self.email_processor is None:
+            return messages
+        marked = await asyncio.gather(*(self.email_processor.mark_email_read(message) for message in messages))
+        return [message for message, ok in zip(messages, marked) if ok]
+
+    async def _fetch_message(self, message_id):
+        try:
+            from msgraph.generated.users.item.messages.item.message_item_request_builder import MessageItemRequestBuilder
+
+            return await self.graph_client.users.by_user_id(self.user_email).messages.by_message_id(message_id).get(
+                request_configuration=MessageItemRequestBuilder.MessageItemRequestBuilderGetRequestConfiguration(
+                    query_parameters=MessageItemRequestBuilder.MessageItemRequestBuilderGetQueryParameters(select=MESSAGE_SELECT_FIELDS)
+                )
+            )
+        except Exception as e:
+            logger.log_exception(
+                e,
+                message="Error fetching notified email",
+                entity=self.my_entity,
+                user_id="system",
+                data={"email_id": message_id},
+                tags=["monitoring", "notifications", "error"]
+            )
+            return None
+
+    async def maintain_subscription(self, folder_id: str):
+        """Create the Graph subscription for the folder and keep renewing it"""
+        from msgraph.generated.models.subscription import Subscription
+
+        lifetime = timedelta(minutes=Config.GRAPH_SUBSCRIPTION_MINUTES)
+        while True:
+            try:
+                expiration = datetime.now(UTC) + lifetime
+                if self.subscription_id:
+                    await self.graph_client.subscriptions.by_subscription_id(self.subscription_id).patch(
+                        Subscription(expiration_date_time=expiration)
+                    )
+                else:
+                    subscription = await self.graph_client.subscriptions.post(Subscription(
+                        change_type="created",
+                        notification_url=Config.GRAPH_NOTIFICATION_URL,
+                        resource=f"users/{self.user_email}/mailFolders/{folder_id}/messages",
+                        expiration_date_time=expiration,
+                        client_state=self.client_state
+                    ))
+                    self.subscription_id = subscription.id
+
+                logger.info(
+                    "Graph change notification subscription active",
+                    event_type=EventType.INTEGRATION,
+                    entity=self.my_entity,
+                    user_id="system",
+                    data={"subscription_id": self.subscription_id, "expires": expiration.isoformat()},
+                    tags=["monitoring", "notifications", "subscription"]
+                )
+                # Renew well before it expires
+                await asyncio.sleep(lifetime.total_seconds() * 0.8)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.log_exception(
+                    e,
+                    message="Error maintaining Graph subscription",
+                    entity=self.my_entity,
+                    user_id="system",
+                    data={"subscription_id": self.subscription_id},
+                    tags=["monitoring", "notifications", "error"]
+                )
+                # The subscription may have been deleted; recreate it on the next attempt
+                self.subscription_id = None
+                await asyncio.sleep(60)
@@ -1,13 +1,34 @@
 # backend/app/services/outlook_monitor_service.py
+import asyncio
+import hashlib
 import os
+from ..config import Config
 from ..core.logger import logger
+from ..core.file_store import file_store
+from ..core.folder_cache import folder_cache
 from core_logging.client import EventType, LogLevel
 from email_monitoring import OutlookMonitor, EmailProcessor
 
+# The only message fields the confirmation pipeline reads; attachments are
+# fetched separately and only when needed (see ConfirmationService)
+MESSAGE_SELECT_FIELDS = ["id", "subject", "sender", "receivedDateTime", "body", "isRead", "hasAttachments",
+                         "internetMessageHeaders"]
+
+# Messages marked read concurrently when delta mode claims new messages
+MARK_READ_CONCURRENCY = 20
+
 class OutlookMonitorService:
     def __init__(self, user_email, graph_client):
         self.user_email = user_email
+        self.graph_client = graph_client
         self.my_entity = os.environ.get('MY_ENTITY')
+
+        # Handlers are also kept here for the delta-query mode, which
+        # dispatches events itself instead of going through the core monitor
+        self.event_handlers = {}
+
+        # Unread messages from earlier delta rounds that couldn't be marked read yet
+        self._unclaimed = {}
         
         # Use the core monitoring package
         self.monitor = OutlookMonitor(
@@ -32,6 +53,7 @@ class OutlookMonitorService:
     def register_event_handler(self, event_name, handler):
         """Register an event handler"""
         self.monitor.register_event_handler(event_name, handler)
+        self.event_handlers.setdefault(event_name, []).append(handler)
         logger.info(
             f"Registered event handler for '{event_name}'",
             event_type=EventType.SYSTEM_EVENT,
@@ -45,6 +67,152 @@ class OutlookMonitorService:
         # The core package handles all the monitoring logic
         await self.monitor.monitor_folder(folder_name, check_interval)
 
+    async def monitor_folder_delta(self, folder_path="Inbox", min_interval=None, max_interval=None):
+        """Monitor a folder with Graph delta queries instead of full re-queries
+
+        Each cycle fetches only messages that are new or changed since the
+        previous delta link, which is persisted so a restart resumes where it
+        stopped. New unread messages are marked read before they are
+        dispatched, like the polling monitor does, so a restart, a lost state
+        file or a 410 resync never hands them to the pipeline again. The
+        interval doubles (up to max_interval) while the folder is idle and
+        drops back to min_interval as soon as something arrives.
+        """
+        min_interval = min_interval or Config.DELTA_MIN_INTERVAL_SECONDS
+        max_interval = max_interval or Config.DELTA_MAX_INTERVAL_SECONDS
+
+        folder_id = await self.get_folder_id(folder_path)
+        if not folder_id:
+            raise ValueError(f"Could not find folder: {folder_path}")
+
+        state_path = self._delta_state_path(folder_path)
+        delta_link = file_store.read(state_path, default={}).get("delta_link")
+
+        logger.info(
+            f"Starting delta monitoring of {folder_path}",
+            event_type=EventType.SYSTEM_EVENT,
+            entity=self.my_entity,
+            user_id="system",
+            data={"folder": folder_path, "resumed": bool(delta_link),
+                  "min_interval": min_interval, "max_interval": max_interval},
+            tags=["monitoring", "delta", "startup"]
+        )
+
+        interval = min_interval
+        while True:
+            try:
+                delta_link, new_count = await self.run_delta_cycle(folder_id, delta_link, state_path)
+                interval = min_interval if new_count else min(interval * 2, max_interval)
+            except Exception as e:
+                if getattr(e, 'response_status_code', None) == 410:
+                    # The delta token expired; start a fresh sync
+                    delta_link = None
+                logger.log_exception(
+                    e,
+                    message="Error during delta query",
+                    entity=self.my_entity,
+                    user_id="system",
+                    data={"folder": folder_path},
+                    tags=["monitoring", "delta", "error"]
+                )
+                interval = min(interval * 2, max_interval)
+
+            await asyncio.sleep(interval)
+
+    async def run_delta_cycle(self, folder_id, delta_link, state_path):
+        """Fetch one round of changes and dispatch the new unread messages
+
+        Returns the new delta link and the number of messages dispatched.
+        """
+        messages, delta_link = await self._fetch_delta(folder_id, delta_link)
+        new_messages = await self._claim_new_unread(messages)
+        file_store.write(state_path, {"delta_link": delta_link})
+
+        if new_messages:
+            await self._dispatch_new_messages(new_messages)
+        return delta_link, len(new_messages)
+
+    async def _fetch_delta(self, folder_id, delta_link):
+        """Follow the delta pages and return (messages, new delta link)"""
+        from msgraph.generated.users.item.mail_folders.item.messages.delta.delta_request_builder import DeltaRequestBuilder
+
+        builder = self.graph_client.users.by_user_id(self.user_email).mail_folders.by_mail_folder_id(folder_id).messages.delta
+        if delta_link:
+            # Delta and next links already carry the $select of the initial query
+            response = await builder.with_url(delta_link).get()
+        else:
+            response = await builder.get(request_configuration=DeltaRequestBuilder.DeltaRequestBuilderGetRequestConfiguration(
+                query_parameters=DeltaRequestBuilder.DeltaRequestBuilderGetQueryParameters(select=MESSAGE_SELECT_FIELDS)
+            ))
+
+        messages = list(response.value or [])
+        while response.odata_next_link:
+            response = await builder.with_url(response.odata_next_link).get()
+            messages.extend(response.value or [])
+
+        return messages, response.odata_delta_link or delta_link
+
+    async def _claim_new_unread(self, messages):
+        """Mark the new unread messages read and return them
+
+        The read flag records which messages were taken into processing (the
+        pipeline marks an email unread again when processing it fails), so
+        later delta rounds only see them again if they need another attempt.
+        Messages that can't be marked read are kept and retried next round.
+        """
+        candidates, self._unclaimed = self._unclaimed, {}
+        for message in messages:
+            if '@removed' in (getattr(message, 'additional_data', None) or {}) or message.is_read:
+                candidates.pop(message.id, None)
+            else:
+                candidates[message.id] = message
+
+        claimed = []
+        pending = list(candidates.values())
+        for start in range(0, len(pending), MARK_READ_CONCURRENCY):
+            chunk = pending[start:start + MARK_READ_CONCURRENCY]
+            results = await asyncio.gather(*(self.mark_as_read(message.id) for message in chunk),
+                                           return_exceptions=True)
+            for message, result in zip(chunk, results):
+                if isinstance(result, Exception):
+                    self._unclaimed[message.id] = message
+                else:
+                    claimed.append(message)
+
+        if self._unclaimed:
+            logger.warning(
+                f"Could not mark {len(self._unclaimed)} new emails as read, retrying next round",
+                event_type=EventType.INTEGRATION,
+                entity=self.my_entity,
+                user_id="system",
+                data={"count": len(self._unclaimed)},
+                tags=["monitoring", "delta", "mark_read", "error"]
+            )
+        return claimed
+
+    async def _dispatch_new_messages(self, messages):
+        logger.info(
+            f"Delta query returned {len(messages)} new unread emails",
+            event_type=EventType.SYSTEM_EVENT,
+            entity=self.my_entity,
+            user_id="system",
+            data={"count": len(messages)},
+            tags=["monitoring", "delta", "new_emails"]
+        )
+
+        for handler in self.event_handlers.get("new_unread_email", []):
+            result = handler(messages)
+            if asyncio.iscoroutine(result):
+                await result
+
+    def _delta_state_path(self, folder_path):
+        key = hashlib.sha256(f"{self.user_email}:{folder_path}".encode('utf-8')).hexdigest()[:16]
+        return os.path.join(Config.CACHE_PATH, f"graph_delta_{key}.json")
+
+    async def get_folder_id(self, folder_path):
+        """Resolve a folder path to its ID through the process-wide cache"""
+        return await folder_cache.get(self.user_email, folder_path, self.monitor.get_folder_id)
+
     async def process_message(self, message):
         """Process a message - this is called by the monitor"""
         # The monitor's process_message method will call our custom one via event handler
@@ -0,0 +1,173 @@
+# backend/app/services/prefilter_service.py
+import os
+import re
+from ..config import Config
+from ..core.logger import logger
+from core_logging.client import EventType, LogLevel
+
+# Decision actions
+SEND_TO_LLM = "llm"
+NOT_RELEVANT = "not_relevant"
+
+# Subjects of out-of-office and delivery notices (Spanish and English)
+AUTO_REPLY_SUBJECT = re.compile(
+    r"^\s*(automatic reply|auto(matic)?[- ]?reply|respuesta autom[aá]tica|out of (the )?office|"
+    r"fuera de (la )?oficina|ausente|undeliverable|no se puede entregar|delivery status notification)",
+    re.IGNORECASE
+)
+
+# Headers only auto-responders set; these skip the LLM
+AUTO_REPLY_HEADERS = {"x-autoreply", "x-autorespond"}
+# Headers of machine-generated and bulk mail in general. Trade platforms send
+# confirmations with them too, so they only lower the score
+AUTOMATED_HEADERS = {"x-auto-response-suppress", "list-unsubscribe", "list-id"}
+BULK_PRECEDENCE = {"bulk", "junk", "list"}
+AUTOMATED_MAIL_WEIGHT = -1
+
+# Keyword weights over subject + body: positive points to a trade confirmation
+KEYWORD_WEIGHTS = [
+    (re.compile(r"\bconfirm\w*", re.IGNORECASE), 2),
+    (re.compile(r"\boperaci[oó]n(es)?\b|\btrade\b|\bdeal\b", re.IGNORECASE), 1),
+    (re.compile(r"seguro de (cambio|inflaci[oó]n)|\bforward\b|\bspot\b|\barbitraje\b", re.IGNORECASE), 1),
+    (re.compile(r"fecha de (vencimiento|valuta|pago)|value date|maturity|precio forward|forma de pago", re.IGNORECASE), 1),
+    (re.compile(r"\b(CLP|USD|EUR|UF)\b"), 1),
+    (re.compile(r"newsletter|bolet[ií]n|webinar|unsubscribe|desuscrib\w*|darse de baja", re.IGNORECASE), -2),
+    (re.compile(r"promoci[oó]n|descuento|oferta especial|invitaci[oó]n|evento|encuesta|survey", re.IGNORECASE), -2),
+]
+REGISTERED_SENDER_WEIGHT = 3
+ATTACHMENT_WEIGHT = 1
+
+
+class PrefilterDecision:
+    """Outcome of the pre-filter for one email"""
+
+    def __init__(self, action, score=0, reasons=None, trade_numbers=None):
+        self.action = action
+        self.score = score
+        self.reasons = reasons or []
+        self.trade_numbers = trade_numbers or []
+
+    @property
+    def send_to_llm(self) -> bool:
+        return self.action == SEND_TO_LLM
+
+    def to_dict(self):
+        return {
+            "action": self.action,
+            "score": self.score,
+            "reasons": self.reasons,
+            "trade_numbers": self.trade_numbers[:5]
+        }
+
+
+class PrefilterService:
+    """Deterministic checks that keep obvious non-confirmations away from the LLM
+
+    An email is only routed to "Not Relevant" without an LLM call when none
+    of its text matches TRADE_NUMBER_PATTERN (in the book or not) and it is
+    either an auto-reply or scores at or below PREFILTER_SKIP_SCORE.
+    Everything else goes to the LLM as before. Every decision is logged for
+    auditing.
+    """
+
+    def __init__(self, email_processor_service=None):
+        self.email_processor = email_processor_service
+        self._trade_number_pattern = re.compile(Config.TRADE_NUMBER_PATTERN)
+        self.enabled = Config.PREFILTER_ENABLED
+        self.skip_score = Config.PREFILTER_SKIP_SCORE
+        self.my_entity = os.environ.get('MY_ENTITY')
+
+    def evaluate(self, email, email_data) -> PrefilterDecision:
+        if not self.enabled:
+            return PrefilterDecision(SEND_TO_LLM, reasons=["prefilter disabled"])
+
+        decision = self._decide(email, email_data)
+        logger.info(
+            f"Pre-filter decision: {decision.action}",
+            event_type=EventType.SYSTEM_EVENT,
+            entity=self.my_entity,
+            user_id="system",
+            data={
+                "email_id": getattr(email, 'id', None),
+                "subject": email_data.get("subject"),
+                "sender_email": email_data.get("sender_email"),
+                **decision.to_dict()
+            },
+            tags=["email", "prefilter", decision.action]
+        )
+        return decision
+
+    def _decide(self, email, email_data) -> PrefilterDecision:
+        subject = email_data.get("subject") or ""
+        body = email_data.get("body_content") or ""
+        attachments_text = email_data.get("attachments_text") or ""
+
+        # Any trade number goes to the LLM: one missing from the book is still a
+        # confirmation, for the "Unrecognized" path
+        text = f"{subject}\n{body}\n{attachments_text}"
+        trade_numbers = list(dict.fromkeys(m.group(0) for m in self._trade_number_pattern.finditer(text)))
+        if trade_numbers:
+            known = self.email_processor.find_trade_numbers(text) if self.email_processor else trade_numbers
+            reason = "trade number in book" if known else "trade number not in book"
+            return PrefilterDecision(SEND_TO_LLM, reasons=[reason], trade_numbers=trade_numbers)
+
+        auto_reply_reasons = self._auto_reply_reasons(email, subject)
+        if auto_reply_reasons:
+            return PrefilterDecision(NOT_RELEVANT, reasons=auto_reply_reasons)
+
+        score, reasons = self._score(email, email_data, f"{subject}\n{body}")
+        if score <= self.skip_score:
+            return PrefilterDecision(NOT_RELEVANT, score, reasons + [f"score {score} <= {self.skip_score}"])
+        return PrefilterDecision(SEND_TO_LLM, score, reasons)
+
+    @staticmethod
+    def _headers(email):
+        for header in getattr(email, 'internet_message_headers', None) or []:
+            name = (getattr(header, 'name', '') or '').lower()
+            value = (getattr(header, 'value', '') or '').strip().lower()
+            yield name, value
+
+    def _auto_reply_reasons(self, email, subject):
+        reasons = []
+        if AUTO_REPLY_SUBJECT.search(subject):
+            reasons.append("auto-reply subject")
+
+        for name, value in self._headers(email):
+            if name == "auto-submitted" and value == "auto-replied":
+                reasons.append(f"Auto-Submitted: {value}")
+            elif name in AUTO_REPLY_HEADERS:
+                reasons.append(f"{name} header")
+            elif name == "precedence" and value == "auto_reply":
+                reasons.append(f"Precedence: {value}")
+        return reasons
+
+    def _automated_mail_reasons(self, email):
+        reasons = []
+        for name, value in self._headers(email):
+            if name == "auto-submitted" and value not in ("no", "auto-replied"):
+                reasons.append(f"Auto-Submitted: {value}")
+            elif name in AUTOMATED_HEADERS:
+                reasons.append(f"{name} header")
+            elif name == "precedence" and value in BULK_PRECEDENCE:
+                reasons.append(f"Precedence: {value}")
+        return reasons
+
+    def _score(self, email, email_data, text):
+        score = 0
+        reasons = []
+        if email_data.get("entity_name"):
+            score += REGISTERED_SENDER_WEIGHT
+            reasons.append("registered sender")
+        if getattr(email, 'has_attachments', False):
+            score += ATTACHMENT_WEIGHT
+            reasons.append("has attachments")
+        automated = self._automated_mail_reasons(email)
+        if automated:
+            score += AUTOMATED_MAIL_WEIGHT
+            reasons.append(f"{', '.join(automated)} ({AUTOMATED_MAIL_WEIGHT:+d})")
+        for pattern, weight in KEYWORD_WEIGHTS:
+            match = pattern.search(text)
+            if match:
+                score += weight
+                reasons.append(f"'{match.group(0)}' ({weight:+d})")
+        return score, reasons
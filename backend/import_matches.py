@@ -0,0 +1,19 @@
+# backend/import_matches.py
+"""Import matched_trades.json and email_matches.json into SQLite
+
+SqliteMatchRepository seeds its empty tables from the JSON files when it is
+first opened, so switching MATCH_STORAGE_BACKEND to "sqlite" is enough. Run
+this to do the import ahead of time and check the counts:
+
+    python import_matches.py
+"""
+from app.repositories.match_repository import COLLECTIONS, SqliteMatchRepository
+
+if __name__ == "__main__":
+    repository = SqliteMatchRepository()
+    try:
+        for collection in COLLECTIONS:
+            print(f"{len(repository.list_records(collection))} records from {collection}.json")
+        print(f"Database: {repository.db_path}")
+    finally:
+        repository.close()
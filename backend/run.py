@@ -9,12 +9,6 @@ monitor_thread = None
 # Use Flask's current approach for initialization
 @app.route('/start-monitoring', methods=['GET'])
 def start_monitoring_route():
-    parser = argparse.ArgumentParser(description='Start the confirmation management application.')
-    parser.add_argument('--entity', required=True, help='Entity name to use as "This Party"')
-    args = parser.parse_args()
-
-    os.environ['MY_ENTITY'] = args.entity
-
     global monitor_thread
     if not monitor_thread or not monitor_thread.is_alive():
         print("Starting email monitoring thread")
@@ -23,9 +17,18 @@ def start_monitoring_route():
         monitor_thread.start()
     return "Monitoring started"
 
-# Immediately start monitoring when app starts
-with app.app_context():
-    start_monitoring_route()
-
+# Startup stays under the main guard: the PDF extraction workers are spawned
+# processes that re-import this script as __mp_main__
 if __name__ == "__main__":
-    app.run(host='0.0.0.0', port=5005, debug=True)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Start the confirmation management application.')
+    parser.add_argument('--entity', required=True, help='Entity name to use as "This Party"')
+    args = parser.parse_args()
+
+    os.environ['MY_ENTITY'] = args.entity
+
+    # With debug=True the reloader runs the app in a child process; only that one monitors
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        with app.app_context():
+            start_monitoring_route()
+
+    app.run(host='0.0.0.0', port=5005, debug=True)
@@ -0,0 +1,59 @@
+# backend/simulate_notifications.py
+"""Post synthetic Graph change notifications to the local webhook
+
+Lets the notification path be exercised without a public URL or a real
+subscription. Start the app with GRAPH_NOTIFICATION_URL and
+GRAPH_NOTIFICATION_CLIENT_STATE set, then run e.g.:
+
+    python simulate_notifications.py --client-state secret MESSAGE_ID [MESSAGE_ID ...]
+
+The message IDs must exist in the monitored mailbox, since the pipeline
+fetches each message from Graph before processing it. To exercise the path
+without a mailbox, tests/test_notifications.py posts the same payloads to the
+app with an in-memory fake Graph client.
+"""
+import argparse
+import json
+import secrets
+import urllib.parse
+import urllib.request
+from datetime import datetime, timedelta, UTC
+from app.config import Config
+
+def post(url, payload=None):
+    data = json.dumps(payload).encode('utf-8') if payload is not None else b''
+    req = urllib.request.Request(url, data=data, method='POST', headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(req, timeout=10) as response:
+        return response.status, response.read().decode('utf-8')
+
+def build_notification(message_id, client_state, user_email):
+    return {
+        "subscriptionId": "simulated-subscription",
+        "subscriptionExpirationDateTime": (datetime.now(UTC) + timedelta(days=1)).isoformat(),
+        "changeType": "created",
+        "clientState": client_state,
+        "resource": f"Users/{user_email}/Messages/{message_id}",
+        "resourceData": {
+            "@odata.type": "#Microsoft.Graph.Message",
+            "@odata.id": f"Users/{user_email}/Messages/{message_id}",
+            "id": message_id
+        },
+        "tenantId": Config.GRAPH_TENANT_ID
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Post synthetic Graph change notifications.')
+    parser.add_argument('message_ids', nargs='+', help='IDs of messages to notify about')
+    parser.add_argument('--url', default='http://localhost:5005/graph-notifications')
+    parser.add_argument('--client-state', default=Config.GRAPH_NOTIFICATION_CLIENT_STATE)
+    parser.add_argument('--user-email', default=Config.USER_EMAIL)
+    args = parser.parse_args()
+
+    # Same handshake Graph performs when a subscription is created
+    token = secrets.token_urlsafe(16)
+    status, body = post(f"{args.url}?{urllib.parse.urlencode({'validationToken': token})}")
+    print(f"Validation: {status} {'OK' if body == token else 'token mismatch'}")
+
+    payload = {"value": [build_notification(m, args.client_state, args.user_email) for m in args.message_ids]}
+    status, body = post(args.url, payload)
+    print(f"Notification: {status} {body}")
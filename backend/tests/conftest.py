@@ -0,0 +1,190 @@
+"""Shared test set-up
+
+The app depends on internal packages (core_logging, email_monitoring,
+llm_services, core_ai_cost) that are not published on PyPI. Whichever of
+them is not installed is replaced in sys.modules by a minimal stand-in
+before any app module is imported. Storage and cache paths are pointed at
+a temporary directory so tests never write into the working tree.
+"""
+import enum
+import importlib.util
+import os
+import re
+import sys
+import tempfile
+import types
+
+import pytest
+
+_TMP_ROOT = tempfile.mkdtemp(prefix="confirmation-manager-tests-")
+os.environ.setdefault("STORAGE_PATH", os.path.join(_TMP_ROOT, "storage"))
+os.environ.setdefault("CACHE_PATH", os.path.join(_TMP_ROOT, "cache"))
+os.environ.setdefault("LOG_LEVEL", "INFO")
+
+
+def _is_installed(name: str) -> bool:
+    try:
+        return importlib.util.find_spec(name) is not None
+    except ModuleNotFoundError:
+        return False
+
+
+def _register(name: str, **attributes) -> types.ModuleType:
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    sys.modules[name] = module
+    parent, _, child = name.rpartition(".")
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
+
+
+def _stub_core_logging():
+    class EventType(enum.Enum):
+        SYSTEM_EVENT = "system_event"
+        INTEGRATION = "integration"
+        DATA_CHANGE = "data_change"
+
+    class LogLevel(enum.Enum):
+        DEBUG = "DEBUG"
+        INFO = "INFO"
+        WARNING = "WARNING"
+        ERROR = "ERROR"
+        CRITICAL = "CRITICAL"
+
+    class LogClient:
+        """Keeps events in memory instead of sending them to the log server"""
+
+        def __init__(self, app_name=None, api_url=None, default_source=None, **kwargs):
+            self.events = []
+
+        def _record(self, level, message, kwargs):
+            self.events.append((level, message, kwargs))
+
+        def debug(self, message, **kwargs):
+            self._record("DEBUG", message, kwargs)
+
+        def info(self, message, **kwargs):
+            self._record("INFO", message, kwargs)
+
+        def warning(self, message, **kwargs):
+            self._record("WARNING", message, kwargs)
+
+        def error(self, message, **kwargs):
+            self._record("ERROR", message, kwargs)
+
+        def critical(self, message, **kwargs):
+            self._record("CRITICAL", message, kwargs)
+
+        def log_exception(self, exception, message=None, **kwargs):
+            self._record("EXCEPTION", message, {"exception": exception, **kwargs})
+
+        def flush(self):
+            pass
+
+        def shutdown(self):
+            pass
+
+    _register("core_logging")
+    _register("core_logging.client", EventType=EventType, LogLevel=LogLevel, LogClient=LogClient)
+
+
+def _stub_email_monitoring():
+    class EmailProcessor:
+        def __init__(self, logger=None):
+            self.logger = logger
+
+    class OutlookMonitor:
+        """Resolves folders and marks messages read through the Graph client, like the core monitor"""
+
+        def __init__(self, user_email=None, graph_client=None, logger=None, entity=None, user_id=None):
+            self.user_email = user_email
+            self.graph_client = graph_client
+            self.event_handlers = {}
+
+        def register_event_handler(self, event_name, handler):
+            self.event_handlers[event_name] = handler
+
+        async def get_folder_id(self, folder_path):
+            resolve = getattr(self.graph_client, "resolve_folder", None)
+            return resolve(folder_path) if resolve else None
+
+        async def mark_as_read(self, message_id):
+            from msgraph.generated.models.message import Message
+            await self.graph_client.users.by_user_id(self.user_email).messages.by_message_id(message_id).patch(
+                body=Message(is_read=True)
+            )
+
+    def clean_html(html):
+        return re.sub(r"<[^>]+>", " ", html or "").strip()
+
+    def extract_dates(text):
+        return []
+
+    _register("email_monitoring", EmailProcessor=EmailProcessor, OutlookMonitor=OutlookMonitor)
+    _register("email_monitoring.utils", clean_html=clean_html, extract_dates=extract_dates)
+    _register("email_monitoring.core")
+    _register("email_monitoring.core.monitor", OutlookMonitor=OutlookMonitor)
+
+
+def _stub_llm_services():
+    class LLMRequest:
+        def __init__(self, prompt, system_message=None, model=None, max_tokens=None, temperature=None):
+            self.prompt = prompt
+            self.system_message = system_message
+            self.model = model
+            self.max_tokens = max_tokens
+            self.temperature = temperature
+
+    class LLMResponse:
+        def __init__(self, content, tokens_used=0, metadata=None):
+            self.content = content
+            self.tokens_used = tokens_used
+            self.metadata = metadata or {}
+
+    class LLMService:
+        @classmethod
+        def get_instance(cls, provider, api_key):
+            return cls()
+
+        async def generate(self, request):
+            raise NotImplementedError("Tests inject their own provider clients")
+
+    _register("llm_services", LLMRequest=LLMRequest, LLMResponse=LLMResponse, LLMService=LLMService)
+
+
+def _stub_core_ai_cost():
+    class AIProvider(enum.Enum):
+        OPENAI = "openai"
+        ANTHROPIC = "anthropic"
+        GOOGLE = "google"
+        OTHER = "other"
+
+    class AICostCalculator:
+        def __init__(self, app_name=None, log_client=None):
+            self.calls = []
+
+        def calculate_cost(self, **kwargs):
+            self.calls.append(kwargs)
+            return {"total_cost": 0.0}
+
+    _register("core_ai_cost", AIProvider=AIProvider, AICostCalculator=AICostCalculator)
+
+
+for _name, _stub in (("core_logging", _stub_core_logging), ("email_monitoring", _stub_email_monitoring),
+                     ("llm_services", _stub_llm_services), ("core_ai_cost", _stub_core_ai_cost)):
+    if not _is_installed(_name):
+        _stub()
+
+
+@pytest.fixture
+def assets_dir(tmp_path, monkeypatch):
+    """Point ASSETS_PATH (trade book and JSON snapshots) at an empty temporary folder"""
+    from app.config import Config
+
+    path = tmp_path / "assets"
+    path.mkdir()
+    monkeypatch.setattr(Config, "ASSETS_PATH", str(path))
+    monkeypatch.setattr(Config, "STORAGE_PATH", str(tmp_path / "storage"))
+    monkeypatch.setattr(Config, "CACHE_PATH", str(tmp_path / "cache"))
+    return path
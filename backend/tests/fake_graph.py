@@ -0,0 +1,165 @@
+"""In-memory stand-in for the parts of the msgraph client the app uses
+
+FakeGraphClient keeps a mailbox of msgraph Message objects grouped by folder
+and answers the same fluent request-builder chains the services call:
+delta queries with paging, delta links and 410 expiry, message get/patch/move
+and attachment listing. Every change bumps a global version, so a delta link
+returns exactly the messages changed after it was issued, like Graph does.
+"""
+from types import SimpleNamespace
+
+from msgraph.generated.models.message import Message
+
+
+class GraphError(Exception):
+    def __init__(self, status_code, message=""):
+        super().__init__(message or f"Graph error {status_code}")
+        self.response_status_code = status_code
+
+
+class FakeMailbox:
+    def __init__(self, page_size=2):
+        self.page_size = page_size
+        self.folders = {}
+        self.messages = {}
+        self.versions = {}
+        self.removed = {}
+        self.version = 0
+        self.expired_links = set()
+        self.patches = []
+        self.delta_calls = 0
+
+    def add_folder(self, path, folder_id=None):
+        folder_id = folder_id or f"folder-{len(self.folders) + 1}"
+        self.folders[path] = folder_id
+        return folder_id
+
+    def _bump(self, message_id):
+        self.version += 1
+        self.versions[message_id] = self.version
+
+    def add_message(self, folder_path, message_id, subject="Trade confirmation", is_read=False, **fields):
+        message = Message(id=message_id, subject=subject, is_read=is_read, **fields)
+        message.additional_data["parentFolderId"] = self.folders[folder_path]
+        self.messages[message_id] = message
+        self._bump(message_id)
+        return message
+
+    def folder_of(self, message_id):
+        return self.messages[message_id].additional_data["parentFolderId"]
+
+    def set_read(self, message_id, is_read):
+        self.messages[message_id].is_read = is_read
+        self._bump(message_id)
+
+    def move(self, message_id, folder_id):
+        self.removed[message_id] = (self.folder_of(message_id), self.version + 1)
+        self.messages[message_id].additional_data["parentFolderId"] = folder_id
+        self._bump(message_id)
+
+    def changes(self, folder_id, since):
+        changed = []
+        for message_id, version in sorted(self.versions.items(), key=lambda item: item[1]):
+            if version <= since:
+                continue
+            message = self.messages[message_id]
+            if message.additional_data["parentFolderId"] == folder_id:
+                changed.append(_copy(message))
+            elif self.removed.get(message_id, (None,))[0] == folder_id:
+                changed.append(Message(id=message_id, additional_data={"@removed": {"reason": "deleted"}}))
+        return changed
+
+
+def _copy(message):
+    copy = Message(id=message.id, subject=message.subject, is_read=message.is_read, body=message.body,
+                   sender=message.sender, received_date_time=message.received_date_time,
+                   has_attachments=message.has_attachments,
+                   internet_message_headers=message.internet_message_headers)
+    copy.additional_data = dict(message.additional_data)
+    return copy
+
+
+class FakeDeltaBuilder:
+    def __init__(self, mailbox, folder_id, url=None):
+        self.mailbox = mailbox
+        self.folder_id = folder_id
+        self.url = url
+
+    def with_url(self, url):
+        return FakeDeltaBuilder(self.mailbox, self.folder_id, url)
+
+    async def get(self, request_configuration=None):
+        mailbox = self.mailbox
+        mailbox.delta_calls += 1
+        if self.url in mailbox.expired_links:
+            raise GraphError(410, "Sync state expired")
+
+        if self.url is None:
+            since, offset = 0, 0
+        else:
+            kind, since, offset = self.url.split(":")
+            since, offset = int(since), int(offset)
+            if kind == "delta":
+                offset = 0
+
+        changed = mailbox.changes(self.folder_id, since)
+        page = changed[offset:offset + mailbox.page_size]
+        if offset + mailbox.page_size < len(changed):
+            return SimpleNamespace(value=page, odata_next_link=f"next:{since}:{offset + mailbox.page_size}",
+                                   odata_delta_link=None)
+        return SimpleNamespace(value=page, odata_next_link=None, odata_delta_link=f"delta:{mailbox.version}:0")
+
+
+class FakeMessageBuilder:
+    def __init__(self, mailbox, message_id):
+        self.mailbox = mailbox
+        self.message_id = message_id
+        self.attachments = SimpleNamespace(get=self._get_attachments)
+        self.move = SimpleNamespace(post=self._move)
+
+    def _message(self):
+        if self.message_id not in self.mailbox.messages:
+            raise GraphError(404, "Message not found")
+        return self.mailbox.messages[self.message_id]
+
+    async def get(self, request_configuration=None):
+        return _copy(self._message())
+
+    async def patch(self, body=None, request_configuration=None):
+        self._message()
+        self.mailbox.patches.append((self.message_id, body.is_read))
+        if body.is_read is not None:
+            self.mailbox.set_read(self.message_id, body.is_read)
+        return _copy(self._message())
+
+    async def _get_attachments(self, request_configuration=None):
+        self._message()
+        return SimpleNamespace(value=[], odata_next_link=None)
+
+    async def _move(self, body=None, request_configuration=None):
+        self._message()
+        self.mailbox.move(self.message_id, body.destination_id)
+        return _copy(self._message())
+
+
+class FakeGraphClient:
+    """Answers graph_client.users.by_user_id(...) chains from a FakeMailbox"""
+
+    def __init__(self, mailbox=None):
+        self.mailbox = mailbox or FakeMailbox()
+
+    @property
+    def users(self):
+        return SimpleNamespace(by_user_id=self._user)
+
+    def _user(self, user_id):
+        mailbox = self.mailbox
+        return SimpleNamespace(
+            mail_folders=SimpleNamespace(by_mail_folder_id=lambda folder_id: SimpleNamespace(
+                messages=SimpleNamespace(delta=FakeDeltaBuilder(mailbox, folder_id))
+            )),
+            messages=SimpleNamespace(by_message_id=lambda message_id: FakeMessageBuilder(mailbox, message_id))
+        )
+
+    def resolve_folder(self, folder_path):
+        return self.mailbox.folders.get(folder_path)
@@ -0,0 +1,67 @@
+import pytest
+
+from app.core.body_compaction import compact_body, is_data_line
+
+
+@pytest.mark.parametrize("line", [
+    "Compramos USD 1.000.000 a 950,25 con vencimiento 30-06-2025",
+    "Vendemos 2,500,000.00 al 30/06/2025",
+    "La operación vence el 2025-06-30",
+    "Forma de Pago: SWIFT",
+    "12345\tForward\t1.000.000",
+])
+def test_trade_data_lines_are_kept(line):
+    assert is_data_line(line)
+
+
+@pytest.mark.parametrize("line", [
+    "Quedo atento a sus comentarios",
+    "Tel: +56 2 2345 6789",
+    "De: Juan Pérez",
+    "On Mon, 30-06-2025 Juan wrote:",
+    "Av. Apoquindo 3000, piso 5",
+])
+def test_other_lines_are_dropped(line):
+    assert not is_data_line(line)
+
+
+def test_quoted_prose_trade_terms_survive_compaction():
+    body = "\n".join([
+        "Confirmamos la operación.",
+        "",
+        "De: Mesa de Dinero",
+        "Enviado: lunes, 30 de junio de 2025",
+        "Asunto: Operación 123456",
+        "",
+        "Estimados,",
+        "Compramos USD 1.000.000 a 950,25 con vencimiento 30-06-2025",
+        "Quedamos atentos a su confirmación",
+    ])
+
+    compacted = compact_body(body)
+
+    assert "Compramos USD 1.000.000 a 950,25 con vencimiento 30-06-2025" in compacted
+    assert "Quedamos atentos" not in compacted
+    assert "Enviado:" not in compacted
+
+
+def test_quoted_request_with_trade_number_survives_a_short_reply():
+    body = "\n".join([
+        "Confirmado, gracias.",
+        "",
+        "De: Mesa de Dinero",
+        "Enviado: lunes, 30 de junio de 2025 10:15",
+        "Para: Tesorería Cliente",
+        "Asunto: Confirmación de operación",
+        "",
+        "Estimados,",
+        "Favor confirmar la operacion numero 4567891 del dia de hoy",
+        "Saludos",
+    ])
+
+    compacted = compact_body(body)
+
+    assert compacted.startswith("Confirmado, gracias.")
+    assert "Favor confirmar la operacion numero 4567891 del dia de hoy" in compacted
+    assert "Asunto: Confirmación de operación" in compacted
+    assert "Enviado:" not in compacted and "Para:" not in compacted
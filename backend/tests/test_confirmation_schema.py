@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from app.schemas.confirmation import InvalidLLMResponseError, _to_number, normalize_llm_response, repair_json
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("1.000", 1000.0),
+    ("USD 1.000", 1000.0),
+    ("1,000", 1000.0),
+    ("1.000.000", 1000000.0),
+    ("-1.500", -1500.0),
+    ("1.000.000,00", 1000000.0),
+    ("1,000,000.00", 1000000.0),
+    ("950,25", 950.25),
+    ("950.25", 950.25),
+    ("0.125", 0.125),
+    ("0,125", 0.125),
+    (950.25, 950.25),
+    ("N/A", None),
+    (None, None),
+    (True, None),
+])
+def test_to_number(value, expected):
+    assert _to_number(value) == expected
+
+
+@pytest.mark.parametrize("text", [
+    '```json\n{"a": 1}\n```',
+    'Here is the JSON:\n{"a": 1}\nLet me know if you need anything else.',
+    '{"a": 1, // trade count\n}',
+    '{"a": /* count */ 1,}',
+])
+def test_repair_json(text):
+    assert json.loads(repair_json(text)) == {"a": 1}
+
+
+def test_repair_json_leaves_string_contents_alone():
+    text = '{"note": "a, } // not a comment", "items": [1, 2,],}'
+    assert json.loads(repair_json(text)) == {"note": "a, } // not a comment", "items": [1, 2]}
+
+
+def test_normalize_llm_response_repairs_and_coerces():
+    response = """```json
+    {
+        "Email": {"Confirmation": "sí", "Num_trades": "1"},
+        "Trades": [
+            {"TradeNumber": 123456, "QuantityCurrency1": "USD 1.000.000", "ForwardPrice": "950,25",
+             "Confirmation_OK": true, "Buyer": null},
+        ],
+    }
+    ```"""
+
+    data = json.loads(normalize_llm_response(response))
+
+    assert data["Email"] == {"Confirmation": "Yes", "Num_trades": 1}
+    assert data["Trades"] == [{"TradeNumber": "123456", "QuantityCurrency1": 1000000.0,
+                               "ForwardPrice": 950.25, "Confirmation_OK": "Yes"}]
+
+
+@pytest.mark.parametrize("text", ["not json", '{"Trades": []}', '{"Email": {"Confirmation": "Maybe"}}'])
+def test_normalize_llm_response_rejects_invalid_responses(text):
+    with pytest.raises(InvalidLLMResponseError):
+        normalize_llm_response(text)
@@ -0,0 +1,71 @@
+import json
+import multiprocessing
+import os
+import threading
+
+import pytest
+
+from app.core.file_store import JsonFileStore, file_store
+
+WRITERS = 8
+INCREMENTS = 50
+
+
+def increment(path, writer):
+    for _ in range(INCREMENTS):
+        file_store.update(path, lambda data: data.append(writer))
+
+
+def test_lock_files_stay_out_of_data_folder(assets_dir, tmp_path):
+    path = str(assets_dir / "matched_trades.json")
+    file_store.update(path, lambda data: data.append(1))
+
+    assert sorted(os.listdir(assets_dir)) == ["matched_trades.json"]
+    assert os.listdir(tmp_path / "storage" / "locks")
+    assert JsonFileStore._lock_path(path) != JsonFileStore._lock_path(str(tmp_path / "other" / "matched_trades.json"))
+
+
+def test_concurrent_thread_writers_lose_no_updates(assets_dir):
+    path = str(assets_dir / "email_matches.json")
+    valid_reads = []
+    stop = threading.Event()
+
+    def reader():
+        # Readers never take the lock and must still always see valid JSON
+        while not stop.is_set():
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    valid_reads.append(isinstance(json.load(f), list))
+
+    reader_thread = threading.Thread(target=reader)
+    reader_thread.start()
+    writers = [threading.Thread(target=increment, args=(path, i)) for i in range(WRITERS)]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+    stop.set()
+    reader_thread.join()
+
+    data = file_store.read(path)
+    assert len(data) == WRITERS * INCREMENTS
+    assert all(data.count(i) == INCREMENTS for i in range(WRITERS))
+    assert valid_reads and all(valid_reads)
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+def test_concurrent_process_writers_lose_no_updates(assets_dir):
+    path = str(assets_dir / "matched_trades.json")
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=increment, args=(path, i)) for i in range(WRITERS)]
+    for process in processes:
+        process.start()
+    # Threads of this process compete with the child processes for the same file
+    increment(path, WRITERS)
+    for process in processes:
+        process.join(timeout=60)
+        assert process.exitcode == 0
+
+    data = file_store.read(path)
+    assert len(data) == (WRITERS + 1) * INCREMENTS
+    assert all(data.count(i) == INCREMENTS for i in range(WRITERS + 1))
@@ -0,0 +1,104 @@
+import asyncio
+from datetime import datetime, timedelta, UTC
+from email.utils import format_datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.graph_batch_service import GraphBatchError, GraphBatchService, parse_retry_after
+
+
+class FakeResponse:
+    def __init__(self, payload, status=200):
+        self.payload = payload
+        self.status = status
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def json(self, content_type=None):
+        return self.payload
+
+
+class FakeSession:
+    """Answers each $batch POST with the next function of `responders`"""
+
+    closed = False
+
+    def __init__(self, *responders):
+        self.responders = list(responders)
+        self.batches = []
+
+    def post(self, url, json=None, headers=None):
+        self.batches.append(json["requests"])
+        return FakeResponse({"responses": self.responders.pop(0)(json["requests"])})
+
+    async def close(self):
+        pass
+
+
+def ok(requests):
+    return [{"id": r["id"], "status": 200, "body": {"url": r["url"]}} for r in requests]
+
+
+def make_service(session):
+    credential = SimpleNamespace(get_token=lambda scope: SimpleNamespace(token="token"))
+    service = GraphBatchService(credential, window_seconds=0.01)
+
+    async def run(*coroutines):
+        service._get_state().session = session
+        try:
+            return await asyncio.wait_for(asyncio.gather(*coroutines, return_exceptions=True), 5)
+        finally:
+            await service.close()
+    return service, run
+
+
+def test_requests_are_combined_into_one_batch():
+    session = FakeSession(ok)
+    service, run = make_service(session)
+
+    results = asyncio.run(run(*(service.submit("PATCH", f"/messages/{i}", {"isRead": True}) for i in range(5))))
+
+    assert [r["url"] for r in results] == [f"/messages/{i}" for i in range(5)]
+    assert len(session.batches) == 1
+
+
+def test_throttled_request_with_http_date_retry_after_is_retried():
+    retry_at = format_datetime(datetime.now(UTC) + timedelta(seconds=1), usegmt=True)
+
+    def throttled(requests):
+        return [{"id": r["id"], "status": 429, "headers": {"Retry-After": retry_at}} for r in requests]
+
+    session = FakeSession(throttled, ok)
+    service, run = make_service(session)
+
+    results = asyncio.run(run(service.submit("PATCH", "/messages/1", {"isRead": True})))
+
+    assert results == [{"url": "/messages/1"}]
+    assert len(session.batches) == 2
+
+
+def test_malformed_response_fails_callers_instead_of_hanging():
+    def malformed(requests):
+        return [{"id": r["id"], "status": "not-a-status"} for r in requests]
+
+    service, run = make_service(FakeSession(malformed))
+
+    results = asyncio.run(run(service.submit("PATCH", "/messages/1"), service.submit("PATCH", "/messages/2")))
+
+    assert all(isinstance(result, GraphBatchError) for result in results)
+
+
+@pytest.mark.parametrize("value, expected", [(None, 1.0), ("3", 3.0), ("-5", 0.0), ("soon", 1.0)])
+def test_parse_retry_after(value, expected):
+    assert parse_retry_after(value) == expected
+
+
+def test_parse_retry_after_http_date():
+    retry_at = format_datetime(datetime.now(UTC) + timedelta(seconds=30), usegmt=True)
+    assert 25 <= parse_retry_after(retry_at) <= 30
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
@@ -0,0 +1,299 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.config import Config
+from app.services.llm_service import LLMService
+from llm_services import LLMResponse
+
+EXTRACTION = json.dumps({"Email": {"Confirmation": "Yes"}, "Trades": [{"TradeNumber": "123456"}]})
+EMAIL = {"subject": "Confirmation 123456", "sender_email": "client@bank.example", "body_content": "Confirmamos"}
+
+
+class FakeProvider:
+    """Answers classification and extraction requests with queued replies (exceptions are raised)"""
+
+    def __init__(self, classification="Yes", extraction=EXTRACTION, extraction_delay=0):
+        self.replies = {"classification": [classification], "extraction": [extraction]}
+        self.extraction_delay = extraction_delay
+        self.requests = []
+        self.prompts = []
+
+    async def generate(self, request):
+        stage = "classification" if request.max_tokens == 5 else "extraction"
+        self.requests.append(stage)
+        self.prompts.append(request.prompt)
+        if stage == "extraction":
+            await asyncio.sleep(self.extraction_delay)
+        replies = self.replies[stage]
+        reply = replies.pop(0) if len(replies) > 1 else replies[0]
+        if isinstance(reply, BaseException):
+            raise reply
+        return LLMResponse(content=reply, tokens_used=10, metadata={})
+
+
+@pytest.fixture
+def make_service(assets_dir, monkeypatch):
+    monkeypatch.setattr(Config, "LLM_CACHE_ENABLED", False)
+    monkeypatch.setattr(Config, "LLM_TWO_TIER_ENABLED", True)
+    monkeypatch.setattr(Config, "LLM_HEDGE_ENABLED", False)
+    monkeypatch.setattr(Config, "LLM_PROVIDER_CHAIN", ["Anthropic", "OpenAI"])
+
+    def make_service(**providers):
+        service = LLMService()
+        service.services_available = {name: True for name in providers}
+        service.llm_instances.update(providers)
+        return service
+    return make_service
+
+
+def test_classification_transport_error_fails_over(make_service):
+    anthropic = FakeProvider(classification=ConnectionError("connection reset"))
+    openai = FakeProvider()
+    service = make_service(Anthropic=anthropic, OpenAI=openai)
+
+    result = asyncio.run(service.process_email_data(EMAIL))
+
+    assert json.loads(result)["Trades"][0]["TradeNumber"] == "123456"
+    assert anthropic.requests == ["classification"]
+    assert openai.requests == ["classification", "extraction"]
+    assert service.circuit_breakers["Anthropic"].snapshot()["consecutive_failures"] == 1
+
+
+def test_unclear_classification_falls_back_to_extraction(make_service):
+    anthropic = FakeProvider(classification="Quizás")
+    service = make_service(Anthropic=anthropic)
+
+    asyncio.run(service.process_email_data(EMAIL))
+
+    assert anthropic.requests == ["classification", "extraction"]
+
+
+def test_negative_classification_skips_extraction(make_service):
+    anthropic = FakeProvider(classification="No.")
+    service = make_service(Anthropic=anthropic)
+
+    result = asyncio.run(service.process_email_data(EMAIL))
+
+    assert json.loads(result)["Email"]["Confirmation"] == "No"
+    assert anthropic.requests == ["classification"]
+
+
+def test_latency_histogram_records_only_extraction_calls(make_service, monkeypatch):
+    monkeypatch.setattr(Config, "LLM_CACHE_ENABLED", True)
+    anthropic = FakeProvider()
+    service = make_service(Anthropic=anthropic)
+
+    asyncio.run(service.process_email_data(EMAIL))
+    asyncio.run(service.process_email_data(EMAIL))
+
+    assert anthropic.requests == ["classification", "extraction"]
+    assert [h.count for h in service.latency_histograms.values()] == [1]
+
+
+def test_negative_classification_records_no_latency(make_service):
+    service = make_service(Anthropic=FakeProvider(classification="No"))
+
+    asyncio.run(service.process_email_data(EMAIL))
+
+    assert all(h.count == 0 for h in service.latency_histograms.values())
+
+
+def test_llm_metrics_endpoint_reports_routing_stats(make_service, monkeypatch):
+    from app import create_app
+    from app.api import deps
+
+    service = make_service(Anthropic=FakeProvider())
+    asyncio.run(service.process_email_data(EMAIL))
+    monkeypatch.setitem(deps._instances, "llm_service", service)
+
+    routing = create_app().test_client().get("/llm-metrics").get_json()["routing"]
+
+    assert routing["circuits"]["Anthropic"]["state"] == "closed"
+    assert [stats["count"] for stats in routing["latency"].values()] == [1]
+
+
+class RateLimitError(Exception):
+    """Named like the provider SDKs' 429 exception"""
+
+
+def status_error(status_code, message="Too many requests"):
+    error = Exception(message)
+    error.status_code = status_code
+    error.response = SimpleNamespace(status_code=status_code, headers={"retry-after-ms": "10"})
+    return error
+
+
+@pytest.mark.parametrize("error, expected", [
+    (status_error(429), 0.01),
+    (RateLimitError("slow down"), 10.0),
+    (status_error(500, "upstream said 429 rate limit"), None),
+    (ValueError("Rate limit of 429 tokens exceeded in prompt"), None),
+])
+def test_retry_after_keys_on_status_or_exception_type(error, expected, monkeypatch):
+    monkeypatch.setattr(Config, "LLM_RATE_LIMIT_DEFAULT_RETRY_SECONDS", 10.0)
+    assert LLMService._get_retry_after(error) == expected
+
+
+def test_rate_limited_extraction_is_retried_and_counted(make_service, monkeypatch):
+    from app import create_app
+    from app.api import deps
+
+    anthropic = FakeProvider()
+    anthropic.replies["extraction"].insert(0, status_error(429))
+    service = make_service(Anthropic=anthropic)
+    monkeypatch.setitem(deps._instances, "llm_service", service)
+
+    asyncio.run(service.process_email_data(EMAIL))
+    rate_limits = create_app().test_client().get("/llm-metrics").get_json()["rate_limits"]
+
+    assert anthropic.requests == ["classification", "extraction", "extraction"]
+    assert sum(stats["rate_limited"] for stats in rate_limits.values()) == 1
+
+
+def test_provider_timeouts_accept_fractional_seconds():
+    from app.config import _parse_float_mapping
+
+    assert _parse_float_mapping("Anthropic=7.5, OpenAI=30,Google=soon") == {"Anthropic": 7.5, "OpenAI": 30.0}
+
+
+def test_service_is_reusable_after_close_on_a_new_event_loop(make_service, monkeypatch):
+    monkeypatch.setattr(Config, "LLM_CACHE_ENABLED", True)
+    monkeypatch.setattr(Config, "EMAIL_PROCESSING_CONCURRENCY", 1)
+    monkeypatch.setitem(Config.LLM_RATE_LIMIT_RPM, "Anthropic", 6000)
+    anthropic = FakeProvider()
+    service = make_service(Anthropic=anthropic)
+    other_email = {**EMAIL, "subject": "Confirmation 654321"}
+
+    async def monitor_run():
+        # Two emails contend for the semaphore and the rate limiter on this loop
+        try:
+            return await asyncio.gather(service.process_email_data(EMAIL), service.process_email_data(other_email))
+        finally:
+            await service.close()
+
+    asyncio.run(monitor_run())
+    service.llm_instances["Anthropic"] = anthropic
+    results = asyncio.run(monitor_run())
+
+    assert all(json.loads(result)["Trades"] for result in results)
+    # The second run is answered from the response cache, which close() left open
+    assert len(anthropic.requests) == 4
+    assert service.response_cache.enabled
+
+
+def test_invalid_extraction_is_retried_with_the_validation_error(make_service):
+    anthropic = FakeProvider(extraction="Sure! Here is the data you asked for.")
+    anthropic.replies["extraction"].append(EXTRACTION)
+    service = make_service(Anthropic=anthropic)
+
+    result = asyncio.run(service.process_email_data(EMAIL))
+
+    assert json.loads(result)["Trades"][0]["TradeNumber"] == "123456"
+    assert anthropic.requests == ["classification", "extraction", "extraction"]
+    assert "not valid JSON" not in anthropic.prompts[1]
+    assert "Your previous answer was not valid JSON" in anthropic.prompts[2]
+
+
+def test_invalid_extractions_fail_over_without_opening_the_circuit(make_service, monkeypatch):
+    monkeypatch.setattr(Config, "LLM_CIRCUIT_FAILURE_THRESHOLD", 1)
+    anthropic = FakeProvider(extraction="not json")
+    service = make_service(Anthropic=anthropic, OpenAI=FakeProvider())
+
+    result = asyncio.run(service.process_email_data(EMAIL))
+
+    assert json.loads(result)["Trades"][0]["TradeNumber"] == "123456"
+    assert anthropic.requests == ["classification", "extraction", "extraction"]
+    assert service.circuit_breakers["Anthropic"].snapshot() == {"state": "closed", "consecutive_failures": 0}
+
+
+def trade_number(result):
+    return json.loads(result)["Trades"][0]["TradeNumber"]
+
+
+def test_slow_provider_is_hedged_with_the_next_one(make_service, monkeypatch):
+    monkeypatch.setattr(Config, "LLM_HEDGE_ENABLED", True)
+    monkeypatch.setattr(Config, "LLM_HEDGE_MIN_SAMPLES", 1)
+    hedge = json.dumps({"Email": {"Confirmation": "Yes"}, "Trades": [{"TradeNumber": "654321"}]})
+    anthropic = FakeProvider(extraction_delay=5)
+    openai = FakeProvider(extraction=hedge)
+    service = make_service(Anthropic=anthropic, OpenAI=openai)
+    service._get_latency_histogram("Anthropic", service._get_stage_model("Anthropic", "extraction")).record(0.05)
+
+    start = time.monotonic()
+    result = asyncio.run(service.process_email_data(EMAIL))
+
+    assert trade_number(result) == "654321"
+    assert time.monotonic() - start < 2
+    assert anthropic.requests == ["classification", "extraction"]
+    assert openai.requests == ["classification", "extraction"]
+
+
+def test_hedge_waits_for_enough_latency_samples(make_service, monkeypatch):
+    monkeypatch.setattr(Config, "LLM_HEDGE_ENABLED", True)
+    monkeypatch.setattr(Config, "LLM_HEDGE_MIN_SAMPLES", 20)
+    anthropic = FakeProvider(extraction_delay=0.2)
+    openai = FakeProvider()
+    service = make_service(Anthropic=anthropic, OpenAI=openai)
+    service._get_latency_histogram("Anthropic", service._get_stage_model("Anthropic", "extraction")).record(0.05)
+
+    asyncio.run(service.process_email_data(EMAIL))
+
+    assert openai.requests == []
+
+
+def test_extraction_timeout_fails_over_and_opens_the_circuit(make_service, monkeypatch):
+    monkeypatch.setattr(Config, "LLM_CIRCUIT_FAILURE_THRESHOLD", 1)
+    monkeypatch.setitem(Config.LLM_PROVIDER_TIMEOUTS, "Anthropic", 0.05)
+    anthropic = FakeProvider(extraction_delay=1)
+    openai = FakeProvider()
+    service = make_service(Anthropic=anthropic, OpenAI=openai)
+
+    assert trade_number(asyncio.run(service.process_email_data(EMAIL))) == "123456"
+    assert service.get_routing_stats()["circuits"]["Anthropic"]["state"] == "open"
+
+    # With its circuit open, Anthropic is skipped for the next email
+    asyncio.run(service.process_email_data(EMAIL))
+    assert anthropic.requests == ["classification", "extraction"]
+    assert openai.requests == ["classification", "extraction"] * 2
+
+
+def test_last_provider_error_is_raised_when_every_provider_fails(make_service):
+    service = make_service(Anthropic=FakeProvider(classification=ConnectionError("reset")),
+                           OpenAI=FakeProvider(classification=ConnectionError("refused")))
+
+    with pytest.raises(Exception, match="refused"):
+        asyncio.run(service.process_email_data(EMAIL))
+
+
+def test_stats_can_be_read_while_providers_are_added(make_service):
+    import threading
+
+    service = make_service()
+    stop = threading.Event()
+    errors = []
+
+    def read_stats():
+        while not stop.is_set():
+            try:
+                service.get_routing_stats()
+                service.get_rate_limit_stats()
+            except RuntimeError as e:
+                errors.append(e)
+
+    reader = threading.Thread(target=read_stats)
+    reader.start()
+    try:
+        for i in range(20_000):
+            service._get_circuit_breaker(f"provider-{i}")
+            service._get_latency_histogram(f"provider-{i}", "model")
+            service._get_rate_limiter(f"provider-{i}", "model")
+    finally:
+        stop.set()
+        reader.join()
+
+    assert errors == []
+    assert len(service.get_rate_limit_stats()) == 20_000
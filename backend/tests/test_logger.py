@@ -0,0 +1,168 @@
+import json
+import threading
+import time
+import traceback
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.core.logger import BufferedLogClient, EventCounter
+
+SERVER_LATENCY = 0.02
+
+
+class StubLogServer(ThreadingHTTPServer):
+    """Log server answering every POST after SERVER_LATENCY seconds"""
+
+    def __init__(self):
+        self.events = []
+        super().__init__(("127.0.0.1", 0), StubLogHandler)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/api/logs"
+
+
+class StubLogHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        time.sleep(SERVER_LATENCY)
+        self.server.events.extend(json.loads(body))
+        self.send_response(201)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class HttpLogClient:
+    """Posts each event, or each flushed batch, to the log server like the real client"""
+
+    def __init__(self, url):
+        self.url = url
+        self.pending = []
+        self.exceptions = []
+
+    def _post(self, events):
+        request = urllib.request.Request(self.url, data=json.dumps(events).encode(), method="POST",
+                                         headers={"Content-Type": "application/json"})
+        urllib.request.urlopen(request).close()
+
+    def info(self, message, **kwargs):
+        self.pending.append({"level": "INFO", "message": message})
+
+    warning = error = info
+
+    def log_exception(self, exception, message=None, **kwargs):
+        self.exceptions.append((threading.current_thread().name, traceback.format_exc()))
+
+    def flush(self):
+        if self.pending:
+            events, self.pending = self.pending, []
+            self._post(events)
+
+    def shutdown(self):
+        self.flush()
+
+
+@pytest.fixture
+def log_server():
+    server = StubLogServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_buffered_logging_keeps_server_latency_off_the_caller(log_server):
+    """Benchmark: direct logging pays a round trip per event, buffered logging none"""
+    events = 50
+
+    direct = HttpLogClient(log_server.url)
+    start = time.perf_counter()
+    for i in range(events):
+        direct.info(f"direct {i}")
+        direct.flush()
+    direct_seconds = time.perf_counter() - start
+
+    buffered = BufferedLogClient(HttpLogClient(log_server.url), batch_size=100, flush_interval=0.05)
+    try:
+        start = time.perf_counter()
+        for i in range(events):
+            buffered.info(f"buffered {i}")
+        buffered_seconds = time.perf_counter() - start
+        buffered.flush()
+    finally:
+        buffered.shutdown()
+
+    assert direct_seconds >= events * SERVER_LATENCY
+    assert buffered_seconds < direct_seconds / 10
+    messages = [event["message"] for event in log_server.events]
+    assert sorted(m for m in messages if m.startswith("buffered")) == sorted(f"buffered {i}" for i in range(events))
+
+
+def test_log_exception_captures_traceback_on_calling_thread(log_server):
+    client = HttpLogClient(log_server.url)
+    buffered = BufferedLogClient(client)
+    try:
+        try:
+            raise ValueError("boom")
+        except ValueError as e:
+            buffered.log_exception(e, message="failed")
+    finally:
+        buffered.shutdown()
+
+    thread_name, formatted = client.exceptions[0]
+    assert thread_name == threading.current_thread().name
+    assert "ValueError: boom" in formatted
+
+
+class RecordingClient:
+    def __init__(self):
+        self.messages = []
+
+    def info(self, message, **kwargs):
+        self.messages.append((message, kwargs["data"]))
+
+
+def test_event_counter_emits_on_timer_without_further_records():
+    client = RecordingClient()
+    counter = EventCounter(client, name="trade lookups", tags=["trade", "lookup"], interval=0.2)
+    try:
+        counter.record("hits")
+        counter.record("hits")
+        counter.record("misses")
+        deadline = time.monotonic() + 2
+        while not client.messages and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        counter.close()
+
+    message, data = client.messages[0]
+    assert message.startswith("3 trade lookups (2 hits, 1 misses)")
+    assert data["hits"] == 2 and data["misses"] == 1
+
+
+def test_event_counter_flushes_partial_window_on_close():
+    client = RecordingClient()
+    counter = EventCounter(client, name="trade lookups", tags=["trade"], interval=3600)
+    counter.record("hits")
+    assert client.messages == []
+
+    counter.close()
+    counter.close()
+    assert [data["total"] for _, data in client.messages] == [1]
+
+
+def test_services_share_one_trade_lookup_counter(assets_dir):
+    from app.repositories.match_repository import JsonMatchRepository
+    from app.services.email_processor_service import EmailProcessorService
+
+    first = EmailProcessorService(match_repository=JsonMatchRepository())
+    threads = threading.active_count()
+    second = EmailProcessorService(match_repository=JsonMatchRepository())
+
+    assert second.trade_lookup_stats is first.trade_lookup_stats
+    assert threading.active_count() == threads
@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from app.repositories.match_repository import EMAIL_MATCHES, IDENTIFIED_TRADES, JournalMatchRepository
+
+
+@pytest.fixture
+def open_repository(tmp_path, assets_dir):
+    journal_path = str(tmp_path / "storage" / "match_journal.jsonl")
+    repositories = []
+
+    def open_repository():
+        repository = JournalMatchRepository(journal_path=journal_path, compact_interval=3600, fsync=False)
+        repositories.append(repository)
+        return repository
+
+    yield open_repository
+    for repository in repositories:
+        repository._stop.set()
+
+
+def add_match(repository, email_id, status="Unrecognized"):
+    repository.add_email_match({"InferredTradeID": email_id, "status": status})
+
+
+def test_replay_restores_uncompacted_events(open_repository, assets_dir):
+    repository = open_repository()
+    add_match(repository, "t1")
+    repository.add_identified_trade({"TradeNumber": "1"})
+    repository._journal.close()
+
+    reopened = open_repository()
+    assert [m["InferredTradeID"] for m in reopened.list_records(EMAIL_MATCHES)] == ["t1"]
+    assert len(reopened.list_records(IDENTIFIED_TRADES)) == 1
+    # The startup export brings the frontend files up to date
+    assert json.loads((assets_dir / "email_matches.json").read_text())[0]["InferredTradeID"] == "t1"
+
+
+def test_crash_between_commit_and_journal_rewrite_does_not_duplicate(open_repository, monkeypatch):
+    repository = open_repository()
+    add_match(repository, "t1")
+    repository.compact()
+    repository.update_email_status("t1", "Confirmed")
+    add_match(repository, "t2")
+
+    def crash():
+        raise OSError("simulated crash")
+
+    # The state is committed, then the process dies before the journal is trimmed
+    monkeypatch.setattr(repository, "_rewrite_journal", crash)
+    with pytest.raises(OSError):
+        repository.compact()
+    repository._journal.close()
+
+    reopened = open_repository()
+    matches = reopened.list_records(EMAIL_MATCHES)
+    assert [m["InferredTradeID"] for m in matches] == ["t1", "t2"]
+    assert matches[0]["status"] == "Confirmed"
+    assert matches[0]["previous_status"] == "Unrecognized"
+    assert reopened.undo_status_change("t1") == "Unrecognized"
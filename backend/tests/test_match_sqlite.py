@@ -0,0 +1,67 @@
+import json
+import runpy
+from pathlib import Path
+
+import pytest
+
+from app.repositories.match_repository import EMAIL_MATCHES, IDENTIFIED_TRADES, SqliteMatchRepository
+
+IMPORT_SCRIPT = Path(__file__).resolve().parent.parent / "import_matches.py"
+
+
+@pytest.fixture
+def open_repository(tmp_path, assets_dir):
+    db_path = str(tmp_path / "storage" / "matches.sqlite3")
+    repositories = []
+
+    def open_repository():
+        repository = SqliteMatchRepository(db_path=db_path, export_delay=0)
+        repositories.append(repository)
+        return repository
+
+    yield open_repository
+    for repository in repositories:
+        repository.close()
+
+
+def write_snapshots(assets_dir):
+    matches = [{"InferredTradeID": 1, "status": "Confirmed", "previous_status": "Unrecognized"},
+               {"InferredTradeID": 2, "status": "Unrecognized"}]
+    (assets_dir / "email_matches.json").write_text(json.dumps(matches), encoding="utf-8")
+    (assets_dir / "matched_trades.json").write_text(json.dumps([{"TradeNumber": "7"}]), encoding="utf-8")
+    return matches
+
+
+def test_existing_snapshots_are_imported_on_first_open(open_repository, assets_dir):
+    matches = write_snapshots(assets_dir)
+
+    repository = open_repository()
+    repository.add_email_match({"InferredTradeID": 3, "status": "Unrecognized"})
+
+    exported = json.loads((assets_dir / "email_matches.json").read_text())
+    assert exported == matches + [{"InferredTradeID": 3, "status": "Unrecognized"}]
+    assert repository.undo_status_change(1) == "Unrecognized"
+    assert len(repository.list_records(IDENTIFIED_TRADES)) == 1
+
+
+def test_reopening_does_not_import_twice(open_repository, assets_dir):
+    write_snapshots(assets_dir)
+    open_repository().close()
+
+    assert len(open_repository().list_records(EMAIL_MATCHES)) == 2
+
+
+def test_import_script_reports_counts(open_repository, assets_dir, monkeypatch, capsys):
+    from app.config import Config
+
+    write_snapshots(assets_dir)
+    monkeypatch.setattr(Config, "STORAGE_PATH", str(assets_dir / "storage"))
+
+    runpy.run_path(str(IMPORT_SCRIPT), run_name="__main__")
+
+    output = capsys.readouterr().out
+    assert "1 records from matched_trades.json" in output
+    assert "2 records from email_matches.json" in output
+    repository = SqliteMatchRepository()
+    assert len(repository.list_records(EMAIL_MATCHES)) == 2
+    repository.close()
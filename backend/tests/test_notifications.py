@@ -0,0 +1,202 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, UTC
+
+import pytest
+from msgraph.generated.models.email_address import EmailAddress
+from msgraph.generated.models.item_body import ItemBody
+from msgraph.generated.models.recipient import Recipient
+
+import simulate_notifications
+from app import create_app
+from app.api import deps
+from app.repositories.match_repository import JsonMatchRepository
+from app.services.confirmation_service import ConfirmationService
+from app.services.email_processor_service import EmailProcessorService
+from app.services.notification_service import NotificationIngestService
+from fake_graph import FakeGraphClient, FakeMailbox
+
+FOLDER = "Inbox/Confirmations"
+USER_EMAIL = "ops@example.com"
+CLIENT_STATE = "test-client-state"
+
+
+def add_email(mailbox, message_id, body="Please confirm trade 123456"):
+    return mailbox.add_message(
+        FOLDER, message_id,
+        sender=Recipient(email_address=EmailAddress(address="client@bank.example")),
+        received_date_time=datetime(2025, 6, 30, 10, 0, tzinfo=UTC),
+        body=ItemBody(content=body),
+        has_attachments=False
+    )
+
+
+@pytest.fixture
+def mailbox():
+    mailbox = FakeMailbox()
+    mailbox.add_folder(FOLDER)
+    return mailbox
+
+
+@pytest.fixture
+def email_processor(mailbox, assets_dir, monkeypatch):
+    processor = EmailProcessorService(graph_client=FakeGraphClient(mailbox), match_repository=JsonMatchRepository())
+    monkeypatch.setattr(processor, "user_email", USER_EMAIL)
+    return processor
+
+
+class RecordingPipeline:
+    def __init__(self):
+        self.batches = []
+
+    async def handle_new_unread_email(self, emails):
+        self.batches.append([email.id for email in emails])
+
+
+@pytest.fixture
+def ingest(mailbox, email_processor, monkeypatch):
+    """Ingest service running on its own event loop, registered as the app's shared instance"""
+    service = NotificationIngestService(FakeGraphClient(mailbox), USER_EMAIL, email_processor_service=email_processor)
+    service.client_state = CLIENT_STATE
+    monkeypatch.setitem(deps._instances, "notification_ingest_service", service)
+
+    loop = asyncio.new_event_loop()
+    service.attach(loop)
+    service.pipeline = RecordingPipeline()
+    task = loop.create_task(service.run(service.pipeline))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield service
+    loop.call_soon_threadsafe(task.cancel)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+    loop.close()
+
+
+def post_notifications(client, *message_ids, client_state=CLIENT_STATE):
+    payload = {"value": [simulate_notifications.build_notification(m, client_state, USER_EMAIL) for m in message_ids]}
+    return client.post("/graph-notifications", json=payload)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_simulated_notifications_reach_pipeline_and_mark_read(mailbox, ingest):
+    add_email(mailbox, "m1")
+    add_email(mailbox, "m2")
+    client = create_app().test_client()
+
+    assert client.post("/graph-notifications?validationToken=abc").get_data(as_text=True) == "abc"
+    response = post_notifications(client, "m1", "m2")
+    assert response.status_code == 202 and response.get_json() == {"queued": 2, "rejected": 0}
+
+    assert wait_for(lambda: ingest.pipeline.batches)
+    assert sorted(ingest.pipeline.batches[0]) == ["m1", "m2"]
+    assert mailbox.messages["m1"].is_read and mailbox.messages["m2"].is_read
+
+    # A repeated notification finds the message already read
+    post_notifications(client, "m1")
+    time.sleep(0.2)
+    assert len(ingest.pipeline.batches) == 1
+
+
+def test_notifications_with_wrong_client_state_are_rejected(mailbox, ingest):
+    add_email(mailbox, "m1")
+    response = post_notifications(create_app().test_client(), "m1", client_state="forged")
+    assert response.get_json() == {"queued": 0, "rejected": 1}
+
+
+class FailingLLM:
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    async def process_email_data(self, email_data):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("provider unavailable")
+        return '{"Email": {"Confirmation": "No"}, "Trades": []}'
+
+
+def make_confirmation_service(email_processor, llm):
+    service = ConfirmationService(graph_client=email_processor.graph_client, llm_service=llm,
+                                  email_processor_service=email_processor,
+                                  logger=deps.logger, match_repository=email_processor.match_repository)
+    service.prefilter.enabled = False
+    return service
+
+
+def test_failed_email_is_released_and_retried(mailbox, email_processor, monkeypatch):
+    message = add_email(mailbox, "m1")
+    mailbox.set_read("m1", True)
+    llm = FailingLLM(failures=1)
+    service = make_confirmation_service(email_processor, llm)
+
+    asyncio.run(service.handle_new_unread_email([message]))
+    assert not mailbox.messages["m1"].is_read
+    assert "m1" not in service._handled_ids
+
+    moved = []
+
+    async def move_email_to_folder(email, folder_path):
+        moved.append(email.id)
+    monkeypatch.setattr(email_processor, "move_email_to_folder", move_email_to_folder)
+
+    asyncio.run(service.handle_new_unread_email([message]))
+    assert llm.calls == 2 and moved == ["m1"]
+    assert "m1" in service._handled_ids and "m1" not in service._failed_attempts
+
+
+def test_email_is_abandoned_after_max_attempts(mailbox, email_processor, monkeypatch):
+    from app.config import Config
+
+    monkeypatch.setattr(Config, "EMAIL_MAX_PROCESSING_ATTEMPTS", 2)
+    message = add_email(mailbox, "m1")
+    llm = FailingLLM(failures=10)
+    service = make_confirmation_service(email_processor, llm)
+
+    for _ in range(4):
+        mailbox.set_read("m1", True)
+        asyncio.run(service.handle_new_unread_email([message]))
+
+    assert llm.calls == 2
+    assert "m1" in service._handled_ids
+    assert mailbox.messages["m1"].is_read
+
+
+class SlowFirstLLM:
+    """Answers the first email last, tracking how many calls overlap"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def process_email_data(self, email_data):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.1 if "first" in email_data["body_content"] else 0)
+        self.in_flight -= 1
+        return '{"Email": {"Confirmation": "No"}, "Trades": []}'
+
+
+def test_results_are_applied_in_arrival_order(mailbox, email_processor, monkeypatch):
+    messages = [add_email(mailbox, "m1", body="first"), add_email(mailbox, "m2", body="second")]
+    llm = SlowFirstLLM()
+    service = make_confirmation_service(email_processor, llm)
+
+    applied = []
+
+    async def process_llm_response(email, email_data, llm_response):
+        assert service._results_lock.locked()
+        applied.append(email.id)
+    monkeypatch.setattr(service, "process_llm_response", process_llm_response)
+
+    asyncio.run(service.handle_new_unread_email(messages))
+
+    assert llm.max_in_flight == 2
+    assert applied == ["m1", "m2"]
@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+from app.services.outlook_monitor_service import OutlookMonitorService
+from fake_graph import FakeGraphClient, FakeMailbox
+
+FOLDER = "Inbox/Confirmations"
+NOT_RELEVANT = "Inbox/Confirmations/Not Relevant"
+
+
+@pytest.fixture
+def mailbox():
+    mailbox = FakeMailbox(page_size=2)
+    mailbox.add_folder(FOLDER)
+    mailbox.add_folder(NOT_RELEVANT)
+    return mailbox
+
+
+@pytest.fixture
+def make_monitor(mailbox, assets_dir, tmp_path):
+    def make_monitor():
+        monitor = OutlookMonitorService("ops@example.com", FakeGraphClient(mailbox))
+        monitor.dispatched = []
+        monitor.register_event_handler("new_unread_email", lambda emails: monitor.dispatched.extend(emails))
+        return monitor
+    return make_monitor
+
+
+def run_cycle(monitor, mailbox, delta_link=None):
+    state_path = monitor._delta_state_path(FOLDER)
+    return asyncio.run(monitor.run_delta_cycle(mailbox.folders[FOLDER], delta_link, state_path))
+
+
+def test_initial_sync_pages_and_marks_dispatched_messages_read(make_monitor, mailbox):
+    for i in range(5):
+        mailbox.add_message(FOLDER, f"m{i}")
+    mailbox.add_message(FOLDER, "already-read", is_read=True)
+    monitor = make_monitor()
+
+    delta_link, count = run_cycle(monitor, mailbox)
+
+    assert count == 5
+    assert [m.id for m in monitor.dispatched] == [f"m{i}" for i in range(5)]
+    assert all(mailbox.messages[f"m{i}"].is_read for i in range(5))
+    assert mailbox.delta_calls == 3
+
+    # Our own read-flag updates come back as changes but are not new work
+    monitor.dispatched.clear()
+    delta_link, count = run_cycle(monitor, mailbox, delta_link)
+    assert count == 0 and monitor.dispatched == []
+
+
+def test_restart_and_lost_state_do_not_reprocess(make_monitor, mailbox):
+    mailbox.add_message(FOLDER, "m1")
+    run_cycle(make_monitor(), mailbox)
+
+    # A new process with no delta link does a full sync of the folder
+    restarted = make_monitor()
+    _, count = run_cycle(restarted, mailbox)
+    assert count == 0
+
+    mailbox.add_message(FOLDER, "m2")
+    _, count = run_cycle(restarted, mailbox)
+    assert [m.id for m in restarted.dispatched] == ["m2"]
+
+
+def test_expired_delta_link_resyncs_without_duplicates(make_monitor, mailbox):
+    mailbox.add_message(FOLDER, "m1")
+    monitor = make_monitor()
+    delta_link, _ = run_cycle(monitor, mailbox)
+    mailbox.add_message(FOLDER, "m2")
+    mailbox.expired_links.add(delta_link)
+
+    with pytest.raises(Exception) as error:
+        run_cycle(monitor, mailbox, delta_link)
+    assert error.value.response_status_code == 410
+
+    run_cycle(monitor, mailbox, None)
+    assert [m.id for m in monitor.dispatched] == ["m1", "m2"]
+
+
+def test_email_marked_unread_after_failure_is_dispatched_again(make_monitor, mailbox):
+    mailbox.add_message(FOLDER, "m1")
+    monitor = make_monitor()
+    delta_link, _ = run_cycle(monitor, mailbox)
+
+    mailbox.set_read("m1", False)
+    delta_link, count = run_cycle(monitor, mailbox, delta_link)
+    assert count == 1
+    assert [m.id for m in monitor.dispatched] == ["m1", "m1"]
+
+
+def test_moved_messages_are_skipped(make_monitor, mailbox):
+    mailbox.add_message(FOLDER, "m1", is_read=True)
+    monitor = make_monitor()
+    delta_link, _ = run_cycle(monitor, mailbox)
+
+    mailbox.move("m1", mailbox.folders[NOT_RELEVANT])
+    _, count = run_cycle(monitor, mailbox, delta_link)
+    assert count == 0
+
+
+def test_messages_that_cannot_be_marked_read_are_retried(make_monitor, mailbox, monkeypatch):
+    mailbox.add_message(FOLDER, "m1")
+    monitor = make_monitor()
+    real_mark_as_read = monitor.mark_as_read
+
+    async def failing_mark_as_read(message_id):
+        raise ConnectionError("Graph unavailable")
+
+    monkeypatch.setattr(monitor, "mark_as_read", failing_mark_as_read)
+    delta_link, count = run_cycle(monitor, mailbox)
+    assert count == 0 and not mailbox.messages["m1"].is_read
+
+    monkeypatch.setattr(monitor, "mark_as_read", real_mark_as_read)
+    _, count = run_cycle(monitor, mailbox, delta_link)
+    assert count == 1 and mailbox.messages["m1"].is_read
@@ -0,0 +1,73 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.prefilter_service import NOT_RELEVANT, SEND_TO_LLM, PrefilterService
+
+
+def make_email(headers=(), has_attachments=False):
+    return SimpleNamespace(
+        id="m1",
+        has_attachments=has_attachments,
+        internet_message_headers=[SimpleNamespace(name=name, value=value) for name, value in headers]
+    )
+
+
+def decide(headers=(), subject="Confirmación de operación forward", body="", entity_name="Banco XYZ"):
+    service = PrefilterService()
+    service.enabled = True
+    service.skip_score = -1
+    email_data = {"subject": subject, "body_content": body, "entity_name": entity_name}
+    return service.evaluate(make_email(headers), email_data)
+
+
+@pytest.mark.parametrize("headers", [
+    [("Auto-Submitted", "auto-replied")],
+    [("X-Autoreply", "yes")],
+    [("X-Autorespond", "1")],
+    [("Precedence", "auto_reply")],
+])
+def test_auto_reply_headers_skip_the_llm(headers):
+    decision = decide(headers)
+    assert decision.action == NOT_RELEVANT and decision.score == 0
+
+
+@pytest.mark.parametrize("headers", [
+    [("Auto-Submitted", "auto-generated")],
+    [("X-Auto-Response-Suppress", "All")],
+    [("Precedence", "bulk")],
+    [("List-Id", "<confirmations.platform.example>")],
+])
+def test_automated_mail_headers_only_lower_the_score(headers):
+    decision = decide(headers)
+    assert decision.action == SEND_TO_LLM
+    assert any("(-1)" in reason for reason in decision.reasons)
+
+
+def test_automated_newsletter_still_scores_out():
+    decision = decide([("Auto-Submitted", "auto-generated"), ("List-Unsubscribe", "<mailto:x>")],
+                      subject="Newsletter semanal", body="Invitación a nuestro webinar", entity_name=None)
+    assert decision.action == NOT_RELEVANT
+    assert decision.score < -1
+
+
+class Book:
+    """Email processor whose trade book holds only 123456"""
+
+    def find_trade_numbers(self, text):
+        return ["123456"] if "123456" in text else []
+
+
+@pytest.mark.parametrize("trade_number, reason", [("123456", "trade number in book"),
+                                                  ("987654", "trade number not in book")])
+def test_any_trade_number_goes_to_the_llm(trade_number, reason):
+    service = PrefilterService(Book())
+    service.enabled = True
+    service.skip_score = -1
+    email_data = {"subject": "Newsletter semanal", "entity_name": None,
+                  "body_content": f"Invitación al webinar. Operación {trade_number}"}
+
+    decision = service.evaluate(make_email([("List-Unsubscribe", "<mailto:x>")]), email_data)
+
+    assert decision.action == SEND_TO_LLM
+    assert decision.reasons == [reason] and decision.trade_numbers == [trade_number]
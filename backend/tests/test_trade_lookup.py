@@ -0,0 +1,120 @@
+import asyncio
+import json
+
+import pytest
+
+from app.repositories.match_repository import JsonMatchRepository
+from app.services.email_processor_service import EmailProcessorService
+
+
+def write_trades(assets_dir, count):
+    trades = [{"TradeNumber": 100000 + i, "Counterparty": f"Bank {i % 50}", "Amount": i * 10} for i in range(count)]
+    (assets_dir / "unmatched_trades.json").write_text(json.dumps(trades), encoding="utf-8")
+    return trades
+
+
+def make_service():
+    return EmailProcessorService(match_repository=JsonMatchRepository())
+
+
+def test_lookup_normalizes_trade_numbers(assets_dir):
+    write_trades(assets_dir, 10)
+    service = make_service()
+
+    assert service.get_trade_details("100003")["Amount"] == 30
+    assert service.get_trade_details(" 100003 ")["Amount"] == 30
+    assert service.get_trade_details(100003.0)["Amount"] == 30
+    assert service.get_trade_details("999999") is None
+
+
+def test_index_keeps_first_duplicate():
+    trades = [{"TradeNumber": "7", "Amount": 1}, {"TradeNumber": 7, "Amount": 2}, {"Amount": 3}]
+    index = EmailProcessorService.build_trade_index(trades)
+    assert list(index) == ["7"]
+    assert index["7"]["Amount"] == 1
+
+
+def test_find_trade_numbers_checks_book(assets_dir):
+    write_trades(assets_dir, 10)
+    service = make_service()
+    assert service.find_trade_numbers("Trades 100001, 100002 and 555555") == ["100001", "100002"]
+
+
+class UnscannableList(list):
+    """Trade list that fails the test if a lookup falls back to a linear scan"""
+
+    def __iter__(self):
+        raise AssertionError("lookup scanned the trade list")
+
+
+@pytest.mark.parametrize("book_size", [1_000, 50_000])
+def test_lookup_is_an_index_hit_without_reparsing(assets_dir, monkeypatch, book_size):
+    import app.services.email_processor_service as module
+
+    write_trades(assets_dir, book_size)
+    parses = []
+    real_load = module.json.load
+    monkeypatch.setattr(module.json, "load", lambda f, **kwargs: parses.append(f.name) or real_load(f, **kwargs))
+    service = make_service()
+    index = service.trade_index
+    service._trade_book = (UnscannableList(service.unmatched_trades), index)
+
+    for i in range(1_000):
+        number = str(100000 + (i * 7919) % book_size)
+        assert service.get_trade_details(number) is index[number]
+    assert len(parses) == 1
+
+
+def confirmation_response(*trade_numbers):
+    return json.dumps({
+        "Email": {"Confirmation": "Yes", "Email_subject": "Trade confirmation"},
+        "Trades": [{"TradeNumber": number, "Confirmation_OK": "Yes"} for number in trade_numbers]
+    })
+
+
+def test_trades_file_is_parsed_once_per_reload(assets_dir, monkeypatch):
+    import app.services.email_processor_service as module
+
+    trades = write_trades(assets_dir, 100)
+    parses = []
+    real_load = module.json.load
+    monkeypatch.setattr(module.json, "load", lambda f, **kwargs: parses.append(f.name) or real_load(f, **kwargs))
+
+    service = make_service()
+    assert len(parses) == 1
+
+    email = type("Email", (), {"id": "AAMk1", "subject": "Trade confirmation"})()
+    for _ in range(20):
+        result = asyncio.run(service.process_email_result(email, confirmation_response("100001", "100002")))
+        assert len(result["identified_trade_details"]) == 2
+        service.reload_unmatched_trades_if_changed(force_check=True)
+    assert len(parses) == 1
+
+    trades[1]["Amount"] = -1
+    (assets_dir / "unmatched_trades.json").write_text(json.dumps(trades + [{"TradeNumber": 1}]), encoding="utf-8")
+    assert service.reload_unmatched_trades_if_changed(force_check=True)
+    assert service.get_trade_details("100001")["Amount"] == -1
+    assert len(parses) == 2
+
+
+def test_confirmation_flag_does_not_leak_into_trade_book(assets_dir):
+    write_trades(assets_dir, 10)
+    service = make_service()
+    email = type("Email", (), {"id": "AAMk1", "subject": "Trade confirmation"})()
+
+    result = asyncio.run(service.process_email_result(email, confirmation_response("100001")))
+
+    assert result["identified_trade_details"][0]["confirmation_ok"] is True
+    assert "confirmation_ok" not in service.get_trade_details("100001")
+    assert all("confirmation_ok" not in trade for trade in service.unmatched_trades)
+
+
+def test_reload_indexes_the_new_trade_objects(assets_dir):
+    trades = write_trades(assets_dir, 10)
+    service = make_service()
+
+    (assets_dir / "unmatched_trades.json").write_text(json.dumps(trades[1:] + [{"TradeNumber": 1}]), encoding="utf-8")
+    assert service.reload_unmatched_trades_if_changed(force_check=True)
+
+    assert service.get_trade_details("100000") is None
+    assert all(service.trade_index[str(trade["TradeNumber"])] is trade for trade in service.unmatched_trades)